@@ -2,17 +2,25 @@
 Admin routes for Job Portal
 Handles admin dashboard and user management
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from models import User, Job, Application, Profile
+from models import User, Job, Application, Profile, DeletionTask
 from extensions import db
-from sqlalchemy import func
+from services.pagination import paginate
+from services.cache import CACHES
+from services.rollups import get_totals, event_counts, trend, TREND_METRICS
+from services.query_stats import query_budget
+from services.deletion import delete_user as delete_user_rows, delete_job as delete_job_rows
+from services.archive import employer_history, jobseeker_applications
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, with_expression
 from datetime import datetime, timedelta
 
 admin = Blueprint('admin', __name__)
 
 
 @admin.route('/')
+@query_budget(8)
 @login_required
 def dashboard():
     """Admin dashboard with statistics"""
@@ -34,39 +42,40 @@ def dashboard():
         start_date = now - timedelta(days=365)
 
     # -------- TOTAL COUNTS --------
-    total_jobs = Job.query.count()
-    total_employers = User.query.filter_by(role='employer').count()
-    total_jobseekers = User.query.filter_by(role='jobseeker').count()
-    total_applications = Application.query.count()
-
-    total_users = User.query.count()
+    # Read from the rollup tables maintained on every commit
+    totals = get_totals()
+    total_employers = totals.get('users.employer', 0)
+    total_jobseekers = totals.get('users.jobseeker', 0)
+    total_users = sum(value for metric, value in totals.items() if metric.startswith('users.'))
+    total_jobs = sum(value for metric, value in totals.items() if metric.startswith('jobs.'))
+    total_applications = sum(value for metric, value in totals.items() if metric.startswith('applications.'))
 
     # -------- NEW RECORDS IN PERIOD --------
-    new_employers = User.query.filter(
-        User.role == 'employer',
-        User.created_at >= start_date
-    ).count()
-
-    new_jobseekers = User.query.filter(
-        User.role == 'jobseeker',
-        User.created_at >= start_date
-    ).count()
-
-    new_jobs = Job.query.filter(
-        Job.created_at >= start_date
-    ).count()
-
-    new_applications = Application.query.filter(
-        Application.applied_at >= start_date
-    ).count()
+    new_counts = event_counts(start_date, now)
+    new_employers = new_counts.get('users.new.employer', 0)
+    new_jobseekers = new_counts.get('users.new.jobseeker', 0)
+    new_jobs = new_counts.get('jobs.new', 0)
+    new_applications = new_counts.get('applications.new', 0)
 
     # -------- JOB STATUS --------
-    active_jobs = Job.query.filter_by(status='active').count()
-    closed_jobs = Job.query.filter_by(status='closed').count()
-    draft_jobs = Job.query.filter_by(status='draft').count()
+    active_jobs = totals.get('jobs.active', 0)
+    closed_jobs = totals.get('jobs.closed', 0)
+    draft_jobs = totals.get('jobs.draft', 0)
 
     # -------- PENDING APPLICATIONS --------
-    pending_apps = Application.query.filter_by(status='pending').count()
+    pending_apps = totals.get('applications.pending', 0)
+
+    # -------- TREND CHART --------
+    trend_metric = request.args.get('metric', 'jobs.new')
+    if trend_metric not in dict(TREND_METRICS):
+        trend_metric = 'jobs.new'
+    trend_start = _parse_date(request.args.get('start')) or start_date
+    trend_end_date = _parse_date(request.args.get('end'))
+    # The end date is inclusive
+    trend_end = trend_end_date + timedelta(days=1) if trend_end_date else now
+    if trend_start >= trend_end:
+        trend_start = trend_end - timedelta(days=1)
+    trend_granularity, trend_series = trend(trend_metric, trend_start, trend_end)
 
     # -------- RECENT USERS --------
     recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
@@ -96,11 +105,33 @@ def dashboard():
         recent_users=recent_users,
         recent_jobs=recent_jobs,
 
+        trend_metrics=TREND_METRICS,
+        trend_metric=trend_metric,
+        trend_start=trend_start,
+        trend_end=trend_end_date or now,
+        trend_granularity=trend_granularity,
+        trend_series=trend_series,
+        trend_max=max([count for bucket, count in trend_series] or [0]),
+
         period=period
     )
 
 
+def _parse_date(value):
+    """Parse a YYYY-MM-DD query argument, or None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _count_per_user(id_column, user_column):
+    """Correlated COUNT of rows pointing at the user, for with_expression()"""
+    return select(func.count(id_column)).where(user_column == User.id).correlate(User).scalar_subquery()
+
+
 @admin.route('/employers')
+@query_budget(3)
 @login_required
 def employers():
     """Manage all employers"""
@@ -108,10 +139,13 @@ def employers():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     
-    query = User.query.filter_by(role='employer')
+    query = User.query.filter_by(role='employer').options(
+        with_expression(User.jobs_count, _count_per_user(Job.id, Job.employer_id))
+    )
     
     if search:
         query = query.filter(
@@ -119,14 +153,13 @@ def employers():
             (User.email.contains(search))
         )
     
-    employers_pagination = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    employers_pagination = paginate(query, User.created_at, User.id, per_page=10, page=page, cursor=cursor)
     
     return render_template('admin/employers.html', employers=employers_pagination)
 
 
 @admin.route('/jobseekers')
+@query_budget(3)
 @login_required
 def jobseekers():
     """Manage all jobseekers"""
@@ -134,10 +167,13 @@ def jobseekers():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     
-    query = User.query.filter_by(role='jobseeker')
+    query = User.query.filter_by(role='jobseeker').options(
+        with_expression(User.applications_count, _count_per_user(Application.id, Application.jobseeker_id))
+    )
     
     if search:
         query = query.filter(
@@ -145,14 +181,13 @@ def jobseekers():
             (User.email.contains(search))
         )
     
-    jobseekers_pagination = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    jobseekers_pagination = paginate(query, User.created_at, User.id, per_page=10, page=page, cursor=cursor)
     
     return render_template('admin/jobseekers.html', jobseekers=jobseekers_pagination)
 
 
 @admin.route('/jobs')
+@query_budget(4)
 @login_required
 def jobs():
     """Manage all job postings with optimized queries"""
@@ -164,16 +199,9 @@ def jobs():
     status = request.args.get('status', '')
     search = request.args.get('search', '')
     
-    # Build optimized query with application count subquery
-    from sqlalchemy import func
+    sort = request.args.get('sort', '')
     
-    # Base query with join to get application counts
-    query = db.session.query(
-        Job,
-        func.count(Application.id).label('application_count')
-    ).outerjoin(
-        Application, Application.job_id == Job.id
-    ).group_by(Job.id)
+    query = Job.query
     
     # Apply filters
     if status:
@@ -185,15 +213,14 @@ def jobs():
             (Job.company_name.contains(search))
         )
     
-    # Order and paginate
-    pagination = query.order_by(Job.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    # Order and paginate; application counts are stored on the job
+    if sort == 'most_applied':
+        query = query.order_by(Job.applications_count.desc(), Job.created_at.desc())
+    else:
+        query = query.order_by(Job.created_at.desc())
+    pagination = query.paginate(page=page, per_page=10, error_out=False)
     
-    # Pass both jobs and the counts to template
-    return render_template('admin/jobs.html', 
-                         jobs=pagination,
-                         job_counts={job.id: count for job, count in pagination.items})
+    return render_template('admin/jobs.html', jobs=pagination)
 
 
 @admin.route('/delete-user/<int:user_id>', methods=['POST'])
@@ -210,21 +237,16 @@ def delete_user(user_id):
         flash('You cannot delete your own account.', 'danger')
         return redirect(url_for('admin.employers'))
     
-    # Delete user's jobs and applications
-    for job in user.jobs:
-        for app in job.applications:
-            db.session.delete(app)
-        db.session.delete(job)
-    
-    for app in user.applications:
-        db.session.delete(app)
+    role = user.role
     
-    db.session.delete(user)
-    db.session.commit()
+    # Deletes the user's jobs and applications with them
+    task = delete_user_rows(user)
+    if task:
+        return _deletion_queued(task)
     
     flash('User deleted successfully.', 'success')
     
-    if user.role == 'employer':
+    if role == 'employer':
         return redirect(url_for('admin.employers'))
     else:
         return redirect(url_for('admin.jobseekers'))
@@ -272,18 +294,17 @@ def delete_job(job_id):
     
     job = Job.query.get_or_404(job_id)
     
-    # Delete applications first
-    for app in job.applications:
-        db.session.delete(app)
-    
-    db.session.delete(job)
-    db.session.commit()
+    # Deletes the job's applications with it
+    task = delete_job_rows(job)
+    if task:
+        return _deletion_queued(task)
     
     flash('Job deleted successfully.', 'success')
     return redirect(url_for('admin.jobs'))
 
 
 @admin.route('/applications')
+@query_budget(3)
 @login_required
 def applications():
     """Manage all applications"""
@@ -291,30 +312,36 @@ def applications():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     status = request.args.get('status', '')
     search = request.args.get('search', '')
     
-    query = Application.query
+    # Applicant, job and employer of every row come from the same query
+    query = Application.query.join(Application.job).join(Application.jobseeker).options(
+        contains_eager(Application.job).joinedload(Job.employer),
+        contains_eager(Application.jobseeker)
+    )
     
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Application.status == status)
     
     if search:
-        query = query.join(Job).join(User).filter(
+        query = query.filter(
             (Job.title.contains(search)) |
             (User.name.contains(search)) |
             (User.email.contains(search))
         )
     
-    applications_pagination = query.order_by(Application.applied_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    applications_pagination = paginate(
+        query, Application.applied_at, Application.id, per_page=10, page=page, cursor=cursor
     )
     
     return render_template('admin/applications.html', applications=applications_pagination)
 
 
 @admin.route('/employer/<int:employer_id>')
+@query_budget(6)
 @login_required
 def view_employer(employer_id):
     """View employer details"""
@@ -327,8 +354,8 @@ def view_employer(employer_id):
         flash('User is not an employer.', 'danger')
         return redirect(url_for('admin.employers'))
     
-    jobs = Job.query.filter_by(employer_id=employer_id).all()
-    applications = Application.query.join(Job).filter(Job.employer_id == employer_id).all()
+    # Live and archived
+    jobs, applications = employer_history(employer_id)
     
     return render_template('admin/view_employer.html', employer=employer, jobs=jobs, applications=applications)
 
@@ -370,23 +397,17 @@ def delete_employer(employer_id):
         flash('User is not an employer.', 'danger')
         return redirect(url_for('admin.employers'))
     
-    # Delete employer's jobs and applications
-    for job in employer.jobs:
-        for app in job.applications:
-            db.session.delete(app)
-        db.session.delete(job)
-    
-    for app in employer.applications:
-        db.session.delete(app)
-    
-    db.session.delete(employer)
-    db.session.commit()
+    # Deletes the employer's jobs and their applications with them
+    task = delete_user_rows(employer)
+    if task:
+        return _deletion_queued(task)
     
     flash('Employer deleted successfully.', 'success')
     return redirect(url_for('admin.employers'))
 
 
 @admin.route('/jobseeker/<int:jobseeker_id>')
+@query_budget(5)
 @login_required
 def view_jobseeker(jobseeker_id):
     """View job seeker details"""
@@ -400,7 +421,8 @@ def view_jobseeker(jobseeker_id):
         return redirect(url_for('admin.jobseekers'))
     
     profile = Profile.query.filter_by(user_id=jobseeker_id).first()
-    applications = Application.query.filter_by(jobseeker_id=jobseeker_id).all()
+    # Live and archived
+    applications = jobseeker_applications(jobseeker_id)
     
     return render_template('admin/view_jobseeker.html', jobseeker=jobseeker, profile=profile, applications=applications)
 
@@ -423,18 +445,43 @@ def delete_jobseeker(jobseeker_id):
         flash('User is not a job seeker.', 'danger')
         return redirect(url_for('admin.jobseekers'))
     
-    # Delete job seeker's applications
-    for app in jobseeker.applications:
-        db.session.delete(app)
-    
-    # Delete job seeker's profile
-    profile = Profile.query.filter_by(user_id=jobseeker_id).first()
-    if profile:
-        db.session.delete(profile)
-    
-    db.session.delete(jobseeker)
-    db.session.commit()
+    # Deletes the job seeker's applications and profile with them
+    task = delete_user_rows(jobseeker)
+    if task:
+        return _deletion_queued(task)
     
     flash('Job seeker deleted successfully.', 'success')
     return redirect(url_for('admin.jobseekers'))
 
+
+def _deletion_queued(task):
+    """Redirect to the progress of a deletion that runs in the background"""
+    flash('{} is being deleted in the background ({} rows).'.format(task.label, task.total), 'info')
+    return redirect(url_for('admin.deletions'))
+
+
+@admin.route('/deletions')
+@query_budget(3)
+@login_required
+def deletions():
+    """Progress of background deletions"""
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.', 'danger')
+        return redirect(url_for('main.home'))
+    
+    tasks = DeletionTask.query.order_by(DeletionTask.created_at.desc(), DeletionTask.id.desc()).limit(50).all()
+    running = any(task.status in ('pending', 'running') for task in tasks)
+    
+    return render_template('admin/deletions.html', tasks=tasks, running=running)
+
+
+
+@admin.route('/cache-stats')
+@login_required
+def cache_stats():
+    """Hit/miss counters of this worker's page and fragment caches"""
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.', 'danger')
+        return redirect(url_for('main.home'))
+    
+    return jsonify(caches=[cache.info() for cache in CACHES])
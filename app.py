@@ -8,7 +8,21 @@ from flask_wtf.csrf import CSRFProtect
 from flask_login import current_user
 from config import Config
 from extensions import db, login_manager, bcrypt, mail
-from models import User
+from schema import upgrade_schema
+from services.search import init_search
+from services.views import view_counter
+from services.funnel import event_log
+from services.query_stats import init_query_stats
+from services.passwords import password_hasher
+import services.locations  # noqa: F401 (registers the job location normalizer)
+import services.skills  # noqa: F401 (registers the job/profile skill linker)
+import services.scoring  # noqa: F401 (registers the after_flush applicant scorer)
+import services.categories  # noqa: F401 (registers the job category classifier)
+import services.rollups  # noqa: F401 (registers the dashboard rollup counters)
+import services.counters  # noqa: F401 (registers the per-job application counters)
+import services.applied_jobs  # noqa: F401 (registers the applied-jobs cache invalidation)
+import services.identity  # noqa: F401 (registers the Flask-Login user loader)
+from commands import register_commands
 
 # Import blueprints
 from auth.routes import auth
@@ -18,18 +32,13 @@ from employer.routes import employer
 from jobseeker.routes import jobseeker
 
 
-# Set up user loader
-@login_manager.user_loader
-def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
-
-
-def create_app():
-    """Create and configure the Flask application"""
+def create_app(test_config=None):
+    """Create and configure the Flask application; test_config overrides Config"""
     
     app = Flask(__name__)
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
     
     # Initialize CSRF protection
     csrf = CSRFProtect(app)
@@ -39,6 +48,10 @@ def create_app():
     login_manager.init_app(app)
     bcrypt.init_app(app)
     mail.init_app(app)
+    view_counter.init_app(app)
+    event_log.init_app(app)
+    init_query_stats(app)
+    password_hasher.init_app(app)
     
     # Create upload folder if it doesn't exist
     upload_folder = app.config.get('UPLOAD_FOLDER')
@@ -52,9 +65,14 @@ def create_app():
     app.register_blueprint(employer, url_prefix='/employer')
     app.register_blueprint(jobseeker, url_prefix='/jobseeker')
     
-    # Create database tables
+    # Register CLI commands
+    register_commands(app)
+    
+    # Create database tables and search index
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        init_search()
     
     # Error handlers
     @app.errorhandler(404)
@@ -69,6 +87,10 @@ def create_app():
     def forbidden(e):
         return render_template('404.html', error=e), 403
     
+    @app.errorhandler(429)
+    def too_many_requests(e):
+        return render_template('404.html', error=e), 429, {'Retry-After': '1'}
+    
     return app
 
 
@@ -7,6 +7,7 @@ from flask_login import login_user, logout_user, current_user, login_required
 from extensions import db
 from models import User, Profile
 from extensions import role_required
+from services.passwords import password_hasher
 
 auth = Blueprint('auth', __name__)
 
@@ -28,6 +29,10 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if user and user.verify_password(password):
+            # Re-hash at the current cost while the password is at hand
+            if password_hasher.needs_rehash(user.password_hash):
+                user.password = password
+                db.session.commit()
             login_user(user, remember=bool(remember))
             flash('Welcome back, {}!'.format(user.name), 'success')
             return redirect_after_login()
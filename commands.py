@@ -0,0 +1,299 @@
+"""
+CLI commands for Job Portal maintenance tasks
+Run with: flask --app app <command>
+"""
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('reindex-search')
+@with_appcontext
+def reindex_search_command():
+    """Rebuild the full-text job search index"""
+    from services.search import rebuild_search_index
+    rebuild_search_index()
+    click.echo('Search index rebuilt.')
+
+
+@click.command('backfill-salaries')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per UPDATE batch')
+@with_appcontext
+def backfill_salaries_command(batch_size):
+    """Parse the free-text salary of existing jobs into the numeric columns"""
+    from sqlalchemy import update
+    from extensions import db
+    from models import Job
+    from services.salary import parse_salary, salary_bounds
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = db.session.query(Job.id, Job.salary).filter(
+            Job.id > last_id
+        ).order_by(Job.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        params = []
+        for job_id, salary in rows:
+            parsed = parse_salary(salary)
+            floor, ceiling = salary_bounds(parsed)
+            params.append({
+                'id': job_id,
+                'salary_min': parsed.min if parsed else None,
+                'salary_max': parsed.max if parsed else None,
+                'salary_currency': parsed.currency if parsed else None,
+                'salary_period': parsed.period if parsed else None,
+                'salary_floor': floor,
+                'salary_ceiling': ceiling,
+            })
+
+        # Bulk UPDATE by primary key, one executemany per batch
+        db.session.execute(update(Job), params)
+        db.session.commit()
+
+        updated += len(params)
+        last_id = rows[-1][0]
+        click.echo('Processed {} jobs...'.format(updated))
+
+    click.echo('Salary backfill complete: {} jobs processed.'.format(updated))
+
+
+@click.command('backfill-locations')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per UPDATE batch')
+@with_appcontext
+def backfill_locations_command(batch_size):
+    """Point existing jobs at their canonical location"""
+    from sqlalchemy import update
+    from extensions import db
+    from models import Job
+    from services.locations import location_id_for
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = db.session.query(Job.id, Job.location).filter(
+            Job.id > last_id
+        ).order_by(Job.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        resolved = {}
+        params = []
+        for job_id, location in rows:
+            if location not in resolved:
+                resolved[location] = location_id_for(db.session, location)
+            params.append({'id': job_id, 'location_id': resolved[location]})
+
+        db.session.execute(update(Job), params)
+        db.session.commit()
+
+        updated += len(params)
+        last_id = rows[-1][0]
+        click.echo('Processed {} jobs...'.format(updated))
+
+    click.echo('Location backfill complete: {} jobs processed.'.format(updated))
+
+
+@click.command('backfill-skills')
+@click.option('--batch-size', default=500, show_default=True, help='Jobs or profiles per batch')
+@with_appcontext
+def backfill_skills_command(batch_size):
+    """Parse the skills text of existing jobs and profiles into the skills tables"""
+    from extensions import db
+    from models import Job, Profile
+    from services.skills import sync_skills
+
+    for model, column, label in ((Job, Job.required_skills, 'jobs'), (Profile, Profile.skills, 'profiles')):
+        last_id = 0
+        processed = 0
+        while True:
+            rows = db.session.query(model.id, column).filter(
+                model.id > last_id
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            sync_skills(db.session.connection(), model, [tuple(row) for row in rows])
+            db.session.commit()
+
+            processed += len(rows)
+            last_id = rows[-1][0]
+        click.echo('Linked skills for {} {}.'.format(processed, label))
+
+
+@click.command('backfill-categories')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per UPDATE batch')
+@with_appcontext
+def backfill_categories_command(batch_size):
+    """Classify existing jobs into categories"""
+    from sqlalchemy import update
+    from extensions import db
+    from models import Job
+    from services.categories import classify
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = db.session.query(Job.id, Job.title, Job.required_skills).filter(
+            Job.id > last_id
+        ).order_by(Job.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        db.session.execute(update(Job), [
+            {'id': job_id, 'category': classify(title, skills)}
+            for job_id, title, skills in rows
+        ])
+        db.session.commit()
+
+        updated += len(rows)
+        last_id = rows[-1][0]
+        click.echo('Processed {} jobs...'.format(updated))
+
+    click.echo('Category backfill complete: {} jobs processed.'.format(updated))
+
+
+@click.command('build-similar-jobs')
+@click.option('--top-k', default=10, show_default=True, help='Neighbours stored per job')
+@click.option('--batch-size', default=1000, show_default=True, help='Jobs scored per matrix product')
+@click.option('--workers', default=1, show_default=True, help='Worker processes for scoring')
+@with_appcontext
+def build_similar_jobs_command(top_k, batch_size, workers):
+    """Recompute the similar-jobs table for all active jobs"""
+    from services.similarity import build_similarity
+    total = build_similarity(top_k=top_k, batch_size=batch_size, workers=workers, echo=click.echo)
+    click.echo('Similar jobs built for {} active jobs.'.format(total))
+
+
+@click.command('update-similar-jobs')
+@click.option('--top-k', default=10, show_default=True, help='Neighbours stored per job')
+@click.option('--batch-size', default=1000, show_default=True, help='Jobs scored per matrix product')
+@click.option('--workers', default=1, show_default=True, help='Worker processes for scoring')
+@with_appcontext
+def update_similar_jobs_command(top_k, batch_size, workers):
+    """Add similar jobs for jobs posted since the last build"""
+    from services.similarity import update_similarity
+    added = update_similarity(top_k=top_k, batch_size=batch_size, workers=workers, echo=click.echo)
+    click.echo('Similar jobs updated: {} new jobs.'.format(added))
+
+
+@click.command('rebuild-rollups')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows fetched per round trip')
+@with_appcontext
+def rebuild_rollups_command(batch_size):
+    """Recompute the admin dashboard rollups from the users, jobs and applications tables"""
+    from services.rollups import rebuild_rollups
+    counted = rebuild_rollups(batch_size=batch_size, echo=click.echo)
+    click.echo('Dashboard rollups rebuilt from {} rows.'.format(counted))
+
+
+@click.command('reconcile-application-counts')
+@click.option('--batch-size', default=1000, show_default=True, help='Jobs checked per batch')
+@with_appcontext
+def reconcile_application_counts_command(batch_size):
+    """Recount per-job application counters and fix any that drifted"""
+    from services.counters import reconcile_application_counts
+    checked, corrected = reconcile_application_counts(batch_size=batch_size, echo=click.echo)
+    click.echo('Application counts reconciled: {} jobs checked, {} corrected.'.format(checked, corrected))
+
+
+@click.command('compact-funnel')
+@click.option('--batch-size', default=10000, show_default=True, help='Events folded per batch')
+@with_appcontext
+def compact_funnel_command(batch_size):
+    """Fold logged job events into the daily funnel aggregates"""
+    from services.funnel import event_log, compact_funnel
+    event_log.flush()
+    compacted = compact_funnel(batch_size=batch_size, echo=click.echo)
+    click.echo('Funnel compacted: {} events.'.format(compacted))
+
+
+@click.command('benchmark-passwords')
+@click.option('--logins', default=200, show_default=True, help='Password verifications to run')
+@click.option('--threads', type=int, default=None, help='Concurrent logins (default: the queue limit)')
+@with_appcontext
+def benchmark_passwords_command(logins, threads):
+    """Measure password verifications per second through the hashing pool"""
+    from services.passwords import password_hasher, benchmark
+    click.echo('bcrypt cost {}, {} pool workers, queue limit {}'.format(
+        password_hasher.rounds, password_hasher.workers or 'no', password_hasher.queue))
+    result = benchmark(logins=logins, threads=threads)
+    click.echo('{logins} logins in {seconds}s ({rejected} shed): {per_second} logins/s, '
+               '{per_core} logins/s per core over {cores} cores'.format(**result))
+
+
+@click.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Input format (default: from the extension)')
+@click.option('--batch-size', default=1000, show_default=True, help='Users hashed and inserted per transaction')
+@click.option('--workers', type=int, default=None, help='Password hashing processes (default: PASSWORD_HASH_WORKERS)')
+@click.option('--checkpoint', default=None, help='Progress file (default: PATH.checkpoint)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and read the file from the start')
+@with_appcontext
+def import_users_command(path, fmt, batch_size, workers, checkpoint, restart):
+    """Bulk-import users and profiles from a CSV or JSONL file"""
+    import time
+    from services.passwords import password_hasher
+    from services.user_import import import_users
+    if workers is not None:
+        password_hasher.workers = workers
+    started = time.perf_counter()
+    stats = import_users(path, fmt=fmt, batch_size=batch_size, checkpoint=checkpoint,
+                         resume=not restart, echo=click.echo)
+    elapsed = time.perf_counter() - started
+    click.echo('Users imported: {imported} new, {existing} already registered, {duplicate} duplicates, '
+               '{invalid} invalid, from {read} records.'.format(**stats))
+    click.echo('{:.1f}s, {:.0f} records/s.'.format(elapsed, stats['read'] / elapsed if elapsed else 0))
+
+
+@click.command('resume-deletions')
+@with_appcontext
+def resume_deletions_command():
+    """Finish background deletions interrupted by a restart or a failure"""
+    from services.deletion import resume_tasks
+    completed = resume_tasks(echo=click.echo)
+    click.echo('Deletion tasks completed: {}.'.format(completed))
+
+
+@click.command('archive-jobs')
+@click.option('--days', type=int, default=None, help='Archive jobs closed this many days ago (default: ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', default=500, show_default=True, help='Jobs moved per transaction')
+@with_appcontext
+def archive_jobs_command(days, batch_size):
+    """Move long-closed jobs and their applications to the archive tables"""
+    from flask import current_app
+    from services.archive import archive_jobs, ARCHIVE_AFTER_DAYS
+    if days is None:
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', ARCHIVE_AFTER_DAYS)
+    jobs, applications = archive_jobs(days, batch_size=batch_size, echo=click.echo)
+    click.echo('Jobs archived: {} ({} applications).'.format(jobs, applications))
+
+
+@click.command('score-applications')
+@click.option('--batch-size', default=5000, show_default=True, help='Applications scored per transaction')
+@with_appcontext
+def score_applications_command(batch_size):
+    """Score applications stored before match scores were computed on write"""
+    from services.scoring import score_unscored
+    scored = score_unscored(batch_size=batch_size, echo=click.echo)
+    click.echo('Applications scored: {}.'.format(scored))
+
+
+def register_commands(app):
+    """Register all maintenance commands with the Flask CLI"""
+    app.cli.add_command(reindex_search_command)
+    app.cli.add_command(backfill_salaries_command)
+    app.cli.add_command(backfill_locations_command)
+    app.cli.add_command(backfill_skills_command)
+    app.cli.add_command(backfill_categories_command)
+    app.cli.add_command(build_similar_jobs_command)
+    app.cli.add_command(update_similar_jobs_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(reconcile_application_counts_command)
+    app.cli.add_command(compact_funnel_command)
+    app.cli.add_command(benchmark_passwords_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(resume_deletions_command)
+    app.cli.add_command(archive_jobs_command)
+    app.cli.add_command(score_applications_command)
@@ -23,11 +23,36 @@ class Config:
 
     BCRYPT_LOG_ROUNDS = 12
 
+    # Password hashing runs in a process pool of PASSWORD_HASH_WORKERS (default:
+    # one per CPU; 0 hashes inline). Requests beyond PASSWORD_HASH_QUEUE pending
+    # operations get a 429.
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 0) or None
+
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
 
     UPLOAD_FOLDER = os.path.join(basedir, 'static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
+    # Vocabulary and TF-IDF matrix saved by the similar-jobs build for incremental updates
+    SIMILARITY_MODEL_PATH = os.environ.get('SIMILARITY_MODEL_PATH') or os.path.join(basedir, 'instance', 'job_similarity.npz')
+
+    # Job views and funnel events are buffered per worker and written every
+    # WRITE_BEHIND_INTERVAL seconds, or sooner once WRITE_BEHIND_THRESHOLD are pending
+    WRITE_BEHIND_INTERVAL = int(os.environ.get('WRITE_BEHIND_INTERVAL') or 10)
+    WRITE_BEHIND_THRESHOLD = int(os.environ.get('WRITE_BEHIND_THRESHOLD') or 500)
+
+    # Deleting a user or job removes more than DELETE_INLINE_LIMIT rows in a
+    # background task instead of the request, DELETE_BATCH_SIZE per transaction
+    DELETE_INLINE_LIMIT = int(os.environ.get('DELETE_INLINE_LIMIT') or 2000)
+    DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE') or 1000)
+
+    # `flask archive-jobs` moves jobs closed this many days ago to the archive tables
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 180)
+
+    # Send per-request SQL stats in an X-Query-Stats header (always on in debug mode)
+    QUERY_STATS_HEADER = os.environ.get('QUERY_STATS_HEADER', '').lower() in ('1', 'true', 'yes')
+
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
 
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -0,0 +1,93 @@
+"""
+Shared pytest fixtures
+Each test module gets its own freshly seeded SQLite database through the
+``app`` fixture. Importing app.py creates the module-level application, so
+DATABASE_URL is pointed at a temporary file first: running the tests never
+touches the tracked job_portal.db.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='job-portal-tests-'), 'app.db')
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Job, Application, Profile  # noqa: E402
+from services import recommendations, suggest  # noqa: E402
+from services.cache import CACHES  # noqa: E402
+from services.facets import invalidate_facets  # noqa: E402
+
+PASSWORD = 'password1'
+ROWS = 12  # more than any list page shows
+
+
+def reset_caches():
+    """Forget cached pages, counts and in-memory indexes left by another test's database"""
+    for cache in CACHES:
+        cache.clear()
+    invalidate_facets()
+    recommendations._needs_rebuild = True
+    recommendations._forget_user(None)
+    suggest._needs_rebuild = True
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp('app') / 'test.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///{}'.format(db_path),
+        'WTF_CSRF_ENABLED': False,
+        'BCRYPT_LOG_ROUNDS': 4,
+        'PASSWORD_HASH_WORKERS': 0,
+        'QUERY_STATS_HEADER': True,
+    })
+    with app.app_context():
+        seed(app)
+    reset_caches()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def seed(app):
+    """Admin, two employers with ROWS jobs, and ROWS jobseekers applying to them"""
+    admin = User(name='Admin', email='admin@test.com', password=PASSWORD, role='admin')
+    employer = User(name='Employer', email='employer@test.com', password=PASSWORD, role='employer')
+    other = User(name='Other Employer', email='other@test.com', password=PASSWORD, role='employer')
+    seekers = [
+        User(name='Seeker {}'.format(i), email='seeker{}@test.com'.format(i), password=PASSWORD, role='jobseeker')
+        for i in range(ROWS)
+    ]
+    db.session.add_all([admin, employer, other] + seekers)
+    db.session.commit()
+
+    for seeker in seekers:
+        db.session.add(Profile(user_id=seeker.id, skills='Python, SQL, Flask', experience_years=3))
+    jobs = [
+        Job(title='Python Developer {}'.format(i), company_name='Acme', location='London',
+            salary='£50,000 - £60,000', description='Python and SQL work on a Flask application.',
+            required_skills='Python, SQL', job_type='Full-time', experience_level='Mid',
+            employer_id=(employer if i % 3 else other).id, status='active')
+        for i in range(ROWS)
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    # Newest applications come from different applicants
+    for job in jobs:
+        for seeker in seekers:
+            db.session.add(Application(job_id=job.id, jobseeker_id=seeker.id, cover_letter='Hello'))
+    db.session.commit()
+
+    app.config['BUDGET_URL_VALUES'] = {
+        'job_id': next(job.id for job in jobs if job.employer_id == employer.id),
+        'employer_id': employer.id,
+        'jobseeker_id': seekers[0].id,
+        'app_id': Application.query.filter_by(jobseeker_id=seekers[0].id).first().id,
+    }
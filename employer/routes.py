@@ -6,12 +6,23 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from models import Job, Application, User
 from extensions import db
-from datetime import datetime
+from services.pagination import paginate
+from services.employer_stats import employer_stats
+from services.views import recent_unique_viewers
+from services.funnel import employer_funnel, job_funnel
+from services.query_stats import query_budget
+from services.deletion import delete_job as delete_job_rows
+from sqlalchemy.orm import contains_eager, joinedload
+from datetime import datetime, timedelta
 
 employer = Blueprint('employer', __name__)
 
+# Date ranges offered on the analytics pages, in days
+ANALYTICS_RANGES = (7, 30, 90)
+
 
 @employer.route('/')
+@query_budget(5)
 @login_required
 def dashboard():
     """Employer dashboard with statistics"""
@@ -19,44 +30,32 @@ def dashboard():
         flash('Access denied. Employer privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    # Statistics
-    total_jobs = Job.query.filter_by(employer_id=current_user.id).count()
-    active_jobs = Job.query.filter_by(employer_id=current_user.id, status='active').count()
-    closed_jobs = Job.query.filter_by(employer_id=current_user.id, status='closed').count()
-    
-    # Get applications
-    employer_jobs = Job.query.filter_by(employer_id=current_user.id).all()
-    job_ids = [job.id for job in employer_jobs]
-    
-    total_applications = Application.query.filter(Application.job_id.in_(job_ids)).count()
-    pending_apps = Application.query.filter(
-        Application.job_id.in_(job_ids),
-        Application.status == 'pending'
-    ).count()
+    # Statistics from one grouped query, cached per employer
+    stats = employer_stats(current_user.id)
     
     # Recent jobs
     jobs = Job.query.filter_by(employer_id=current_user.id).order_by(
         Job.created_at.desc()
     ).limit(5).all()
     
-    # Recent applications
-    recent_applications = Application.query.filter(
-        Application.job_id.in_(job_ids)
+    # Recent applications, joined to the employer's jobs
+    recent_applications = Application.query.join(Job).filter(
+        Job.employer_id == current_user.id
+    ).options(
+        contains_eager(Application.job),
+        joinedload(Application.jobseeker)
     ).order_by(
         Application.applied_at.desc()
     ).limit(5).all()
     
     return render_template('employer/dashboard.html',
-                         total_jobs=total_jobs,
-                         active_jobs=active_jobs,
-                         closed_jobs=closed_jobs,
-                         total_applications=total_applications,
-                         pending_apps=pending_apps,
                          jobs=jobs,
-                         recent_applications=recent_applications)
+                         recent_applications=recent_applications,
+                         **stats)
 
 
 @employer.route('/jobs')
+@query_budget(3)
 @login_required
 def jobs():
     """List all jobs posted by employer"""
@@ -64,7 +63,8 @@ def jobs():
         flash('Access denied. Employer privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     status = request.args.get('status', '')
     
     query = Job.query.filter_by(employer_id=current_user.id)
@@ -72,9 +72,7 @@ def jobs():
     if status:
         query = query.filter_by(status=status)
     
-    jobs_pagination = query.order_by(Job.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    jobs_pagination = paginate(query, Job.created_at, Job.id, per_page=10, page=page, cursor=cursor)
     
     return render_template('employer/jobs.html', jobs=jobs_pagination)
 
@@ -203,18 +201,17 @@ def delete_job(job_id):
         flash('You can only delete your own jobs.', 'danger')
         return redirect(url_for('employer.jobs'))
     
-    # Delete applications
-    for app in job.applications:
-        db.session.delete(app)
-    
-    db.session.delete(job)
-    db.session.commit()
+    # Deletes the job's applications with it
+    if delete_job_rows(job):
+        flash('Job is being deleted in the background; it may take a few minutes.', 'info')
+        return redirect(url_for('employer.jobs'))
     
     flash('Job deleted successfully!', 'success')
     return redirect(url_for('employer.jobs'))
 
 
 @employer.route('/applications')
+@query_budget(3)
 @login_required
 def applications():
     """View all applications to employer's jobs"""
@@ -222,25 +219,26 @@ def applications():
         flash('Access denied. Employer privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     status = request.args.get('status', '')
     
-    employer_jobs = Job.query.filter_by(employer_id=current_user.id).all()
-    job_ids = [job.id for job in employer_jobs]
-    
-    query = Application.query.filter(Application.job_id.in_(job_ids))
+    query = Application.query.join(Job).filter(
+        Job.employer_id == current_user.id
+    ).options(contains_eager(Application.job), joinedload(Application.jobseeker))
     
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Application.status == status)
     
-    applications_pagination = query.order_by(Application.applied_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    applications_pagination = paginate(
+        query, Application.applied_at, Application.id, per_page=10, page=page, cursor=cursor
     )
     
     return render_template('employer/applications.html', applications=applications_pagination)
 
 
 @employer.route('/job/<int:job_id>/applications')
+@query_budget(8)
 @login_required
 def job_applications(job_id):
     """View applications for a specific job"""
@@ -250,13 +248,84 @@ def job_applications(job_id):
         flash('You can only view applications for your own jobs.', 'danger')
         return redirect(url_for('employer.jobs'))
     
-    applications = Application.query.filter_by(job_id=job_id).order_by(
-        Application.applied_at.desc()
-    ).all()
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
+    status = request.args.get('status', '')
+    sort = request.args.get('sort', '')
+    
+    # Every row's job is the one already loaded; only applicants need loading
+    query = Application.query.filter_by(job_id=job_id).options(joinedload(Application.jobseeker))
+    
+    if status:
+        query = query.filter_by(status=status)
+    
+    if sort == 'match':
+        # Applications are scored as they are written; page by the stored score,
+        # with any not scored yet (see `flask score-applications`) last
+        applications_pagination = paginate(
+            query, Application.match_score, Application.id, per_page=10, page=page or 1, nulls_last=True
+        )
+    else:
+        applications_pagination = paginate(
+            query, Application.applied_at, Application.id, per_page=10, page=page, cursor=cursor
+        )
     
     return render_template('employer/applications.html', 
-                         applications=applications,
-                         job=job)
+                         applications=applications_pagination,
+                         job=job,
+                         viewers_7d=recent_unique_viewers(job.id, 7),
+                         viewers_30d=recent_unique_viewers(job.id, 30),
+                         sort=sort)
+
+
+@employer.route('/analytics')
+@query_budget(3)
+@login_required
+def analytics():
+    """Views-to-hire funnel of the employer's jobs"""
+    if not current_user.is_employer():
+        flash('Access denied. Employer privileges required.', 'danger')
+        return redirect(url_for('main.home'))
+    
+    days, start, end = _analytics_range()
+    
+    return render_template('employer/analytics.html',
+                         rows=employer_funnel(current_user.id, start, end),
+                         job=None,
+                         days=days,
+                         ranges=ANALYTICS_RANGES)
+
+
+@employer.route('/job/<int:job_id>/analytics')
+@query_budget(4)
+@login_required
+def job_analytics(job_id):
+    """Daily funnel of one job"""
+    job = Job.query.get_or_404(job_id)
+    
+    if job.employer_id != current_user.id:
+        flash('You can only view analytics for your own jobs.', 'danger')
+        return redirect(url_for('employer.jobs'))
+    
+    days, start, end = _analytics_range()
+    totals, daily = job_funnel(job.id, start, end)
+    
+    return render_template('employer/analytics.html',
+                         job=job,
+                         totals=totals,
+                         daily=daily,
+                         daily_max=max([day.views for day in daily] or [0]),
+                         days=days,
+                         ranges=ANALYTICS_RANGES)
+
+
+def _analytics_range():
+    """Number of days requested and the (start, end) dates they cover"""
+    days = request.args.get('days', 30, type=int)
+    if days not in ANALYTICS_RANGES:
+        days = 30
+    end = datetime.utcnow().date()
+    return days, end - timedelta(days=days - 1), end
 
 
 @employer.route('/application/<int:app_id>/review', methods=['POST'])
@@ -321,9 +390,11 @@ def profile():
         flash('Access denied. Employer privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
+    user = db.session.get(User, current_user.id)
+    
     if request.method == 'POST':
-        current_user.name = request.form.get('name')
-        current_user.email = request.form.get('email')
+        user.name = request.form.get('name')
+        user.email = request.form.get('email')
         
         # Update password if provided with validation
         new_password = request.form.get('password')
@@ -332,12 +403,12 @@ def profile():
             if len(new_password) < 8:
                 flash('Password must be at least 8 characters long.', 'danger')
                 return redirect(url_for('employer.profile'))
-            current_user.password = new_password
+            user.password = new_password
         
         db.session.commit()
         
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('employer.profile'))
     
-    return render_template('employer/profile.html', user=current_user)
+    return render_template('employer/profile.html', user=user)
 
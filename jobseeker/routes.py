@@ -2,11 +2,22 @@
 Jobseeker routes for Job Portal
 Handles job browsing, applications, and profile management
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import login_required, current_user
 from flask_wtf.csrf import CSRFProtect
-from models import Job, Application, Profile
+from models import User, Job, Application, Profile
 from extensions import db
+from services.search import search_snippets
+from services.filters import job_filters_from_args, apply_job_filters, apply_job_sort
+from services.facets import job_facets
+from services.pagination import paginate
+from services.recommendations import recommend_jobs
+from services.similarity import similar_jobs
+from services.applied_jobs import applied_among
+from services.query_stats import query_budget
+from services.archive import application_history, get_application
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
 import os
 import time
@@ -23,6 +34,7 @@ def allowed_file(filename):
 
 
 @jobseeker.route('/')
+@query_budget(8)
 @login_required
 def dashboard():
     """Jobseeker dashboard with statistics"""
@@ -30,56 +42,36 @@ def dashboard():
         flash('Access denied. Jobseeker privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    # Statistics
-    total_applications = Application.query.filter_by(
-        jobseeker_id=current_user.id
-    ).count()
-    
-    pending_applications = Application.query.filter_by(
-        jobseeker_id=current_user.id,
-        status='pending'
-    ).count()
-    
-    accepted_applications = Application.query.filter_by(
-        jobseeker_id=current_user.id,
-        status='accepted'
-    ).count()
-    
-    rejected_applications = Application.query.filter_by(
-        jobseeker_id=current_user.id,
-        status='rejected'
-    ).count()
+    # Statistics from one grouped query
+    status_counts = dict(db.session.query(
+        Application.status, func.count(Application.id)
+    ).filter(
+        Application.jobseeker_id == current_user.id
+    ).group_by(Application.status).all())
     
-    # Recent applications
+    # Recent applications with their jobs
     applications = Application.query.filter_by(
         jobseeker_id=current_user.id
+    ).options(
+        joinedload(Application.job)
     ).order_by(
         Application.applied_at.desc()
     ).limit(5).all()
     
-    # Get applied job IDs for exclusion
-    applied_job_ids = [app.job_id for app in applications]
-    
-    # Recommended jobs (active jobs not yet applied to)
-    # Always use the filter to ensure scalability - even with empty list
-    recommended_jobs = Job.query.filter(
-        Job.status == 'active'
-    ).filter(
-        ~Job.id.in_(applied_job_ids) if applied_job_ids else Job.id.in_([-1])
-    ).order_by(
-        Job.created_at.desc()
-    ).limit(5).all()
+    # Recommended jobs: best skill matches among jobs not yet applied to
+    recommended_jobs = recommend_jobs(current_user.id, limit=5)
     
     return render_template('jobseeker/dashboard.html',
-                         total_applications=total_applications,
-                         pending_applications=pending_applications,
-                         accepted_applications=accepted_applications,
-                         rejected_applications=rejected_applications,
+                         total_applications=sum(status_counts.values()),
+                         pending_applications=status_counts.get('pending', 0),
+                         accepted_applications=status_counts.get('accepted', 0),
+                         rejected_applications=status_counts.get('rejected', 0),
                          applications=applications,
                          recommended_jobs=recommended_jobs)
 
 
 @jobseeker.route('/jobs')
+@query_budget(5)
 @login_required
 def jobs():
     """Browse available jobs"""
@@ -87,47 +79,42 @@ def jobs():
         flash('Access denied. Jobseeker privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '')
-    location = request.args.get('location', '')
-    job_type = request.args.get('type', '')
-    experience = request.args.get('experience', '')
-    
-    # Get already applied job IDs
-    applications = Application.query.filter_by(jobseeker_id=current_user.id).all()
-    applied_job_ids = [app.job_id for app in applications]
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
+    filters = job_filters_from_args(request.args)
+    search = filters.get('search', '')
     
     # Build query for active jobs
     query = Job.query.filter_by(status='active')
     
     # Apply filters
-    if search:
-        query = query.filter(
-            (Job.title.contains(search)) | 
-            (Job.company_name.contains(search)) |
-            (Job.description.contains(search))
-        )
+    query = apply_job_filters(query, filters)
     
-    if location:
-        query = query.filter(Job.location.contains(location))
+    # Order and paginate. Relevance-ranked searches and sorted listings page by
+    # offset; plain listings page by (created_at, id) keyset.
+    sorted_query = apply_job_sort(query, request.args.get('sort', ''))
+    if sorted_query is not None:
+        query = sorted_query
+    if (search or sorted_query is not None) and page is None:
+        page = 1
+    jobs_pagination = paginate(query, Job.created_at, Job.id, per_page=9, page=page, cursor=cursor)
     
-    if job_type:
-        query = query.filter(Job.job_type == job_type)
+    # "Already applied" badges for the jobs on this page only
+    applied_job_ids = applied_among(current_user.id, [job.id for job in jobs_pagination.items])
     
-    if experience:
-        query = query.filter(Job.experience_level == experience)
-    
-    # Order and paginate
-    jobs_pagination = query.order_by(Job.created_at.desc()).paginate(
-        page=page, per_page=9, error_out=False
-    )
+    # Highlighted description snippets for the current page
+    snippets = search_snippets(search, [job.id for job in jobs_pagination.items]) if search else {}
     
     return render_template('jobseeker/jobs.html', 
                          jobs=jobs_pagination,
-                         applied_job_ids=applied_job_ids)
+                         applied_job_ids=applied_job_ids,
+                         snippets=snippets,
+                         facets=job_facets(filters),
+                         filters=filters)
 
 
 @jobseeker.route('/job/<int:job_id>')
+@query_budget(5)
 @login_required
 def job_detail(job_id):
     """View job details and apply"""
@@ -145,14 +132,12 @@ def job_detail(job_id):
     
     applied_job_ids = [job_id] if application else []
     
-    # Get application count for this job
-    application_count = Application.query.filter_by(job_id=job_id).count()
-    
     return render_template('jobseeker/job_detail.html',
                          job=job,
                          applied_job_ids=applied_job_ids,
                          application=application,
-                         application_count=application_count)
+                         application_count=job.applications_count,
+                         similar=similar_jobs(job.id))
 
 
 @jobseeker.route('/job/<int:job_id>/apply', methods=['POST'])
@@ -197,6 +182,7 @@ def apply_job(job_id):
 
 
 @jobseeker.route('/applications')
+@query_budget(4)
 @login_required
 def applications():
     """View application history"""
@@ -207,14 +193,8 @@ def applications():
     page = request.args.get('page', 1, type=int)
     status = request.args.get('status', '')
     
-    query = Application.query.filter_by(jobseeker_id=current_user.id)
-    
-    if status:
-        query = query.filter_by(status=status)
-    
-    applications_pagination = query.order_by(Application.applied_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    # Includes applications to archived jobs
+    applications_pagination = application_history(current_user.id, status=status, page=page, per_page=10)
     
     return render_template('jobseeker/applications.html',
                          applications=applications_pagination,
@@ -222,6 +202,7 @@ def applications():
 
 
 @jobseeker.route('/application/<int:app_id>')
+@query_budget(4)
 @login_required
 def application_detail(app_id):
     """View application details"""
@@ -229,14 +210,17 @@ def application_detail(app_id):
         flash('Access denied. Jobseeker privileges required.', 'danger')
         return redirect(url_for('main.home'))
     
-    application = Application.query.get_or_404(app_id)
+    # Archived applications are linked with ?archived=1 and their archive id
+    application = get_application(app_id, archived=request.args.get('archived', type=int) == 1)
+    if application is None:
+        abort(404)
     
     # Ensure the application belongs to the current user
     if application.jobseeker_id != current_user.id:
         flash('Access denied.', 'danger')
         return redirect(url_for('jobseeker.applications'))
     
-    job = Job.query.get(application.job_id)
+    job = application.job
     
     return render_template('jobseeker/application_detail.html',
                          application=application,
@@ -260,8 +244,9 @@ def profile():
     
     if request.method == 'POST':
         # Update user
-        current_user.name = request.form.get('name')
-        current_user.email = request.form.get('email')
+        user = db.session.get(User, current_user.id)
+        user.name = request.form.get('name')
+        user.email = request.form.get('email')
         
         # Update profile
         profile.phone = request.form.get('phone', '')
@@ -303,7 +288,7 @@ def profile():
             if len(new_password) < 8:
                 flash('Password must be at least 8 characters long.', 'danger')
                 return redirect(url_for('jobseeker.profile'))
-            current_user.password = new_password
+            user.password = new_password
         
         db.session.commit()
         
@@ -2,141 +2,156 @@
 Main routes for Job Portal
 Handles home page, public job listings, and shared pages
 """
-from flask import Blueprint, render_template, request, redirect, url_for, abort
+from flask import Blueprint, render_template, request, redirect, url_for, abort, jsonify
+from markupsafe import Markup
 from flask_login import current_user
-from models import Job, Application, User
+from models import Job
 from extensions import db
 from sqlalchemy import func
+from services.search import search_snippets
+from services.filters import job_filters_from_args, apply_job_filters, apply_job_sort
+from services.facets import job_facets
+from services.pagination import paginate
+from services.similarity import similar_jobs
+from services.categories import CATEGORIES
+from services.cache import cached_page, fragment_cache, PUBLIC_MODELS
+from services.suggest import suggest, KINDS
+from services.views import view_counter, viewer_key
+from services.query_stats import query_budget
+from services.applied_jobs import applied_job_ids
+from services.rollups import get_totals
 
 main = Blueprint('main', __name__)
 
 
 @main.route('/')
+@query_budget(7)
+@cached_page()
 def home():
     """Home page with featured jobs and statistics"""
-    # Get featured/active jobs (limit to 6)
-    featured_jobs = Job.query.filter_by(status='active').order_by(
-        Job.created_at.desc()
-    ).limit(6).all()
-    
-    # Get statistics
-    total_jobs = Job.query.filter_by(status='active').count()
-    total_applications = Application.query.count()
-    total_companies = db.session.query(func.count(User.id)).filter_by(role='employer').scalar() or '100+'
-    total_candidates = db.session.query(func.count(User.id)).filter_by(role='jobseeker').scalar() or '1000+'
-    
-    # Get job counts by category (based on search keywords)
-    it_jobs = Job.query.filter(
-        Job.status == 'active',
-        (Job.title.contains('developer') | Job.title.contains('engineer') | Job.title.contains('tech'))
-    ).count()
-    
-    marketing_jobs = Job.query.filter(
-        Job.status == 'active',
-        (Job.title.contains('marketing') | Job.title.contains('sales') | Job.title.contains('advertising'))
-    ).count()
-    
-    sales_jobs = Job.query.filter(
-        Job.status == 'active',
-        (Job.title.contains('sales') | Job.title.contains('account') | Job.title.contains('business'))
-    ).count()
+    stats = fragment_cache.get_or_set('home:stats', _home_stats, tags=PUBLIC_MODELS)
     
-    design_jobs = Job.query.filter(
-        Job.status == 'active',
-        (Job.title.contains('design') | Job.title.contains('creative') | Job.title.contains('ui') | Job.title.contains('ux'))
-    ).count()
-    
-    finance_jobs = Job.query.filter(
-        Job.status == 'active',
-        (Job.title.contains('finance') | Job.title.contains('accounting') | Job.title.contains('bank'))
-    ).count()
+    # The featured jobs block is the same for every visitor
+    featured_jobs_html = fragment_cache.get_or_set('home:featured-jobs', _featured_jobs_html, tags=(Job,))
     
     return render_template('home.html', 
-                         featured_jobs=featured_jobs,
-                         total_jobs=total_jobs,
-                         total_applications=total_applications,
-                         total_companies=total_companies,
-                         total_candidates=total_candidates,
-                         it_jobs=it_jobs,
-                         marketing_jobs=marketing_jobs,
-                         sales_jobs=sales_jobs,
-                         design_jobs=design_jobs,
-                         finance_jobs=finance_jobs)
+                         featured_jobs_html=featured_jobs_html,
+                         categories=CATEGORIES,
+                         **stats)
+
+
+def _home_stats():
+    """Site-wide counts shown on the home page"""
+    # Active job counts per category in one GROUP BY on the category index
+    category_counts = dict(db.session.query(
+        Job.category, func.count(Job.id)
+    ).filter(Job.status == 'active').group_by(Job.category).all())
+    
+    # Population sizes from the rollup totals, which include archived rows
+    totals = get_totals()
+    return {
+        'total_jobs': totals.get('jobs.active', 0),
+        'total_applications': _total_applications(totals),
+        'total_companies': totals.get('users.employer') or '100+',
+        'total_candidates': totals.get('users.jobseeker') or '1000+',
+        'category_counts': category_counts,
+    }
+
+
+def _total_applications(totals):
+    return sum(value for metric, value in totals.items() if metric.startswith('applications.'))
+
+
+def _featured_jobs_html():
+    """Render the newest active jobs block"""
+    featured_jobs = Job.query.filter_by(status='active').order_by(
+        Job.created_at.desc()
+    ).limit(6).all()
+    return Markup(render_template('featured_jobs.html', featured_jobs=featured_jobs))
 
 
 @main.route('/jobs')
+@query_budget(3)
 def jobs():
     """Public job listings page with search and filters"""
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '')
-    location = request.args.get('location', '')
-    job_type = request.args.get('type', '')
-    experience = request.args.get('experience', '')
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
+    filters = job_filters_from_args(request.args)
+    search = filters.get('search', '')
     
     # Build query
     query = Job.query.filter_by(status='active')
     
     # Apply filters
-    if search:
-        query = query.filter(
-            (Job.title.contains(search)) | 
-            (Job.company_name.contains(search)) |
-            (Job.description.contains(search))
-        )
-    
-    if location:
-        query = query.filter(Job.location.contains(location))
-    
-    if job_type:
-        query = query.filter(Job.job_type == job_type)
-    
-    if experience:
-        query = query.filter(Job.experience_level == experience)
-    
-    # Order and paginate
-    jobs = query.order_by(Job.created_at.desc()).paginate(
-        page=page, per_page=9, error_out=False
-    )
-    
-    return render_template('jobs.html', jobs=jobs)
+    query = apply_job_filters(query, filters)
+    
+    # Order and paginate. Relevance-ranked searches and sorted listings page by
+    # offset; plain listings page by (created_at, id) keyset.
+    sorted_query = apply_job_sort(query, request.args.get('sort', ''))
+    if sorted_query is not None:
+        query = sorted_query
+    if (search or sorted_query is not None) and page is None:
+        page = 1
+    jobs = paginate(query, Job.created_at, Job.id, per_page=9, page=page, cursor=cursor)
+    
+    # Highlighted description snippets for the current page
+    snippets = search_snippets(search, [job.id for job in jobs.items]) if search else {}
+    
+    return render_template('jobs.html',
+                         jobs=jobs,
+                         snippets=snippets,
+                         facets=job_facets(filters),
+                         filters=filters)
+
+
+@main.route('/api/suggest')
+def api_suggest():
+    """Typeahead suggestions for the job search boxes (JSON)"""
+    prefix = request.args.get('q', '')[:100]
+    kinds = [kind for kind in request.args.get('type', '').split(',') if kind in KINDS] or KINDS
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    
+    return jsonify(suggestions=suggest(prefix, kinds=kinds, limit=limit))
 
 
 @main.route('/job/<int:job_id>')
+@query_budget(4)
 def job_detail(job_id):
     """Job detail page (public view)"""
     job = Job.query.get_or_404(job_id)
     
-    # Increment view count
-    job.views_count += 1
-    db.session.commit()
+    # Buffered and written in batches; the request itself never writes
+    view_counter.record(job.id, viewer_key())
     
     # Check if jobseeker has already applied
-    applied_job_ids = []
+    applied = ()
     if current_user.is_authenticated and current_user.is_jobseeker():
-        applications = Application.query.filter_by(
-            jobseeker_id=current_user.id
-        ).all()
-        applied_job_ids = [app.job_id for app in applications]
+        applied = applied_job_ids(current_user.id)
     
     return render_template('job_detail.html', 
                          job=job,
-                         applied_job_ids=applied_job_ids)
+                         views_count=(job.views_count or 0) + view_counter.pending(job.id),
+                         applied_job_ids=applied,
+                         similar=similar_jobs(job.id))
 
 
 @main.route('/about')
+@cached_page()
 def about():
     """About page"""
-    # Get statistics
-    total_jobs = Job.query.filter_by(status='active').count()
-    total_applications = Application.query.count()
-    total_employers = User.query.filter_by(role='employer').count()
-    total_jobseekers = User.query.filter_by(role='jobseeker').count()
-    
-    return render_template('about.html',
-                         total_jobs=total_jobs,
-                         total_applications=total_applications,
-                         total_employers=total_employers,
-                         total_jobseekers=total_jobseekers)
+    stats = fragment_cache.get_or_set('about:stats', _about_stats, tags=PUBLIC_MODELS)
+    return render_template('about.html', **stats)
+
+
+def _about_stats():
+    """Site-wide counts shown on the about page"""
+    totals = get_totals()
+    return {
+        'total_jobs': totals.get('jobs.active', 0),
+        'total_applications': _total_applications(totals),
+        'total_employers': totals.get('users.employer', 0),
+        'total_jobseekers': totals.get('users.jobseeker', 0),
+    }
 
 
 @main.route('/contact')
@@ -2,21 +2,24 @@
 Database models for Job Portal Application
 """
 from datetime import datetime
-from extensions import db, login_manager, bcrypt
+from extensions import db
 from flask_login import UserMixin
+from sqlalchemy import event
 from sqlalchemy.ext.hybrid import hybrid_property
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
+from services.salary import parse_salary, salary_bounds
+from services.passwords import password_hasher
 
 
 class User(db.Model, UserMixin):
     """User model with role-based authentication"""
     
     __tablename__ = 'users'
+    __table_args__ = (
+        # Admin listings filter by role and page newest-first
+        db.Index('ix_users_role_created_at', 'role', 'created_at', 'id'),
+        # Newest users across all roles (admin dashboard)
+        db.Index('ix_users_created_at', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -26,10 +29,14 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationships
-    profile = db.relationship('Profile', back_populates='user', uselist=False, cascade='all, delete-orphan')
-    jobs = db.relationship('Job', back_populates='employer', foreign_keys='Job.employer_id', cascade='all, delete-orphan')
-    applications = db.relationship('Application', back_populates='jobseeker', foreign_keys='Application.jobseeker_id', cascade='all, delete-orphan')
+    # Relationships; rows are removed by the database (ON DELETE CASCADE), see services/deletion.py
+    profile = db.relationship('Profile', back_populates='user', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    jobs = db.relationship('Job', back_populates='employer', foreign_keys='Job.employer_id', cascade='all, delete-orphan', passive_deletes=True)
+    applications = db.relationship('Application', back_populates='jobseeker', foreign_keys='Application.jobseeker_id', cascade='all, delete-orphan', passive_deletes=True)
+    
+    # Per-user counts, loaded by admin listings with with_expression()
+    jobs_count = db.query_expression()
+    applications_count = db.query_expression()
     
     def __repr__(self):
         return f'<User {self.email} ({self.role})>'
@@ -42,11 +49,11 @@ class User(db.Model, UserMixin):
     @password.setter
     def password(self, password):
         """Hash password when setting"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def verify_password(self, password):
         """Verify password"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.verify(password, self.password_hash)
     
     def is_admin(self):
         """Check if user is admin"""
@@ -76,7 +83,7 @@ class Profile(db.Model):
     __tablename__ = 'profiles'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), unique=True, nullable=False, index=True)
     resume_path = db.Column(db.String(255), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
     address = db.Column(db.Text, nullable=True)
@@ -90,56 +97,139 @@ class Profile(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationship
+    # Relationships
     user = db.relationship('User', back_populates='profile')
+    skill_tags = db.relationship('Skill', secondary='profile_skills', order_by='Skill.name')
     
     def __repr__(self):
         return f'<Profile for User {self.user_id}>'
 
 
+class Location(db.Model):
+    """Canonical location that free-text job locations are normalized to"""
+    
+    __tablename__ = 'locations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(120), unique=True, nullable=False, index=True)  # e.g. bengaluru, remote-india
+    name = db.Column(db.String(120), nullable=False)  # Display name, e.g. Bengaluru, Remote (India)
+    is_remote = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Location {self.name}>'
+
+
+class Skill(db.Model):
+    """Canonical skill parsed from job requirements and jobseeker profiles"""
+    
+    __tablename__ = 'skills'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False, index=True)  # e.g. javascript, node.js
+    name = db.Column(db.String(100), nullable=False)  # Display name
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Skill {self.name}>'
+
+
+# Skill associations, kept in step with Job.required_skills / Profile.skills.
+# The skill_id indexes serve skill -> jobs / profiles lookups.
+job_skills = db.Table(
+    'job_skills',
+    db.Column('job_id', db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_job_skills_skill_id', 'skill_id', 'job_id'),
+)
+
+profile_skills = db.Table(
+    'profile_skills',
+    db.Column('profile_id', db.Integer, db.ForeignKey('profiles.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_profile_skills_skill_id', 'skill_id', 'profile_id'),
+)
+
+
 class Job(db.Model):
     """Job posting model"""
     
     __tablename__ = 'jobs'
+    __table_args__ = (
+        # Keyset pagination of public and per-employer listings
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_jobs_employer_created_at', 'employer_id', 'created_at', 'id'),
+        db.Index('ix_jobs_created_at', 'created_at', 'id'),
+        # Salary sorting and range filters on active listings
+        db.Index('ix_jobs_status_salary_min', 'status', 'salary_min'),
+        db.Index('ix_jobs_status_salary_max', 'status', 'salary_max'),
+        db.Index('ix_jobs_status_salary_floor', 'status', 'salary_floor'),
+        db.Index('ix_jobs_status_salary_ceiling', 'status', 'salary_ceiling'),
+        # Location filter and facet lookups on active listings
+        db.Index('ix_jobs_status_location_id', 'status', 'location_id'),
+        # Category counts and category listings on active listings
+        db.Index('ix_jobs_status_category', 'status', 'category', 'created_at'),
+        # "Most applied" ordering of active listings
+        db.Index('ix_jobs_status_applications_count', 'status', 'applications_count'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     company_name = db.Column(db.String(200), nullable=False)
     company_description = db.Column(db.Text, nullable=True)
-    location = db.Column(db.String(200), nullable=False)
+    location = db.Column(db.String(200), nullable=False)  # As entered by the employer
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True)  # Normalized on write
     salary = db.Column(db.String(100), nullable=True)  # Can be range or specific amount
-    salary_min = db.Column(db.Integer, nullable=True)
-    salary_max = db.Column(db.Integer, nullable=True)
+    salary_min = db.Column(db.Integer, nullable=True)  # Yearly, parsed from salary
+    salary_max = db.Column(db.Integer, nullable=True)  # Yearly, parsed from salary
+    salary_floor = db.Column(db.Integer, nullable=True)  # salary_min, 0 when open below (range filters)
+    salary_ceiling = db.Column(db.Integer, nullable=True)  # salary_max, OPEN_CEILING when open above (range filters)
+    salary_currency = db.Column(db.String(3), nullable=True)  # ISO code, e.g. USD, INR
+    salary_period = db.Column(db.String(10), nullable=True)  # Period quoted: hour, day, week, month, year
     job_type = db.Column(db.String(50), nullable=True)  # Full-time, Part-time, Contract, etc.
     experience_level = db.Column(db.String(50), nullable=True)  # Entry, Mid, Senior
+    category = db.Column(db.String(20), nullable=True)  # Classified on write, see services/categories.py
     required_skills = db.Column(db.Text, nullable=True)  # Comma-separated
     benefits = db.Column(db.Text, nullable=True)
     how_to_apply = db.Column(db.Text, nullable=True)
     application_email = db.Column(db.String(120), nullable=True)
     status = db.Column(db.String(20), default='active')  # active, closed, draft
     views_count = db.Column(db.Integer, default=0)
-    employer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    # All-time distinct viewers: HyperLogLog sketch and its estimate (see services/views.py)
+    viewer_sketch = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Application counters, maintained on write (see services/counters.py)
+    applications_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reviewed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    accepted_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    employer_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     deadline = db.Column(db.DateTime, nullable=True)
     
     # Relationships
     employer = db.relationship('User', back_populates='jobs', foreign_keys=[employer_id])
-    applications = db.relationship('Application', back_populates='job', cascade='all, delete-orphan')
+    canonical_location = db.relationship('Location')
+    skill_tags = db.relationship('Skill', secondary='job_skills', order_by='Skill.name')
+    applications = db.relationship('Application', back_populates='job', cascade='all, delete-orphan', passive_deletes=True)
+    
+    is_archived = False
     
     def __repr__(self):
         return f'<Job {self.title} at {self.company_name}>'
     
     @hybrid_property
     def application_count(self):
-        """Optimized application count using hybrid property - avoids loading full relationship"""
-        return len(self.applications)
+        """Number of applications, read from the maintained counter column"""
+        return self.applications_count
     
     @application_count.expression
     def application_count(cls):
         """SQL expression for application count (used in queries)"""
-        return db.select([db.func.count(Application.id)]).where(Application.job_id == cls.id).scalar_subquery()
+        return cls.applications_count
     
     def get_status_display(self):
         """Get human-readable status"""
@@ -152,31 +242,134 @@ class Job(db.Model):
     
     def get_applications_count(self):
         """Get total applications count"""
-        return len(self.applications)
+        return self.applications_count
     
     def get_applied_user_ids(self):
         """Get list of user IDs who applied"""
         return [app.jobseeker_id for app in self.applications]
 
 
+class JobSimilarity(db.Model):
+    """Precomputed nearest neighbours of a job by TF-IDF text similarity"""
+    
+    __tablename__ = 'job_similarity'
+    __table_args__ = (
+        # Top neighbours of one job, best first
+        db.Index('ix_job_similarity_job_score', 'job_id', 'score'),
+    )
+    
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    similar_job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)  # Cosine similarity, 0..1
+    
+    def __repr__(self):
+        return f'<JobSimilarity {self.job_id} -> {self.similar_job_id}>'
+
+
+class JobViewSketch(db.Model):
+    """HyperLogLog sketch of the distinct viewers of a job on one day"""
+    
+    __tablename__ = 'job_view_sketches'
+    
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC
+    registers = db.Column(db.LargeBinary, nullable=True)  # zlib-compressed registers
+    
+    def __repr__(self):
+        return f'<JobViewSketch {self.job_id} {self.day}>'
+
+
+class JobEvent(db.Model):
+    """Append-only log of job funnel events, compacted into JobFunnelDaily"""
+    
+    __tablename__ = 'job_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)  # No foreign key; events outlive their jobs
+    kind = db.Column(db.String(20), nullable=False)  # view, apply, withdraw, reviewed, accepted, rejected
+    count = db.Column(db.Integer, nullable=False, default=1)  # Views are logged per flush, not per request
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<JobEvent {self.kind} x{self.count} for Job {self.job_id}>'
+
+
+class JobFunnelDaily(db.Model):
+    """Per-job daily funnel counts aggregated from the event log"""
+    
+    __tablename__ = 'job_funnel_daily'
+    
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC
+    views = db.Column(db.Integer, nullable=False, default=0)
+    applications = db.Column(db.Integer, nullable=False, default=0)
+    withdrawals = db.Column(db.Integer, nullable=False, default=0)
+    reviewed = db.Column(db.Integer, nullable=False, default=0)
+    accepted = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<JobFunnelDaily {self.job_id} {self.day}>'
+
+
+class EventCursor(db.Model):
+    """How far an event log has been compacted"""
+    
+    __tablename__ = 'event_cursors'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(Job.salary, 'set')
+def normalize_salary(target, value, oldvalue, initiator):
+    """Keep the numeric salary columns in step with the free-text salary"""
+    parsed = parse_salary(value)
+    if parsed:
+        target.salary_min = parsed.min
+        target.salary_max = parsed.max
+        target.salary_currency = parsed.currency
+        target.salary_period = parsed.period
+    else:
+        target.salary_min = None
+        target.salary_max = None
+        target.salary_currency = None
+        target.salary_period = None
+    target.salary_floor, target.salary_ceiling = salary_bounds(parsed)
+
+
 class Application(db.Model):
     """Job application model"""
     
     __tablename__ = 'applications'
+    __table_args__ = (
+        # Keyset pagination of application listings
+        db.Index('ix_applications_applied_at', 'applied_at', 'id'),
+        db.Index('ix_applications_jobseeker_applied_at', 'jobseeker_id', 'applied_at', 'id'),
+        db.Index('ix_applications_job_applied_at', 'job_id', 'applied_at', 'id'),
+        # Applicants of a job ranked by match score
+        db.Index('ix_applications_job_match_score', 'job_id', 'match_score', 'id'),
+        # Which of a set of jobs a jobseeker applied to
+        db.Index('ix_applications_jobseeker_job', 'jobseeker_id', 'job_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
-    jobseeker_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+    jobseeker_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending')  # pending, reviewed, accepted, rejected
     cover_letter = db.Column(db.Text, nullable=True)
     additional_notes = db.Column(db.Text, nullable=True)
     applied_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    match_score = db.Column(db.Float, nullable=True)  # 0..1 fit to the job; NULL until scored
+    scored_at = db.Column(db.DateTime, nullable=True)
     
     # Relationships
     job = db.relationship('Job', back_populates='applications')
     jobseeker = db.relationship('User', back_populates='applications', foreign_keys=[jobseeker_id])
     
+    is_archived = False
+    
     def __repr__(self):
         return f'<Application {self.id} for Job {self.job_id}>'
     
@@ -190,3 +383,134 @@ class Application(db.Model):
         }
         return statuses.get(self.status, self.status)
 
+
+
+def _archive_columns(table, foreign_keys=None, skip=()):
+    """
+    Columns of an archive table: its own id, the row's id in the live table,
+    and copies of the live table's other columns.
+
+    SQLite hands the ids of deleted rows out again, so a live id only names
+    an archived row together with when it was archived. foreign_keys maps
+    column names to the column they reference in the archive; other foreign
+    keys are dropped.
+    """
+    foreign_keys = foreign_keys or {}
+    columns = [
+        db.Column('id', db.Integer, primary_key=True),
+        db.Column('original_id', db.Integer, nullable=False),  # Id in the live table when archived
+    ]
+    for column in table.columns:
+        if column.primary_key or column.name in skip:
+            continue
+        args = [db.ForeignKey(foreign_keys[column.name], ondelete='CASCADE')] if column.name in foreign_keys else []
+        columns.append(db.Column(column.name, column.type, *args, nullable=column.nullable))
+    return columns
+
+
+class ArchivedJob(db.Model):
+    """A job closed long ago, moved out of the jobs table with its applications (see services/archive.py)"""
+    
+    __table__ = db.Table(
+        'archived_jobs', db.metadata,
+        *_archive_columns(Job.__table__, {'employer_id': 'users.id'}, skip=('viewer_sketch',)),
+        db.Column('archived_at', db.DateTime, nullable=False, default=datetime.utcnow),
+        db.Index('ix_archived_jobs_employer_created_at', 'employer_id', 'created_at', 'id'),
+        db.Index('ix_archived_jobs_original_id', 'original_id'),
+        sqlite_autoincrement=True,
+    )
+    
+    is_archived = True
+    
+    # Relationships
+    employer = db.relationship('User')
+    applications = db.relationship('ArchivedApplication', back_populates='job', passive_deletes=True)
+    
+    def __repr__(self):
+        return f'<ArchivedJob {self.title} at {self.company_name}>'
+    
+    get_status_display = Job.get_status_display
+    get_applications_count = Job.get_applications_count
+
+
+class ArchivedApplication(db.Model):
+    """An application to an archived job"""
+    
+    __table__ = db.Table(
+        'archived_applications', db.metadata,
+        *_archive_columns(Application.__table__, {'job_id': 'archived_jobs.id', 'jobseeker_id': 'users.id'}),
+        db.Column('archived_at', db.DateTime, nullable=False, default=datetime.utcnow),
+        db.Index('ix_archived_applications_jobseeker_applied_at', 'jobseeker_id', 'applied_at', 'id'),
+        db.Index('ix_archived_applications_job_id', 'job_id'),
+        sqlite_autoincrement=True,
+    )
+    
+    is_archived = True
+    
+    # Relationships
+    job = db.relationship('ArchivedJob', back_populates='applications')
+    jobseeker = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<ArchivedApplication {self.id} for Job {self.job_id}>'
+    
+    get_status_display = Application.get_status_display
+
+
+class StatRollup(db.Model):
+    """Count of one dashboard event (new user, new job, status change, ...) per hour or day"""
+    
+    __tablename__ = 'stat_rollups'
+    __table_args__ = (
+        # All metrics of one granularity over a time range
+        db.Index('ix_stat_rollups_bucket', 'granularity', 'bucket'),
+    )
+    
+    # Primary key order serves range scans of one metric over time
+    granularity = db.Column(db.String(4), primary_key=True)  # hour, day
+    metric = db.Column(db.String(50), primary_key=True)  # e.g. users.new.employer, jobs.status.closed
+    bucket = db.Column(db.DateTime, primary_key=True)  # UTC start of the hour/day
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StatRollup {self.granularity} {self.metric} {self.bucket}: {self.count}>'
+
+
+class StatTotal(db.Model):
+    """Current row count of one dashboard population (users by role, jobs and applications by status)"""
+    
+    __tablename__ = 'stat_totals'
+    
+    metric = db.Column(db.String(50), primary_key=True)  # e.g. users.employer, jobs.active
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StatTotal {self.metric}: {self.value}>'
+
+
+class DeletionTask(db.Model):
+    """A user or job deletion too large for one request, run in the background (see services/deletion.py)"""
+    
+    __tablename__ = 'deletion_tasks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # user, job
+    target_id = db.Column(db.Integer, nullable=False)  # No foreign key; the task outlives its target
+    label = db.Column(db.String(200), nullable=False)  # What is deleted, for the progress page
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, running, done, failed
+    total = db.Column(db.Integer, nullable=False, default=0)  # Rows to delete, counted when queued
+    done = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<DeletionTask {self.kind} {self.target_id} ({self.status})>'
+    
+    @property
+    def percent(self):
+        """Progress in percent"""
+        if self.status == 'done':
+            return 100
+        return min(99, int(100 * self.done / self.total)) if self.total else 0
@@ -0,0 +1,42 @@
+"""
+Lightweight schema upgrades
+db.create_all() only creates missing tables. This brings existing databases
+up to date with columns and indexes added to the models later on.
+"""
+from sqlalchemy import inspect, text
+from extensions import db
+from services.rollups import seed_totals
+
+
+def upgrade_schema():
+    """Add missing columns and indexes to existing tables and seed missing totals. Must run inside an app context."""
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = 'ALTER TABLE {} ADD COLUMN {} {}'.format(table.name, column.name, column_type)
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = "'{}'".format(default.replace("'", "''"))
+                    ddl += ' DEFAULT {}'.format(default)
+                if column.foreign_keys and engine.dialect.name != 'sqlite':
+                    fk = next(iter(column.foreign_keys))
+                    ddl += ' REFERENCES {}({})'.format(fk.column.table.name, fk.column.name)
+                conn.execute(text(ddl))
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    # Dashboard and home page totals of databases created before they were kept
+    seed_totals()
@@ -0,0 +1,4 @@
+"""
+Services package
+Shared query, indexing and caching helpers used by the blueprints
+"""
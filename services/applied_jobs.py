@@ -0,0 +1,86 @@
+"""
+Applied-job lookups for "Already applied" badges
+A jobseeker's applied job ids are cached per user as a sorted int array
+(8 bytes per application) and dropped when they apply or withdraw. Listing
+pages only ask about the jobs on the page: from the cached array when it is
+warm, otherwise with one IN query over those jobs.
+"""
+from array import array
+from bisect import bisect_left
+from sqlalchemy import select
+from extensions import db
+from models import Application
+from services.cache import applied_cache
+from services.events import on_commit
+
+
+class JobIdSet:
+    """Sorted array of job ids supporting ``job_id in ids``"""
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, job_ids=()):
+        self._ids = array('q', sorted(set(job_ids)))
+
+    def __contains__(self, job_id):
+        index = bisect_left(self._ids, job_id)
+        return index < len(self._ids) and self._ids[index] == job_id
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def _key(user_id):
+    return 'applied:{}'.format(user_id)
+
+
+def _tag(user_id):
+    return ('applied', user_id)
+
+
+def applied_job_ids(user_id):
+    """All job ids the user applied to, as a cached JobIdSet"""
+    return applied_cache.get_or_set(
+        _key(user_id),
+        lambda: JobIdSet(db.session.execute(
+            select(Application.job_id).where(Application.jobseeker_id == user_id)
+        ).scalars()),
+        tags=(_tag(user_id),)
+    )
+
+
+def applied_among(user_id, job_ids):
+    """The subset of job_ids the user applied to, without loading all their applications"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return JobIdSet()
+    cached = applied_cache.peek(_key(user_id))
+    if cached is not None:
+        return JobIdSet(job_id for job_id in job_ids if job_id in cached)
+    return JobIdSet(db.session.execute(
+        select(Application.job_id).where(
+            Application.jobseeker_id == user_id,
+            Application.job_id.in_(job_ids)
+        )
+    ).scalars())
+
+
+@on_commit(Application)
+def _invalidate_applied_jobs(changes):
+    """Drop cached sets of users who applied or withdrew"""
+    user_ids = set()
+    for change in changes:
+        if change.op == 'update' and not change.changed & {'job_id', 'jobseeker_id'}:
+            continue
+        if 'jobseeker_id' not in change.values:
+            # Nothing loaded to attribute the change to
+            applied_cache.clear()
+            return
+        user_ids.add(change.values['jobseeker_id'])
+        if change.old.get('jobseeker_id') is not None:
+            user_ids.add(change.old['jobseeker_id'])
+    if user_ids:
+        applied_cache.invalidate(*(_tag(user_id) for user_id in user_ids))
@@ -0,0 +1,194 @@
+"""
+Archive of closed jobs
+Jobs closed for ARCHIVE_AFTER_DAYS days (not edited since they were closed)
+are moved with their applications out of the jobs and applications tables
+into archived_jobs and archived_applications, in batches, by
+`flask archive-jobs`. Listings, search, counters and their indexes then only
+carry rows that can still change; link and summary rows of the job (skills,
+similar jobs, view sketches, funnel aggregates) are dropped with it.
+
+Archived rows keep their column values under ids of their own; the live id
+is kept as original_id. SQLite reuses the ids of deleted live rows, so an
+archived row is always looked up in the archive explicitly, never by a live
+id. Pages showing history read through to the archive: an employer's jobs and applications and a jobseeker's
+applications in the admin views, the jobseeker's application history and
+employer dashboard counts. Dashboard totals keep counting archived rows.
+"""
+from datetime import datetime, timedelta
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import select, insert, delete, func, literal, union_all, and_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from extensions import db
+from models import Job, Application, ArchivedJob, ArchivedApplication
+
+ARCHIVE_AFTER_DAYS = 180
+
+
+def _copy_columns(archive, skip=()):
+    """Columns copied from the same-named live columns"""
+    return [
+        column.name for column in archive.__table__.columns
+        if column.name not in ('id', 'original_id', 'archived_at') + tuple(skip)
+    ]
+
+
+def archive_jobs(days=ARCHIVE_AFTER_DAYS, batch_size=500, echo=None):
+    """
+    Move jobs closed more than ``days`` days ago, with their applications, to the archive.
+
+    Each batch is copied and deleted in one transaction.
+
+    Returns:
+        (jobs archived, applications archived)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    jobs, applications = Job.__table__, Application.__table__
+    archived_jobs = ArchivedJob.__table__
+    job_columns = _copy_columns(ArchivedJob)
+    application_columns = _copy_columns(ArchivedApplication, skip=('job_id',))
+    jobs_archived = applications_archived = 0
+    while True:
+        with db.engine.begin() as conn:
+            job_ids = conn.execute(
+                select(jobs.c.id).where(
+                    jobs.c.status == 'closed',
+                    jobs.c.updated_at < cutoff
+                ).order_by(jobs.c.id).limit(batch_size).with_for_update()
+            ).scalars().all()
+            if not job_ids:
+                break
+
+            now = datetime.utcnow()
+            conn.execute(insert(archived_jobs).from_select(
+                job_columns + ['original_id', 'archived_at'],
+                select(*(jobs.c[name] for name in job_columns), jobs.c.id, literal(now))
+                .where(jobs.c.id.in_(job_ids))
+            ))
+            # Applications point at their job's new archive id
+            moved = conn.execute(insert(ArchivedApplication.__table__).from_select(
+                application_columns + ['job_id', 'original_id', 'archived_at'],
+                select(
+                    *(applications.c[name] for name in application_columns),
+                    archived_jobs.c.id, applications.c.id, literal(now)
+                ).select_from(applications.join(archived_jobs, and_(
+                    archived_jobs.c.original_id == applications.c.job_id,
+                    archived_jobs.c.archived_at == now
+                ))).where(applications.c.job_id.in_(job_ids))
+            )).rowcount
+            conn.execute(delete(applications).where(applications.c.job_id.in_(job_ids)))
+            conn.execute(delete(jobs).where(jobs.c.id.in_(job_ids)))
+
+        jobs_archived += len(job_ids)
+        applications_archived += moved
+        if echo:
+            echo('Archived {} jobs and {} applications...'.format(jobs_archived, applications_archived))
+        if len(job_ids) < batch_size:
+            break
+    return jobs_archived, applications_archived
+
+
+def _newest_first(rows):
+    return sorted(rows, key=lambda row: (row.created_at or datetime.min, row.id), reverse=True)
+
+
+def employer_history(employer_id):
+    """
+    An employer's live and archived jobs, and the applications to them.
+
+    Returns:
+        (jobs newest first, applications with job and applicant loaded)
+    """
+    jobs = Job.query.filter_by(employer_id=employer_id).all()
+    applications = Application.query.join(Job).filter(Job.employer_id == employer_id).options(
+        contains_eager(Application.job),
+        joinedload(Application.jobseeker)
+    ).all()
+    # Archived applications come with their jobs (no second query without archived jobs)
+    archived = ArchivedJob.query.filter_by(employer_id=employer_id).options(
+        selectinload(ArchivedJob.applications).joinedload(ArchivedApplication.jobseeker)
+    ).all()
+    applications += [application for job in archived for application in job.applications]
+    return _newest_first(jobs + archived), applications
+
+
+def jobseeker_applications(jobseeker_id):
+    """A jobseeker's live and archived applications with their jobs, newest first"""
+    applications = Application.query.filter_by(jobseeker_id=jobseeker_id).options(
+        joinedload(Application.job)
+    ).all()
+    applications += ArchivedApplication.query.filter_by(jobseeker_id=jobseeker_id).options(
+        joinedload(ArchivedApplication.job)
+    ).all()
+    return sorted(applications, key=lambda app: (app.applied_at or datetime.min, app.id), reverse=True)
+
+
+def get_application(app_id, archived=False):
+    """A live application by id, or an archived one by its archive id; None if there is none"""
+    return db.session.get(ArchivedApplication if archived else Application, app_id)
+
+
+def archived_job_stats(employer_id):
+    """
+    Counts of an employer's archived jobs, from their frozen counters.
+
+    Returns:
+        (jobs, applications, pending applications)
+    """
+    jobs, applications, pending = db.session.execute(
+        select(
+            func.count(ArchivedJob.id),
+            func.coalesce(func.sum(ArchivedJob.applications_count), 0),
+            func.coalesce(func.sum(ArchivedJob.pending_count), 0)
+        ).where(ArchivedJob.employer_id == employer_id)
+    ).one()
+    return jobs, int(applications), int(pending)
+
+
+class ApplicationHistory(Pagination):
+    """
+    A jobseeker's live and archived applications, newest first, one page at a time.
+
+    Ids of the page come from one UNION ALL over both tables that also
+    counts the rows; the applications are then loaded with their jobs.
+    """
+
+    def _keys(self):
+        jobseeker_id, status = self._query_args['jobseeker_id'], self._query_args['status']
+        selects = []
+        for model, archived in ((Application, False), (ArchivedApplication, True)):
+            query = select(model.applied_at, model.id, literal(archived).label('archived')).where(
+                model.jobseeker_id == jobseeker_id
+            )
+            if status:
+                query = query.where(model.status == status)
+            selects.append(query)
+        return union_all(*selects).subquery()
+
+    def _query_items(self):
+        keys = self._keys()
+        rows = db.session.execute(
+            select(keys.c.id, keys.c.archived, func.count().over().label('total'))
+            .order_by(keys.c.applied_at.desc(), keys.c.id.desc())
+            .limit(self.per_page).offset(self._query_offset)
+        ).all()
+        self._total = rows[0].total if rows else None
+
+        loaded = {}
+        for model, archived in ((Application, False), (ArchivedApplication, True)):
+            ids = [row.id for row in rows if bool(row.archived) == archived]
+            if ids:
+                for application in model.query.filter(model.id.in_(ids)).options(joinedload(model.job)):
+                    loaded[archived, application.id] = application
+        return [loaded[bool(row.archived), row.id] for row in rows if (bool(row.archived), row.id) in loaded]
+
+    def _query_count(self):
+        if self._total is not None:
+            return self._total
+        keys = self._keys()
+        return db.session.execute(select(func.count()).select_from(keys)).scalar()
+
+
+def application_history(jobseeker_id, status=None, page=1, per_page=10):
+    """Page of a jobseeker's live and archived applications, as a Flask-SQLAlchemy Pagination"""
+    return ApplicationHistory(page=page, per_page=per_page, error_out=False,
+                              jobseeker_id=jobseeker_id, status=status)
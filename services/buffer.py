@@ -0,0 +1,114 @@
+"""
+Write-behind buffers
+Requests record into an in-memory buffer; a background thread in each
+worker process writes the buffer in one transaction every
+WRITE_BEHIND_INTERVAL seconds, or as soon as WRITE_BEHIND_THRESHOLD records
+are pending. Buffers are also flushed on interpreter exit, so a graceful
+worker shutdown does not lose them.
+"""
+import abc
+import atexit
+import logging
+import os
+import threading
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+_buffers = []
+
+
+class WriteBehindBuffer(abc.ABC):
+    """
+    Base class for a per-process buffer flushed by a background thread.
+
+    Subclasses keep their pending records in attributes reset by _take(),
+    and record under self._lock: _ensure_flusher() before adding to them and
+    _recorded() after. They implement the abstract _take(), _write() and
+    _restore().
+    """
+
+    name = 'write-behind'
+
+    def __init__(self):
+        self.app = None
+        self.interval = 10
+        self.threshold = 500
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        _buffers.append(self)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('WRITE_BEHIND_INTERVAL', self.interval)
+        self.threshold = app.config.get('WRITE_BEHIND_THRESHOLD', self.threshold)
+
+    @abc.abstractmethod
+    def _take(self):
+        """Return the pending records and start an empty buffer (called under the lock)"""
+
+    @abc.abstractmethod
+    def _write(self, conn, batch):
+        """Write taken records in the flush transaction; returns the number written"""
+
+    @abc.abstractmethod
+    def _restore(self, batch):
+        """Put records from a failed flush back into the buffer (called under the lock)"""
+
+    def _recorded(self, count=1):
+        self._buffered += count
+        if self._buffered >= self.threshold:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write the buffered records in one transaction.
+
+        Returns:
+            Number of records written
+        """
+        with self._lock:
+            batch = self._take()
+            buffered, self._buffered = self._buffered, 0
+        if not batch or self.app is None:
+            return 0
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                return self._write(conn, batch)
+        except Exception:
+            logger.exception('Could not flush %s buffer; retrying later', self.name)
+            with self._lock:
+                self._restore(batch)
+                self._buffered += buffered
+            return 0
+
+    def after_flush(self):
+        """Hook run by the background thread after each flush"""
+
+    def _ensure_flusher(self):
+        # A forked worker inherits the parent's buffer but not its thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._take()
+            self._buffered = 0
+            self._thread = threading.Thread(target=self._run, name=self.name + '-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            try:
+                self.after_flush()
+            except Exception:
+                logger.exception('%s after-flush step failed', self.name)
+
+
+@atexit.register
+def _flush_on_exit():
+    for buffer in _buffers:
+        buffer.flush()
@@ -0,0 +1,211 @@
+"""
+Page and fragment caching for public views
+An in-process TTL cache with tag-based invalidation and a single-flight guard:
+on a miss, one thread computes the value while concurrent requests for the
+same key wait for its result instead of recomputing it. Entries are tagged
+with the models they are built from and dropped when those models change.
+
+The cache lives in each worker process; the TTL bounds how stale one worker
+can be after another worker's write.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response
+from flask_login import current_user
+from models import Job, Application, User
+from services.events import on_commit
+
+# Seconds a waiting request blocks on another thread's computation before
+# computing the value itself
+SINGLE_FLIGHT_TIMEOUT = 10
+
+
+class _Flight:
+    """A computation in progress that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+
+
+class Cache:
+    """
+    TTL + LRU cache of computed values, keyed by string, invalidated by tag.
+
+    Usage:
+        value = cache.get_or_set('home:stats', compute_stats, tags=(Job, User))
+    """
+
+    def __init__(self, name, ttl=60, maxsize=512):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, generation, tags, value)
+        self._flights = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'invalidations': 0, 'evictions': 0}
+
+    def _generation(self, tags):
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get_or_set(self, key, compute, ttl=None, tags=()):
+        """Return the cached value for key, computing it at most once per miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == self._generation(entry[2]):
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[3]
+            self.stats['misses'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            generation = self._generation(tags)
+
+        if not leader:
+            flight.done.wait(SINGLE_FLIGHT_TIMEOUT)
+            if flight.ok:
+                with self._lock:
+                    self.stats['waits'] += 1
+                return flight.value
+            return compute()
+
+        try:
+            value = compute()
+            flight.value = value
+            flight.ok = True
+            with self._lock:
+                # Skip storing if the data changed while we were computing
+                if generation == self._generation(tags):
+                    self._entries[key] = (time.time() + (ttl or self.ttl), generation, tuple(tags), value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.stats['evictions'] += 1
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def peek(self, key):
+        """Return the cached value for key, or None; never computes it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time() and entry[1] == self._generation(entry[2]):
+                self.stats['hits'] += 1
+                return entry[3]
+        return None
+
+    def invalidate(self, *tags):
+        """Drop every entry built from any of the given tags"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if set(entry[2]) & set(tags)]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Hit/miss counters, hit ratio and current size"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, name=self.name, size=len(self._entries), maxsize=self.maxsize,
+                        ttl=self.ttl, hit_ratio=round(self.stats['hits'] / lookups, 3) if lookups else None)
+
+
+# Whole anonymous pages, and fragments/data shared by every visitor
+page_cache = Cache('pages', ttl=60, maxsize=256)
+fragment_cache = Cache('fragments', ttl=60, maxsize=512)
+
+# Per-user dashboard statistics, invalidated by their owners' writes
+stats_cache = Cache('stats', ttl=300, maxsize=2048)
+
+# Per-user sets of applied job ids
+applied_cache = Cache('applied-jobs', ttl=600, maxsize=4096)
+
+# Signed-in user identities; the TTL bounds how long another worker keeps
+# serving a changed or deleted user
+identity_cache = Cache('identities', ttl=60, maxsize=10000)
+
+CACHES = (page_cache, fragment_cache, stats_cache, applied_cache, identity_cache)
+
+# The models public pages are built from
+PUBLIC_MODELS = (Job, Application, User)
+
+# Updates that only touch these columns do not change any public page
+_UNRENDERED_COLUMNS = {
+    Job: frozenset({'views_count', 'updated_at'}),
+    User: frozenset({'name', 'email', 'password_hash', 'updated_at'}),
+    # Public pages only count applications
+    Application: frozenset(column.key for column in Application.__table__.columns),
+}
+
+
+@on_commit(*PUBLIC_MODELS)
+def _invalidate_public_pages(changes):
+    """Drop cached pages and fragments built from the committed models"""
+    models = set()
+    for change in changes:
+        if change.op == 'update' and change.changed <= _UNRENDERED_COLUMNS.get(change.model, frozenset()):
+            continue
+        models.add(change.model)
+    if models:
+        for cache in (page_cache, fragment_cache):
+            cache.invalidate(*models)
+
+
+class _Uncacheable(Exception):
+    """Raised from a page render whose response must not be cached"""
+
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+
+
+def cached_page(tags=PUBLIC_MODELS, ttl=None):
+    """
+    Cache a view's response for anonymous GET requests.
+
+    Logged-in users, requests with pending flash messages and non-200
+    responses are never cached. Responses carry an ``X-Cache: HIT/MISS`` header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or current_user.is_authenticated or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            rendered = {}
+
+            def render():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    raise _Uncacheable(response)
+                rendered['response'] = response
+                return response.get_data(), response.mimetype
+
+            try:
+                body, mimetype = page_cache.get_or_set('page:' + request.full_path, render, ttl=ttl, tags=tags)
+            except _Uncacheable as exc:
+                return exc.response
+
+            response = rendered.get('response')
+            if response is None:
+                response = make_response(body)
+                response.mimetype = mimetype
+            response.headers['X-Cache'] = 'MISS' if rendered else 'HIT'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,110 @@
+"""
+Job category taxonomy
+Each job is classified into exactly one category when it is created or its
+title or skills change, and the key is stored in the indexed ``Job.category``
+column. Category counts are then one GROUP BY and category listings one
+indexed filter, instead of substring scans over every title.
+"""
+import re
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Job
+
+# key, label, Bootstrap icon, colour, title keywords
+CATEGORIES = [
+    ('it', 'IT & Software', 'bi-code-slash', 'primary', (
+        'developer', 'engineer', 'engineering', 'programmer', 'software', 'devops', 'sre',
+        'architect', 'tech', 'technical', 'technology', 'it', 'data', 'scientist', 'analyst',
+        'qa', 'tester', 'frontend', 'backend', 'fullstack', 'full-stack', 'web', 'mobile',
+        'android', 'ios', 'cloud', 'security', 'network', 'database', 'dba', 'sysadmin',
+        'administrator', 'python', 'java', 'javascript', 'ml', 'ai',
+    )),
+    ('marketing', 'Marketing', 'bi-megaphone', 'success', (
+        'marketing', 'marketer', 'advertising', 'brand', 'seo', 'sem', 'content', 'copywriter',
+        'social', 'media', 'campaign', 'growth', 'pr', 'communications',
+    )),
+    ('sales', 'Sales', 'bi-currency-dollar', 'warning', (
+        'sales', 'salesperson', 'account', 'business', 'bdr', 'sdr', 'representative',
+        'retail', 'customer', 'partnerships',
+    )),
+    ('design', 'Design', 'bi-palette', 'danger', (
+        'design', 'designer', 'creative', 'ui', 'ux', 'graphic', 'illustrator', 'artist',
+        'animator', 'visual',
+    )),
+    ('finance', 'Finance', 'bi-bank', 'info', (
+        'finance', 'financial', 'accounting', 'accountant', 'bank', 'banking', 'auditor',
+        'audit', 'tax', 'controller', 'bookkeeper', 'treasury', 'investment', 'actuary',
+    )),
+]
+
+OTHER = 'other'
+
+CATEGORY_LABELS = {key: label for key, label, icon, colour, keywords in CATEGORIES}
+CATEGORY_LABELS[OTHER] = 'Other'
+
+# Whole titles (or title endings) that keyword scoring gets wrong
+PHRASES = {
+    'sales engineer': 'sales',
+    'solutions engineer': 'sales',
+    'account executive': 'sales',
+    'account manager': 'sales',
+    'business analyst': 'it',
+    'marketing analyst': 'marketing',
+    'financial analyst': 'finance',
+    'product designer': 'design',
+}
+
+# The last word of a title names the role ("Sales Engineer" is an engineer
+# by keyword, so phrases above take precedence), so later words weigh more.
+HEAD_WEIGHT = 3
+MODIFIER_WEIGHT = 2
+SKILL_WEIGHT = 1
+
+_KEYWORDS = {}
+for _key, _label, _icon, _colour, _words in CATEGORIES:
+    for _word in _words:
+        _KEYWORDS.setdefault(_word, _key)
+
+_WORD_RE = re.compile(r'[a-z][a-z0-9+#-]*')
+
+
+def classify(title, skills=None):
+    """
+    Pick the category of a job.
+
+    Returns:
+        A category key from CATEGORIES, or OTHER
+    """
+    words = _WORD_RE.findall((title or '').lower())
+    text = ' '.join(words)
+    for phrase, key in PHRASES.items():
+        if text == phrase or text.endswith(' ' + phrase):
+            return key
+
+    scores = {}
+    for position, word in enumerate(words):
+        key = _KEYWORDS.get(word)
+        if key:
+            weight = HEAD_WEIGHT if position == len(words) - 1 else MODIFIER_WEIGHT
+            scores[key] = scores.get(key, 0) + weight
+    for word in _WORD_RE.findall((skills or '').lower()):
+        key = _KEYWORDS.get(word)
+        if key:
+            scores[key] = scores.get(key, 0) + SKILL_WEIGHT
+
+    if not scores:
+        return OTHER
+    order = [key for key, label, icon, colour, keywords in CATEGORIES]
+    return max(scores, key=lambda key: (scores[key], -order.index(key)))
+
+
+@event.listens_for(Session, 'before_flush')
+def _classify_jobs(session, flush_context, instances):
+    """Classify new jobs and jobs whose title or skills were edited"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Job):
+            continue
+        attrs = inspect(obj).attrs
+        if (obj in session.new or attrs.title.history.has_changes()
+                or attrs.required_skills.history.has_changes()):
+            obj.category = classify(obj.title, obj.required_skills)
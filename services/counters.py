@@ -0,0 +1,134 @@
+"""
+Per-job application counters
+``Job.applications_count`` and the per-status ``<status>_count`` columns are
+adjusted with relative UPDATEs in the transaction that adds, deletes or
+changes the status of an application, so listings can show and sort by them
+without counting applications. ``reconcile_application_counts`` repairs drift
+left by writes that bypass the ORM.
+"""
+from collections import Counter
+from sqlalchemy import event, inspect, select, update, bindparam, func
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Job, Application
+from services.events import committed_value
+
+# Application statuses with a counter column on Job
+STATUSES = ('pending', 'reviewed', 'accepted', 'rejected')
+
+COUNTER_COLUMNS = ('applications_count',) + tuple(status + '_count' for status in STATUSES)
+
+
+def _deltas(status, sign):
+    """Counter changes for adding (sign=1) or removing (sign=-1) an application"""
+    deltas = {'applications_count': sign}
+    if status in STATUSES:
+        deltas[status + '_count'] = sign
+    return deltas
+
+
+@event.listens_for(Session, 'before_flush')
+def _count_applications(session, flush_context, instances):
+    """Adjust the counters of jobs whose applications were added, removed or changed status"""
+    by_job = {}
+    pending_jobs = {}
+
+    def add(application, deltas):
+        if application.job_id is not None:
+            counts = by_job.setdefault(application.job_id, Counter())
+        elif application.job is not None:
+            # The job is inserted in this flush too; count on the object
+            counts = pending_jobs.setdefault(application.job, Counter())
+        else:
+            return
+        counts.update(deltas)
+
+    for obj in session.new:
+        if isinstance(obj, Application):
+            add(obj, _deltas(obj.status or 'pending', 1))
+
+    for obj in session.dirty:
+        if isinstance(obj, Application):
+            history = inspect(obj).attrs.status.history
+            if not history.added:
+                continue
+            old, new = committed_value(obj, 'status'), history.added[0]
+            if old != new:
+                deltas = Counter(_deltas(new, 1))
+                deltas.update(_deltas(old, -1))
+                add(obj, deltas)
+
+    deleted_jobs = {obj.id for obj in session.deleted if isinstance(obj, Job)}
+    for obj in session.deleted:
+        if isinstance(obj, Application) and obj.job_id not in deleted_jobs:
+            add(obj, _deltas(committed_value(obj, 'status'), -1))
+
+    for job, counts in pending_jobs.items():
+        for column, delta in counts.items():
+            setattr(job, column, (getattr(job, column) or 0) + delta)
+
+    jobs = Job.__table__
+    conn = None
+    for job_id, counts in by_job.items():
+        values = {column: jobs.c[column] + delta for column, delta in counts.items() if delta}
+        if not values:
+            continue
+        conn = conn or session.connection()
+        conn.execute(
+            # Counting applications is not an edit of the job
+            update(jobs).where(jobs.c.id == job_id).values(updated_at=jobs.c.updated_at, **values)
+        )
+
+
+def reconcile_application_counts(batch_size=1000, echo=None):
+    """
+    Recount the application counters of every job and fix the ones that drifted.
+
+    Returns:
+        (jobs checked, jobs corrected)
+    """
+    jobs = Job.__table__
+    fix = update(jobs).where(jobs.c.id == bindparam('job_id')).values(
+        updated_at=jobs.c.updated_at,
+        **{column: bindparam('new_' + column) for column in COUNTER_COLUMNS}
+    )
+
+    last_id = 0
+    checked = 0
+    corrected = 0
+    while True:
+        stored = db.session.execute(
+            select(jobs.c.id, *(jobs.c[column] for column in COUNTER_COLUMNS))
+            .where(jobs.c.id > last_id).order_by(jobs.c.id).limit(batch_size)
+        ).all()
+        if not stored:
+            break
+        first_id, last_id = stored[0][0], stored[-1][0]
+
+        actual = {}
+        for job_id, status, count in db.session.execute(
+            select(Application.job_id, Application.status, func.count())
+            .where(Application.job_id.between(first_id, last_id))
+            .group_by(Application.job_id, Application.status)
+        ):
+            counts = actual.setdefault(job_id, dict.fromkeys(COUNTER_COLUMNS, 0))
+            counts['applications_count'] += count
+            if status in STATUSES:
+                counts[status + '_count'] += count
+
+        params = []
+        for row in stored:
+            counts = actual.get(row[0], dict.fromkeys(COUNTER_COLUMNS, 0))
+            if tuple(row[1:]) != tuple(counts[column] for column in COUNTER_COLUMNS):
+                params.append(dict(
+                    {'new_' + column: counts[column] for column in COUNTER_COLUMNS}, job_id=row[0]
+                ))
+        if params:
+            db.session.execute(fix, params)
+        db.session.commit()
+
+        checked += len(stored)
+        corrected += len(params)
+        if echo:
+            echo('Checked {} jobs, corrected {}...'.format(checked, corrected))
+    return checked, corrected
@@ -0,0 +1,337 @@
+"""
+Set-based deletion of users and jobs
+A user or job is deleted with a few DELETE ... WHERE statements per batch of
+rows instead of loading and deleting each dependent object through the ORM.
+Applications, jobs (live and archived) and profiles are deleted explicitly,
+children first, so
+databases created before their foreign keys were declared ON DELETE CASCADE
+work too; skill links, similar jobs and view/funnel aggregates go with their
+job or profile through the database cascade.
+
+What the ORM hooks do per object is done per batch: dashboard totals and
+per-job application counters are adjusted in the same transaction, and the
+deleted rows are queued with record_change so caches and in-memory indexes
+drop them on commit.
+
+Deletions of more than DELETE_INLINE_LIMIT rows are queued as a DeletionTask
+and run in a background thread, committing and recording progress after
+every batch. Tasks interrupted by a restart are finished with
+`flask resume-deletions`.
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, delete, update, bindparam, func
+from extensions import db
+from models import User, Profile, Job, Application, ArchivedJob, ArchivedApplication, DeletionTask
+from services.counters import STATUSES, COUNTER_COLUMNS
+from services.events import record_change
+from services.rollups import record_events
+
+logger = logging.getLogger(__name__)
+
+# Deletions of more rows than this run in the background
+DELETE_INLINE_LIMIT = 2000
+
+# Rows deleted per transaction
+DELETE_BATCH_SIZE = 1000
+
+# Tasks not finished yet, or to retry
+UNFINISHED = ('pending', 'running', 'failed')
+
+# Columns of deleted rows handed to the commit hooks
+_JOB_COLUMNS = (Job.id, Job.employer_id, Job.status, Job.title, Job.company_name, Job.location_id)
+_APPLICATION_COLUMNS = (Application.id, Application.job_id, Application.jobseeker_id, Application.status)
+
+
+def _delete_applications(session, where, batch_size):
+    """Delete one batch of the applications matching where; returns the number deleted"""
+    rows = session.execute(
+        select(*_APPLICATION_COLUMNS).where(where).order_by(Application.id).limit(batch_size).with_for_update()
+    ).all()
+    if not rows:
+        return 0
+
+    totals = Counter()
+    by_job = {}
+    for row in rows:
+        totals['applications.{}'.format(row.status)] -= 1
+        counts = by_job.setdefault(row.job_id, Counter())
+        counts['applications_count'] += 1
+        if row.status in STATUSES:
+            counts[row.status + '_count'] += 1
+        record_change(session, 'delete', Application, row.id, row._asdict())
+
+    conn = session.connection()
+    jobs = Job.__table__
+    conn.execute(
+        # Counting applications is not an edit of the job
+        update(jobs).where(jobs.c.id == bindparam('b_job_id')).values(
+            updated_at=jobs.c.updated_at,
+            **{column: jobs.c[column] - bindparam('b_' + column) for column in COUNTER_COLUMNS}
+        ),
+        [
+            dict({'b_' + column: counts[column] for column in COUNTER_COLUMNS}, b_job_id=job_id)
+            for job_id, counts in sorted(by_job.items())
+        ]
+    )
+    conn.execute(delete(Application.__table__).where(Application.id.in_([row.id for row in rows])))
+    record_events(conn, totals=totals)
+    return len(rows)
+
+
+def _delete_jobs(session, where, batch_size):
+    """Delete one batch of the jobs matching where, with any applications left; returns the rows deleted"""
+    rows = session.execute(
+        select(*_JOB_COLUMNS).where(where).order_by(Job.id).limit(batch_size).with_for_update()
+    ).all()
+    if not rows:
+        return 0
+    job_ids = [row.id for row in rows]
+
+    # Applications made since the jobs' applications were deleted
+    deleted = 0
+    while True:
+        count = _delete_applications(session, Application.job_id.in_(job_ids), batch_size)
+        if not count:
+            break
+        deleted += count
+
+    totals = Counter()
+    for row in rows:
+        totals['jobs.{}'.format(row.status)] -= 1
+        record_change(session, 'delete', Job, row.id, row._asdict())
+    conn = session.connection()
+    conn.execute(delete(Job.__table__).where(Job.id.in_(job_ids)))
+    record_events(conn, totals=totals)
+    return deleted + len(rows)
+
+
+def _delete_archived(session, model, where, batch_size):
+    """Delete one batch of archived jobs or applications; they only count in the dashboard totals"""
+    rows = session.execute(
+        select(model.id, model.status).where(where).order_by(model.id).limit(batch_size).with_for_update()
+    ).all()
+    if not rows:
+        return 0
+    ids = [row.id for row in rows]
+
+    deleted = 0
+    if model is ArchivedJob:
+        while True:
+            count = _delete_archived(session, ArchivedApplication, ArchivedApplication.job_id.in_(ids), batch_size)
+            if not count:
+                break
+            deleted += count
+
+    prefix = 'jobs' if model is ArchivedJob else 'applications'
+    conn = session.connection()
+    conn.execute(delete(model.__table__).where(model.id.in_(ids)))
+    record_events(conn, totals=Counter({
+        '{}.{}'.format(prefix, status): -count for status, count in Counter(row.status for row in rows).items()
+    }))
+    return deleted + len(rows)
+
+
+def _delete_user(session, user_id):
+    """Delete a user's profile and user row; returns the number of users deleted"""
+    role = session.execute(select(User.role).where(User.id == user_id).with_for_update()).scalar()
+    if role is None:
+        return 0
+    conn = session.connection()
+    profile_id = session.execute(select(Profile.id).where(Profile.user_id == user_id)).scalar()
+    if profile_id is not None:
+        record_change(session, 'delete', Profile, profile_id, {'id': profile_id, 'user_id': user_id})
+        conn.execute(delete(Profile.__table__).where(Profile.id == profile_id))
+    record_change(session, 'delete', User, user_id, {'id': user_id, 'role': role})
+    conn.execute(delete(User.__table__).where(User.id == user_id))
+    record_events(conn, totals=Counter({'users.{}'.format(role): -1}))
+    return 1
+
+
+def _stages(session, kind, target_id, batch_size):
+    """Batch deletions to repeat, in order, until each deletes nothing"""
+    if kind == 'job':
+        return [
+            lambda: _delete_applications(session, Application.job_id == target_id, batch_size),
+            lambda: _delete_jobs(session, Job.id == target_id, batch_size),
+        ]
+    employer_jobs = select(Job.id).where(Job.employer_id == target_id).scalar_subquery()
+    archived_jobs = select(ArchivedJob.id).where(ArchivedJob.employer_id == target_id).scalar_subquery()
+    return [
+        lambda: _delete_applications(session, Application.job_id.in_(employer_jobs), batch_size),
+        lambda: _delete_jobs(session, Job.employer_id == target_id, batch_size),
+        lambda: _delete_applications(session, Application.jobseeker_id == target_id, batch_size),
+        # After the live rows, so rows archived meanwhile are deleted too
+        lambda: _delete_archived(session, ArchivedApplication, ArchivedApplication.job_id.in_(archived_jobs), batch_size),
+        lambda: _delete_archived(session, ArchivedJob, ArchivedJob.employer_id == target_id, batch_size),
+        lambda: _delete_archived(session, ArchivedApplication, ArchivedApplication.jobseeker_id == target_id, batch_size),
+        lambda: _delete_user(session, target_id),
+    ]
+
+
+def _delete_in_batches(kind, target_id, batch_size, progress=None):
+    """
+    Delete a user or job batch by batch, one transaction per batch.
+
+    Args:
+        progress: Optional callback given the rows deleted by a batch, run
+            in the batch's transaction
+
+    Returns:
+        Number of rows deleted
+    """
+    session = db.session
+    deleted = 0
+    for stage in _stages(session, kind, target_id, batch_size):
+        while True:
+            count = stage()
+            if count and progress:
+                progress(count)
+            session.commit()
+            if not count:
+                break
+            deleted += count
+    return deleted
+
+
+def _count_rows(kind, target_id):
+    """Rows a deletion will remove, from the application counters"""
+    if kind == 'job':
+        applications = db.session.execute(select(Job.applications_count).where(Job.id == target_id)).scalar()
+        return 1 + (applications or 0)
+    jobs, job_applications = db.session.execute(
+        select(func.count(Job.id), func.sum(Job.applications_count)).where(Job.employer_id == target_id)
+    ).one()
+    archived_jobs, archived_job_applications = db.session.execute(
+        select(func.count(ArchivedJob.id), func.sum(ArchivedJob.applications_count))
+        .where(ArchivedJob.employer_id == target_id)
+    ).one()
+    applications = db.session.execute(select(
+        select(func.count(Application.id)).where(Application.jobseeker_id == target_id).scalar_subquery()
+        + select(func.count(ArchivedApplication.id)).where(ArchivedApplication.jobseeker_id == target_id)
+        .scalar_subquery()
+    )).scalar()
+    return 1 + jobs + (job_applications or 0) + archived_jobs + (archived_job_applications or 0) + applications
+
+
+def _delete(kind, target_id, label):
+    """Delete now, or queue and start a background task when the deletion is large"""
+    config = current_app.config
+    total = _count_rows(kind, target_id)
+    if total <= config.get('DELETE_INLINE_LIMIT', DELETE_INLINE_LIMIT):
+        _delete_in_batches(kind, target_id, config.get('DELETE_BATCH_SIZE', DELETE_BATCH_SIZE))
+        return None
+
+    task = DeletionTask.query.filter(
+        DeletionTask.kind == kind, DeletionTask.target_id == target_id, DeletionTask.status.in_(UNFINISHED)
+    ).first()
+    if task is None:
+        task = DeletionTask(kind=kind, target_id=target_id, label=label[:200], total=total)
+        db.session.add(task)
+        db.session.commit()
+    elif task.status != 'running':
+        task.status = 'pending'
+        db.session.commit()
+    else:
+        # Already being deleted
+        return task
+    start_task(task.id)
+    return task
+
+
+def delete_user(user, label=None):
+    """
+    Delete a user with their profile, jobs, and applications made by or to them.
+
+    Returns:
+        None when the user was deleted, or the DeletionTask deleting them in the background
+    """
+    return _delete('user', user.id, label or '{} ({})'.format(user.name, user.email))
+
+
+def delete_job(job, label=None):
+    """
+    Delete a job with its applications.
+
+    Returns:
+        None when the job was deleted, or the DeletionTask deleting it in the background
+    """
+    return _delete('job', job.id, label or '{} at {}'.format(job.title, job.company_name))
+
+
+def run_task(task_id, batch_size=None):
+    """
+    Run a queued or interrupted deletion task to completion. Must run inside an app context.
+
+    Returns:
+        The task, or None if there is no such task
+    """
+    session = db.session
+    task = session.get(DeletionTask, task_id)
+    if task is None or task.status == 'done':
+        return task
+    task.status = 'running'
+    task.error = None
+    session.commit()
+
+    tasks = DeletionTask.__table__
+
+    def progress(count):
+        session.execute(
+            update(tasks).where(tasks.c.id == task_id).values(done=tasks.c.done + count, updated_at=datetime.utcnow())
+        )
+
+    try:
+        _delete_in_batches(task.kind, task.target_id,
+                           batch_size or current_app.config.get('DELETE_BATCH_SIZE', DELETE_BATCH_SIZE), progress)
+    except Exception as e:
+        session.rollback()
+        logger.exception('Deletion task %s failed', task_id)
+        task = session.get(DeletionTask, task_id)
+        task.status = 'failed'
+        task.error = str(e)[:1000]
+    else:
+        task = session.get(DeletionTask, task_id)
+        task.status = 'done'
+        task.done = max(task.done, task.total)
+        task.finished_at = datetime.utcnow()
+    session.commit()
+    return task
+
+
+def _run_in_thread(app, task_id):
+    with app.app_context():
+        run_task(task_id)
+
+
+def start_task(task_id):
+    """Run a deletion task in a background thread of this worker"""
+    thread = threading.Thread(
+        target=_run_in_thread, args=(current_app._get_current_object(), task_id),
+        name='deletion-{}'.format(task_id), daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def resume_tasks(echo=None):
+    """
+    Run every unfinished or failed deletion task in this process.
+
+    Returns:
+        Number of tasks completed
+    """
+    completed = 0
+    task_ids = db.session.execute(
+        select(DeletionTask.id).where(DeletionTask.status.in_(UNFINISHED)).order_by(DeletionTask.id)
+    ).scalars().all()
+    for task_id in task_ids:
+        task = run_task(task_id)
+        if echo:
+            echo('Task {}: {} {} ({}), {} rows, {}'.format(
+                task.id, task.kind, task.target_id, task.label, task.done, task.status))
+        completed += task.status == 'done'
+    return completed
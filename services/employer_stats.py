@@ -0,0 +1,99 @@
+"""
+Employer dashboard statistics
+Job and application counts of one employer from a single grouped query over
+their jobs joined to applications, plus the frozen counters of their
+archived jobs, cached per employer until one of their jobs or applications
+changes.
+"""
+from sqlalchemy import select, case, func
+from extensions import db
+from models import Job, Application
+from services.archive import archived_job_stats
+from services.cache import stats_cache
+from services.events import on_commit
+
+
+def _tag(employer_id):
+    return ('employer', employer_id)
+
+
+def _count_stats(employer_id):
+    """Job and application counts per job status in one GROUP BY"""
+    rows = db.session.execute(
+        select(
+            Job.status,
+            func.count(func.distinct(Job.id)),
+            func.count(Application.id),
+            func.coalesce(func.sum(case((Application.status == 'pending', 1), else_=0)), 0)
+        )
+        .select_from(Job)
+        .outerjoin(Application, Application.job_id == Job.id)
+        .where(Job.employer_id == employer_id)
+        .group_by(Job.status)
+    ).all()
+
+    stats = {
+        'total_jobs': 0,
+        'active_jobs': 0,
+        'closed_jobs': 0,
+        'total_applications': 0,
+        'pending_apps': 0,
+    }
+    for status, jobs, applications, pending in rows:
+        stats['total_jobs'] += jobs
+        if status in ('active', 'closed'):
+            stats[status + '_jobs'] = jobs
+        stats['total_applications'] += applications
+        stats['pending_apps'] += int(pending)
+
+    # Archived jobs are all closed
+    jobs, applications, pending = archived_job_stats(employer_id)
+    stats['total_jobs'] += jobs
+    stats['closed_jobs'] += jobs
+    stats['total_applications'] += applications
+    stats['pending_apps'] += pending
+    return stats
+
+
+def employer_stats(employer_id):
+    """
+    Dashboard counts of an employer's jobs and applications.
+
+    Returns:
+        Dict with total_jobs, active_jobs, closed_jobs, total_applications and pending_apps
+    """
+    return stats_cache.get_or_set(
+        'employer:{}'.format(employer_id),
+        lambda: _count_stats(employer_id),
+        tags=(_tag(employer_id),)
+    )
+
+
+@on_commit(Job, Application)
+def _invalidate_employer_stats(changes):
+    """Drop cached stats of employers whose jobs or applications changed"""
+    employer_ids = set()
+    job_ids = set()
+    for change in changes:
+        if change.op == 'update' and 'status' not in change.changed:
+            continue
+        if change.model is Job:
+            if 'employer_id' in change.values:
+                employer_ids.add(change.values['employer_id'])
+            else:
+                job_ids.add(change.id)
+        elif 'job_id' in change.values:
+            job_ids.add(change.values['job_id'])
+        else:
+            # Nothing loaded to attribute the change to
+            stats_cache.clear()
+            return
+
+    if job_ids:
+        # The committing session must not be used here; jobs never change owner
+        with db.engine.connect() as conn:
+            employer_ids.update(conn.execute(
+                select(Job.employer_id).where(Job.id.in_(job_ids))
+            ).scalars())
+    if employer_ids:
+        stats_cache.invalidate(*(_tag(employer_id) for employer_id in employer_ids))
@@ -0,0 +1,111 @@
+"""
+Commit hooks for model changes
+Collects rows inserted, updated or deleted during a flush and hands them to
+registered callbacks once the transaction commits, so caches and in-memory
+indexes only ever see committed data.
+"""
+from collections import namedtuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+# op is 'insert', 'update' or 'delete'; values holds the loaded column values
+# after the change, changed names the modified columns and old holds their
+# previous values where they were loaded before being overwritten.
+Change = namedtuple('Change', ['op', 'model', 'id', 'values', 'old', 'changed'])
+
+_callbacks = []
+
+
+def on_commit(*models):
+    """
+    Register a callback for committed changes to the given models.
+
+    Usage:
+        @on_commit(Job)
+        def invalidate(changes):
+            ...
+
+    The callback receives a list of Change tuples. It runs after COMMIT, so it
+    must not use the committing session to emit SQL.
+    """
+    def decorator(fn):
+        _callbacks.append((models, fn))
+        return fn
+    return decorator
+
+
+def record_change(session, op, model, id, values=None, old=None):
+    """Queue a change made outside the ORM unit of work (e.g. a bulk UPDATE/DELETE)"""
+    old = old or {}
+    session.info.setdefault('model_changes', []).append(
+        Change(op, model, id, values or {}, old, frozenset(old))
+    )
+
+
+def committed_value(obj, key):
+    """The value of an attribute as currently stored in the database, loading it if needed"""
+    state = inspect(obj)
+    history = state.attrs[key].load_history()
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    if state.identity is None:
+        return None
+    # Overwritten before its old value was ever loaded; read it from the row
+    mapper = state.mapper
+    return state.session.connection().execute(
+        select(mapper.columns[key]).where(*(
+            column == value for column, value in zip(mapper.primary_key, state.identity)
+        ))
+    ).scalar()
+
+
+def _snapshot(obj):
+    """Loaded column values, modified columns and their previous values, without triggering loads"""
+    state = inspect(obj)
+    values = {}
+    old = {}
+    changed = set()
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in state.dict:
+            values[key] = state.dict[key]
+        history = state.attrs[key].history
+        if history.added:
+            changed.add(key)
+        if history.deleted:
+            old[key] = history.deleted[0]
+    # New objects only get an identity key after the flush completes
+    obj_id = state.identity[0] if state.identity else values.get('id')
+    return obj_id, values, old, frozenset(changed)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    """Snapshot flushed objects while their pre-flush state is still available"""
+    pending = session.info.setdefault('model_changes', [])
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            if op == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            obj_id, values, old, changed = _snapshot(obj)
+            pending.append(Change(op, type(obj), obj_id, values, old, changed))
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    """Hand committed changes to the registered callbacks"""
+    changes = session.info.pop('model_changes', None)
+    if not changes:
+        return
+    for models, fn in _callbacks:
+        relevant = [change for change in changes if issubclass(change.model, models)]
+        if relevant:
+            fn(relevant)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    """Forget changes from a rolled-back transaction"""
+    session.info.pop('model_changes', None)
@@ -0,0 +1,135 @@
+"""
+Faceted counts for the job listings
+Counts for category, job type, experience level, canonical location and salary band are computed
+for the current filter set in a single statement over the filtered jobs, then
+cached per filter set until a Job row changes. Each facet is counted without
+its own filter, so selecting one value keeps the others listed.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func, case, literal
+from models import Job, Location
+from services.events import on_commit
+from services.filters import apply_job_filters, job_filter_criteria, SALARY_BANDS
+from services.categories import CATEGORY_LABELS
+
+# Cache sizing: entries are keyed by filter set; the TTL bounds staleness from
+# writes made by other worker processes.
+FACET_CACHE_SIZE = 256
+FACET_CACHE_TTL = 60
+
+MAX_LOCATIONS = 10
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_version = 0
+
+
+@on_commit(Job)
+def invalidate_facets(changes=None):
+    """Drop all cached facet counts (called whenever Job rows are committed)"""
+    global _version
+    with _lock:
+        _version += 1
+        _cache.clear()
+
+
+def _salary_band_expression():
+    """CASE expression mapping Job.salary_min to a salary band key"""
+    whens = []
+    for key, label, low, high in SALARY_BANDS:
+        if high is not None:
+            whens.append((Job.salary_min < high, key))
+        else:
+            whens.append((Job.salary_min >= low, key))
+    return case(*whens, else_=None)
+
+
+def _facet_columns():
+    """Facet name -> column it counts (facet names are also their filter names)"""
+    return {
+        'category': Job.category,
+        'type': Job.job_type,
+        'experience': Job.experience_level,
+        'location': Location.name,
+        'salary': _salary_band_expression(),
+    }
+
+
+def _compute_facets(filters):
+    """
+    Run the facet counts for a filter set in one statement.
+
+    Each facet is a GROUP BY branch of a UNION ALL over the filtered jobs
+    without the facet's own filter, so picking a job type still lists the
+    other types with their counts. The filter criteria are built once and
+    shared by the branches.
+    """
+    criteria = job_filter_criteria(filters)
+    branches = []
+    for name, column in _facet_columns().items():
+        query = apply_job_filters(
+            Job.query.filter_by(status='active'), filters, exclude=(name,), criteria=criteria
+        ).order_by(None)
+        branches.append(query.outerjoin(
+            Location, Location.id == Job.location_id
+        ).with_entities(
+            literal(name).label('facet'),
+            column.label('value'),
+            func.count(Job.id).label('count')
+        ).group_by(column))
+    rows = branches[0].union_all(*branches[1:]).all()
+
+    counts = {name: {} for name in _facet_columns()}
+    for name, value, count in rows:
+        if value:
+            counts[name][value] = count
+
+    def ranked(counts, labels=None, limit=None):
+        items = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        if limit:
+            items = items[:limit]
+        return [(value, (labels or {}).get(value, value), count) for value, count in items]
+
+    band_labels = {key: label for key, label, low, high in SALARY_BANDS}
+    return {
+        'category': ranked(counts['category'], CATEGORY_LABELS),
+        'type': ranked(counts['type']),
+        'experience': ranked(counts['experience']),
+        'location': ranked(counts['location'], limit=MAX_LOCATIONS),
+        'salary': [
+            (key, band_labels[key], counts['salary'][key])
+            for key, label, low, high in SALARY_BANDS if key in counts['salary']
+        ],
+    }
+
+
+def job_facets(filters):
+    """
+    Get facet counts for the active jobs matching a filter set.
+
+    Returns:
+        Dict of filter name ('category', 'type', 'experience', 'location', 'salary') ->
+        list of (value, label, count), most frequent first.
+    """
+    key = tuple(sorted(filters.items()))
+    now = time.time()
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] == _version and now - entry[1] < FACET_CACHE_TTL:
+            _cache.move_to_end(key)
+            return entry[2]
+        version = _version
+
+    facets = _compute_facets(filters)
+
+    with _lock:
+        # Only cache if no Job commit happened while we were computing
+        if version == _version:
+            _cache[key] = (version, now, facets)
+            _cache.move_to_end(key)
+            while len(_cache) > FACET_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return facets
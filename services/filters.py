@@ -0,0 +1,135 @@
+"""
+Job listing filters
+Shared by the public and jobseeker job listings and by the facet counts, so
+every view of "the current filter set" is built the same way.
+"""
+import math
+from models import Job
+from services.search import search_jobs
+from services.locations import location_ids_select
+
+# Query-string parameters that make up a job filter set
+FILTER_ARGS = ('search', 'category', 'location', 'type', 'experience', 'salary', 'min_salary', 'max_salary')
+
+# Listing orders other than newest-first; these page by offset
+SORT_OPTIONS = {
+    'salary_high': (Job.salary_max.desc().nulls_last(), Job.salary_min.desc().nulls_last()),
+    'salary_low': (Job.salary_min.asc().nulls_last(), Job.salary_max.asc().nulls_last()),
+    'most_applied': (Job.applications_count.desc(), Job.created_at.desc(), Job.id.desc()),
+}
+
+# Salary bands on the normalized minimum salary: key, label, lower bound, upper bound
+SALARY_BANDS = [
+    ('under-30k', 'Under 30k', None, 30000),
+    ('30k-60k', '30k - 60k', 30000, 60000),
+    ('60k-100k', '60k - 100k', 60000, 100000),
+    ('100k-plus', '100k+', 100000, None),
+]
+
+
+def job_filters_from_args(args):
+    """Read the job filter set from request args, dropping empty values"""
+    return {name: args.get(name, '').strip() for name in FILTER_ARGS if args.get(name, '').strip()}
+
+
+def _amount(value):
+    """Parse a salary amount from the query string, accepting '50000', '50,000' or '50k'"""
+    value = value.lower().replace(',', '').strip()
+    multiplier = 1000 if value.endswith('k') else 1
+    try:
+        amount = float(value.rstrip('k')) * multiplier
+    except ValueError:
+        return None
+    # 'inf', 'nan' and '1e400' parse as floats but are no amount
+    return int(amount) if math.isfinite(amount) else None
+
+
+def salary_band_clause(band_key):
+    """SQL condition selecting jobs in a salary band, or None for an unknown band"""
+    for key, label, low, high in SALARY_BANDS:
+        if key == band_key:
+            clauses = []
+            if low is not None:
+                clauses.append(Job.salary_min >= low)
+            if high is not None:
+                clauses.append(Job.salary_min < high)
+            return clauses
+    return None
+
+
+def job_filter_criteria(filters):
+    """
+    Build the SQL criteria of a job filter set, other than the search.
+
+    Returns:
+        Dict of filter name -> list of criteria, so callers can apply the set
+        with some filters left out (the facet counts) without rebuilding it
+    """
+    criteria = {}
+
+    if 'category' in filters:
+        criteria['category'] = [Job.category == filters['category']]
+
+    if 'location' in filters:
+        criteria['location'] = [Job.location_id.in_(location_ids_select(filters['location']))]
+
+    if 'type' in filters:
+        criteria['type'] = [Job.job_type == filters['type']]
+
+    if 'experience' in filters:
+        criteria['experience'] = [Job.experience_level == filters['experience']]
+
+    if 'salary' in filters:
+        clauses = salary_band_clause(filters['salary'])
+        if clauses:
+            criteria['salary'] = clauses
+
+    # Range filters on the yearly amounts: the job's range must reach the
+    # requested minimum and start below the requested maximum. Open-ended
+    # ranges ("From 50k", "Up to 90k") are stored with bounds past their open
+    # end (see salary_bounds), so each filter is one indexed comparison.
+    if 'min_salary' in filters:
+        amount = _amount(filters['min_salary'])
+        if amount is not None:
+            criteria['min_salary'] = [Job.salary_ceiling >= amount]
+
+    if 'max_salary' in filters:
+        amount = _amount(filters['max_salary'])
+        if amount is not None:
+            criteria['max_salary'] = [Job.salary_floor <= amount]
+
+    return criteria
+
+
+def apply_job_filters(query, filters, exclude=(), criteria=None):
+    """
+    Apply a job filter set to a Job query.
+
+    Args:
+        query: Base Job query
+        filters: Dict from ``job_filters_from_args``
+        exclude: Filter names to skip (used for facet counts)
+        criteria: ``job_filter_criteria(filters)``, when already built
+    """
+    if 'search' in filters and 'search' not in exclude:
+        query = search_jobs(filters['search'], query)
+
+    if criteria is None:
+        criteria = job_filter_criteria(filters)
+    for name, clauses in criteria.items():
+        if name not in exclude:
+            query = query.filter(*clauses)
+
+    return query
+
+
+def apply_job_sort(query, sort):
+    """
+    Order a job query by one of SORT_OPTIONS, replacing any relevance order.
+
+    Returns:
+        The ordered query, or None when ``sort`` is the default newest-first
+    """
+    if sort not in SORT_OPTIONS:
+        return None
+    return query.order_by(None).order_by(*SORT_OPTIONS[sort])
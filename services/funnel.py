@@ -0,0 +1,187 @@
+"""
+Job funnel analytics
+Views, applications, withdrawals and application status changes are appended
+to the ``job_events`` log in batches by a write-behind buffer, never on the
+request path. compact_funnel() folds new events into per-job daily counts in
+``job_funnel_daily``; it runs after every flush and from the CLI, and the
+analytics pages read only those aggregates.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, func
+from extensions import db
+from models import Job, Application, JobEvent, JobFunnelDaily, EventCursor
+from services.buffer import WriteBehindBuffer
+from services.events import on_commit
+from services.sql import insert_ignoring_conflict, insert_adding_on_conflict
+
+# Event kind -> funnel column
+KIND_COLUMNS = {
+    'view': 'views',
+    'apply': 'applications',
+    'withdraw': 'withdrawals',
+    'reviewed': 'reviewed',
+    'accepted': 'accepted',
+    'rejected': 'rejected',
+}
+FUNNEL_COLUMNS = tuple(KIND_COLUMNS.values())
+
+CURSOR = 'job_funnel'
+
+# Events younger than this are left for the next compaction, so a slower
+# concurrent insert with a lower id is never skipped by the cursor
+COMPACTION_DELAY = timedelta(seconds=30)
+
+
+class EventLog(WriteBehindBuffer):
+    """Per-process buffer of funnel events, appended to job_events in batches"""
+
+    name = 'event-log'
+
+    def __init__(self):
+        super().__init__()
+        self._events = Counter()  # (job id, kind) -> count
+
+    def record(self, job_id, kind, count=1):
+        with self._lock:
+            self._ensure_flusher()
+            self._events[job_id, kind] += count
+            self._recorded()
+
+    def _take(self):
+        events, self._events = self._events, Counter()
+        return events or None
+
+    def _write(self, conn, events):
+        now = datetime.utcnow()
+        conn.execute(insert(JobEvent), [
+            {'job_id': job_id, 'kind': kind, 'count': count, 'created_at': now}
+            for (job_id, kind), count in sorted(events.items())
+        ])
+        return len(events)
+
+    def _restore(self, events):
+        self._events.update(events)
+
+    def after_flush(self):
+        with self.app.app_context():
+            compact_funnel()
+
+
+event_log = EventLog()
+
+
+@on_commit(Application)
+def _log_application_events(changes):
+    """Log applications, withdrawals and status changes"""
+    for change in changes:
+        job_id = change.values.get('job_id')
+        if job_id is None:
+            continue
+        if change.op == 'insert':
+            event_log.record(job_id, 'apply')
+        elif change.op == 'delete':
+            event_log.record(job_id, 'withdraw')
+        elif 'status' in change.changed and change.values.get('status') in KIND_COLUMNS:
+            event_log.record(job_id, change.values['status'])
+
+
+def compact_funnel(batch_size=10000, echo=None):
+    """
+    Fold events logged since the last compaction into job_funnel_daily.
+
+    Each batch advances the shared cursor with a compare-and-set, so
+    concurrent compactions in several workers never count an event twice.
+
+    Returns:
+        Number of events compacted
+    """
+    compacted = 0
+    while True:
+        with db.engine.begin() as conn:
+            insert_ignoring_conflict(conn, EventCursor, {'name': CURSOR, 'last_id': 0}, index_elements=('name',))
+            last_id = conn.execute(
+                select(EventCursor.last_id).where(EventCursor.name == CURSOR).with_for_update()
+            ).scalar()
+            rows = conn.execute(
+                select(JobEvent.id, JobEvent.job_id, JobEvent.kind, JobEvent.count, JobEvent.created_at)
+                .where(JobEvent.id > last_id, JobEvent.created_at < datetime.utcnow() - COMPACTION_DELAY)
+                .order_by(JobEvent.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            claimed = conn.execute(
+                update(EventCursor)
+                .where(EventCursor.name == CURSOR, EventCursor.last_id == last_id)
+                .values(last_id=rows[-1].id)
+            ).rowcount
+            if not claimed:
+                # Another worker compacted this range first
+                break
+
+            days = {}
+            for row in rows:
+                column = KIND_COLUMNS.get(row.kind)
+                if column:
+                    counts = days.setdefault((row.job_id, row.created_at.date()), dict.fromkeys(FUNNEL_COLUMNS, 0))
+                    counts[column] += row.count
+            # Events of deleted jobs are dropped; their aggregates went with them
+            existing = set(conn.execute(
+                select(Job.id).where(Job.id.in_({job_id for job_id, day in days}))
+            ).scalars()) if days else set()
+            insert_adding_on_conflict(conn, JobFunnelDaily, [
+                dict(counts, job_id=job_id, day=day) for (job_id, day), counts in sorted(days.items())
+                if job_id in existing
+            ], ('job_id', 'day'), FUNNEL_COLUMNS)
+
+        compacted += len(rows)
+        if echo:
+            echo('Compacted {} events...'.format(compacted))
+        if len(rows) < batch_size:
+            break
+    return compacted
+
+
+def _rates(totals):
+    """Add conversion rates (in percent) to a dict of funnel totals"""
+    views, applications = totals['views'], totals['applications']
+    totals['apply_rate'] = round(100.0 * applications / views, 1) if views else None
+    totals['accept_rate'] = round(100.0 * totals['accepted'] / applications, 1) if applications else None
+    return totals
+
+
+def job_funnel(job_id, start, end):
+    """
+    Daily funnel of one job between two dates (inclusive), from the aggregates.
+
+    Returns:
+        (totals dict with conversion rates, list of JobFunnelDaily rows, oldest first)
+    """
+    days = JobFunnelDaily.query.filter(
+        JobFunnelDaily.job_id == job_id,
+        JobFunnelDaily.day >= start,
+        JobFunnelDaily.day <= end
+    ).order_by(JobFunnelDaily.day).all()
+    totals = {column: sum(getattr(day, column) for day in days) for column in FUNNEL_COLUMNS}
+    return _rates(totals), days
+
+
+def employer_funnel(employer_id, start, end, limit=50):
+    """
+    Funnel totals per job of one employer between two dates (inclusive).
+
+    Returns:
+        List of (job, totals dict with conversion rates), most viewed first
+    """
+    sums = [func.sum(getattr(JobFunnelDaily, column)).label(column) for column in FUNNEL_COLUMNS]
+    rows = db.session.query(Job, *sums).join(
+        JobFunnelDaily, JobFunnelDaily.job_id == Job.id
+    ).filter(
+        Job.employer_id == employer_id,
+        JobFunnelDaily.day >= start,
+        JobFunnelDaily.day <= end
+    ).group_by(Job.id).order_by(func.sum(JobFunnelDaily.views).desc(), Job.id.desc()).limit(limit).all()
+    return [
+        (row[0], _rates({column: int(value or 0) for column, value in zip(FUNNEL_COLUMNS, row[1:])}))
+        for row in rows
+    ]
@@ -0,0 +1,86 @@
+"""
+Signed-in user identities
+Flask-Login loads the user of every authenticated request. Instead of a
+full User row, the loader returns a read-only UserPrincipal (id, role, name,
+email) kept in a per-worker TTL/LRU cache, so role checks on the hot path
+do not touch the database. Principals are dropped when the user's role,
+name or email changes or the user is deleted.
+
+Anything else read from current_user (timestamps, relationships) comes from
+the User row, loaded through the session on first use. Views that modify
+the signed-in user load the row with db.session.get(User, current_user.id).
+"""
+from flask_login import UserMixin
+from sqlalchemy import select
+from extensions import db, login_manager
+from models import User
+from services.cache import identity_cache
+from services.events import on_commit
+
+# User columns a principal carries
+PRINCIPAL_COLUMNS = ('id', 'role', 'name', 'email')
+
+
+class UserPrincipal(UserMixin):
+    """Read-only identity of a signed-in user, shared across requests"""
+
+    __slots__ = PRINCIPAL_COLUMNS
+
+    def __init__(self, id, role, name, email):
+        for key, value in zip(PRINCIPAL_COLUMNS, (id, role, name, email)):
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('UserPrincipal is read-only; update the User row instead')
+
+    def __getattr__(self, key):
+        # Only reached for attributes a principal does not carry
+        if key.startswith('_'):
+            raise AttributeError(key)
+        return getattr(db.session.get(User, self.id), key)
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.email} ({self.role})>'
+
+    # Same role checks as User
+    is_admin = User.is_admin
+    is_employer = User.is_employer
+    is_jobseeker = User.is_jobseeker
+    get_role_display = User.get_role_display
+
+
+def _tag(user_id):
+    return ('user', user_id)
+
+
+def _load(user_id):
+    row = db.session.execute(
+        select(*(getattr(User, column) for column in PRINCIPAL_COLUMNS)).where(User.id == user_id)
+    ).first()
+    return UserPrincipal(*row) if row else None
+
+
+def load_principal(user_id):
+    """Cached principal of a user, or None if there is no such user"""
+    principal = identity_cache.get_or_set('user:{}'.format(user_id), lambda: _load(user_id), tags=(_tag(user_id),))
+    if principal is None:
+        # Not cached: SQLite hands the id of a deleted user to the next one
+        identity_cache.invalidate(_tag(user_id))
+    return principal
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Load user by ID for Flask-Login"""
+    return load_principal(int(user_id))
+
+
+@on_commit(User)
+def _invalidate_identities(changes):
+    """Drop principals of users whose identity changed or who were deleted"""
+    stale = [
+        change.id for change in changes
+        if change.op == 'delete' or (change.op == 'update' and change.changed & set(PRINCIPAL_COLUMNS))
+    ]
+    if stale:
+        identity_cache.invalidate(*(_tag(user_id) for user_id in stale))
@@ -0,0 +1,152 @@
+"""
+Location normalization
+Free-text job locations ("Bangalore", "Bengaluru, KA", "Remote - India") are
+mapped at write time to a row in the ``locations`` table, so filtering, facet
+counts and autocomplete work on an indexed ``Job.location_id`` instead of
+substring scans.
+"""
+import re
+from sqlalchemy import event, inspect, select, and_, or_, false
+from sqlalchemy.orm import Session, aliased
+from models import Job, Location
+from services.events import record_change
+from services.sql import insert_ignoring_conflict
+
+# Spelling variants and old names -> canonical city name (keys are lowercase)
+ALIASES = {
+    'bangalore': 'Bengaluru', 'bengaluru': 'Bengaluru', 'blr': 'Bengaluru',
+    'bombay': 'Mumbai', 'mumbai': 'Mumbai', 'navi mumbai': 'Navi Mumbai',
+    'delhi': 'Delhi', 'new delhi': 'Delhi', 'delhi ncr': 'Delhi', 'ncr': 'Delhi',
+    'gurgaon': 'Gurugram', 'gurugram': 'Gurugram',
+    'noida': 'Noida', 'greater noida': 'Greater Noida',
+    'madras': 'Chennai', 'chennai': 'Chennai',
+    'calcutta': 'Kolkata', 'kolkata': 'Kolkata',
+    'poona': 'Pune', 'pune': 'Pune',
+    'hyderabad': 'Hyderabad', 'secunderabad': 'Hyderabad',
+    'trivandrum': 'Thiruvananthapuram', 'thiruvananthapuram': 'Thiruvananthapuram',
+    'nyc': 'New York', 'new york': 'New York', 'new york city': 'New York', 'manhattan': 'New York',
+    'sf': 'San Francisco', 'san francisco': 'San Francisco', 'sf bay area': 'San Francisco',
+    'bay area': 'San Francisco', 'san francisco bay area': 'San Francisco',
+    'la': 'Los Angeles', 'los angeles': 'Los Angeles',
+    'london': 'London', 'greater london': 'London',
+}
+
+# Country / region qualifiers for remote roles (keys are lowercase)
+REGION_ALIASES = {
+    'india': 'India', 'in': 'India',
+    'us': 'USA', 'usa': 'USA', 'united states': 'USA',
+    'uk': 'UK', 'united kingdom': 'UK',
+    'eu': 'Europe', 'europe': 'Europe',
+    'apac': 'APAC', 'emea': 'EMEA',
+    'global': None, 'worldwide': None, 'anywhere': None,
+}
+
+_REMOTE_RE = re.compile(r'\b(remote|work from home|wfh|anywhere)\b', re.IGNORECASE)
+
+
+def _slug(value):
+    """Lowercase, hyphen-separated key for a location name"""
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
+
+
+def normalize_location(text):
+    """
+    Normalize a free-text location.
+
+    Returns:
+        Tuple of (key, display name, is_remote), or None for empty input
+    """
+    if not text or not text.strip():
+        return None
+
+    cleaned = ' '.join(text.split())
+
+    if _REMOTE_RE.search(cleaned):
+        # Whatever remains after the remote marker is treated as a region
+        region_text = _REMOTE_RE.sub(' ', cleaned)
+        region_text = re.sub(r'[^\w\s]', ' ', region_text).strip().lower()
+        region_text = ' '.join(region_text.split())
+        if region_text in REGION_ALIASES:
+            region = REGION_ALIASES[region_text]
+        else:
+            region = region_text.title() if region_text else None
+        if region:
+            return 'remote-' + _slug(region), 'Remote ({})'.format(region), True
+        return 'remote', 'Remote', True
+
+    # Keep the city part: "Bengaluru, KA" -> "Bengaluru", "Pune (Hybrid)" -> "Pune"
+    city = re.split(r'[,/|(]', cleaned)[0]
+    city = re.sub(r'\b(hybrid|on-?site|office)\b', ' ', city, flags=re.IGNORECASE)
+    city = ' '.join(city.replace('-', ' ').split()).strip()
+    if not city:
+        return None
+
+    name = ALIASES.get(city.lower(), city.title() if city.islower() or city.isupper() else city)
+    return _slug(name), name, False
+
+
+def location_id_for(session, text):
+    """
+    Resolve free text to a Location id, creating the location if needed.
+
+    Args:
+        session: Session whose transaction the lookup and insert run in
+        text: Free-text location
+    """
+    normalized = normalize_location(text)
+    if normalized is None:
+        return None
+    key, name, is_remote = normalized
+
+    conn = session.connection()
+    location_id = conn.execute(select(Location.id).where(Location.key == key)).scalar()
+    if location_id is None:
+        inserted = insert_ignoring_conflict(conn, Location, {'key': key, 'name': name, 'is_remote': is_remote})
+        location_id = conn.execute(select(Location.id).where(Location.key == key)).scalar()
+        if inserted:
+            record_change(session, 'insert', Location, location_id,
+                          {'id': location_id, 'key': key, 'name': name, 'is_remote': is_remote})
+    return location_id
+
+
+@event.listens_for(Session, 'before_flush')
+def _normalize_job_locations(session, flush_context, instances):
+    """Point new and edited jobs at their canonical location"""
+    resolved = {}
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Job):
+            continue
+        state = inspect(obj)
+        if obj in session.new or state.attrs.location.history.has_changes():
+            text = obj.location
+            if text not in resolved:
+                resolved[text] = location_id_for(session, text)
+            obj.location_id = resolved[text]
+
+
+def location_ids_select(text):
+    """
+    SELECT of the location ids a location filter should match, for use in
+    ``Job.location_id.in_(...)`` so the lookup runs inside the listing query.
+
+    "remote" matches every remote location; known names and aliases match
+    their canonical location; anything else matches locations whose name
+    starts with the text.
+    """
+    normalized = normalize_location(text)
+    if normalized is None:
+        return select(Location.id).where(false())
+    key, name, is_remote = normalized
+
+    if key == 'remote':
+        return select(Location.id).where(Location.is_remote)
+
+    prefix = ' '.join(text.split()).split(',')[0].strip()
+    known = aliased(Location)
+    return select(Location.id).where(or_(
+        Location.key == key,
+        and_(
+            ~select(known.id).where(known.key == key).exists(),
+            Location.name.ilike(prefix.replace('%', r'\%').replace('_', r'\_') + '%', escape='\\')
+        )
+    ))
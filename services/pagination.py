@@ -0,0 +1,154 @@
+"""
+Keyset (seek) pagination for listing pages
+Pages newest-first on a ``(timestamp, id)`` key, so deep pages cost the same
+as the first one and no COUNT(*) is issued. The classic ``?page=N`` links
+keep working through OFFSET pagination, which reads the total from a window
+count on the page query instead of a second COUNT(*) query.
+"""
+from datetime import datetime
+from flask import current_app
+from flask_sqlalchemy.pagination import QueryPagination
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_, func
+
+CURSOR_SALT = 'keyset-cursor'
+
+
+def _serializer():
+    """Serializer used to sign cursor tokens so they stay opaque and tamper-proof"""
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=CURSOR_SALT)
+
+
+def encode_cursor(key, direction):
+    """Encode a ``(timestamp, id)`` key and a direction ('next'/'prev') as a token"""
+    value, row_id = key
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return _serializer().dumps({'k': [value, row_id], 'd': direction})
+
+
+def decode_cursor(token):
+    """Decode a cursor token. Returns ``((timestamp, id), direction)`` or None if invalid."""
+    try:
+        data = _serializer().loads(token)
+        value, row_id = data['k']
+        direction = data['d']
+        if direction not in ('next', 'prev'):
+            return None
+        return (datetime.fromisoformat(value), int(row_id)), direction
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+class OffsetPagination(QueryPagination):
+    """
+    Flask-SQLAlchemy OFFSET pagination that selects ``COUNT(*) OVER ()`` with
+    the page's rows, so the total comes with the page instead of re-running
+    the filtered query (and any search) as a COUNT.
+    """
+
+    def _query_items(self):
+        query = self._query_args['query']
+        rows = query.add_columns(func.count().over()).limit(self.per_page).offset(self._query_offset).all()
+        self._total = rows[0][-1] if rows else None
+        return [row[0] if len(row) == 2 else tuple(row[:-1]) for row in rows]
+
+    def _query_count(self):
+        if self._total is not None:
+            return self._total
+        if self.page == 1:
+            return 0
+        # Past the last page: there is no row to read the total from
+        return super()._query_count()
+
+
+class KeysetPagination:
+    """
+    One page of keyset-paginated results.
+    Mirrors the parts of Flask-SQLAlchemy's Pagination used by the templates
+    (``items``, ``has_prev``, ``has_next``, iteration) and adds cursor tokens.
+    """
+
+    is_keyset = True
+
+    def __init__(self, items, per_page, has_prev, has_next, key_func):
+        self.items = items
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self._key_func = key_func
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        """Token for the page after this one, or None"""
+        if not self.has_next or not self.items:
+            return None
+        return encode_cursor(self._key_func(self.items[-1]), 'next')
+
+    @property
+    def prev_cursor(self):
+        """Token for the page before this one, or None"""
+        if not self.has_prev or not self.items:
+            return None
+        return encode_cursor(self._key_func(self.items[0]), 'prev')
+
+
+def paginate(query, sort_column, id_column, per_page, page=None, cursor=None, nulls_last=False):
+    """
+    Paginate a query newest-first on ``(sort_column, id_column)``.
+
+    Args:
+        query: Filtered query to paginate (without ORDER BY)
+        sort_column: Timestamp column, e.g. ``Job.created_at``
+        id_column: Primary key column used as tie-breaker, e.g. ``Job.id``
+        per_page: Number of rows per page
+        page: Explicit ``?page=`` number; switches to OFFSET pagination
+        cursor: Opaque ``?cursor=`` token from a previous page
+        nulls_last: Put rows whose sort column is NULL after the others on
+            every database (PostgreSQL sorts NULLs first when descending).
+            Only for OFFSET pagination, since a NULL key cannot be seeked past.
+
+    Returns:
+        A Flask-SQLAlchemy Pagination when ``page`` is given, otherwise a
+        KeysetPagination.
+    """
+    if page is not None:
+        order = sort_column.desc().nulls_last() if nulls_last else sort_column.desc()
+        return OffsetPagination(
+            query=query.order_by(order, id_column.desc()),
+            page=page, per_page=per_page, error_out=False
+        )
+
+    def key_func(row):
+        entity = row[0] if isinstance(row, tuple) else row
+        return getattr(entity, sort_column.key), getattr(entity, id_column.key)
+
+    decoded = decode_cursor(cursor) if cursor else None
+
+    if decoded is None:
+        rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+        return KeysetPagination(rows[:per_page], per_page, False, len(rows) > per_page, key_func)
+
+    (value, row_id), direction = decoded
+
+    if direction == 'next':
+        rows = query.filter(or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < row_id)
+        )).order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+        return KeysetPagination(rows[:per_page], per_page, True, len(rows) > per_page, key_func)
+
+    # Walk backwards in ascending order, then flip the page back to newest-first
+    rows = query.filter(or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > row_id)
+    )).order_by(sort_column.asc(), id_column.asc()).limit(per_page + 1).all()
+    has_prev = len(rows) > per_page
+    rows = list(reversed(rows[:per_page]))
+    return KeysetPagination(rows, per_page, has_prev, True, key_func)
@@ -0,0 +1,175 @@
+"""
+Password hashing off the request thread
+bcrypt is deliberately slow, so hashing and verifying run in a small process
+pool instead of the worker handling the request: a burst of logins queues
+for the pool while page rendering keeps its CPU. The number of pending
+operations is capped; beyond PASSWORD_HASH_QUEUE the request is shed with a
+429 instead of piling up.
+
+Hashes record their algorithm and cost ($2b$12$...). needs_rehash() tells
+whether a stored hash predates the configured BCRYPT_LOG_ROUNDS, so logins
+can upgrade it while the plain password is at hand.
+
+Pool processes are forked from a single-threaded forkserver that preloads
+this module, not from the worker itself: forking a process that runs
+background threads can deadlock the child.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from werkzeug.exceptions import TooManyRequests
+
+# bcrypt variant written by hash(); other variants are upgraded on login
+PREFIX = b'2b'
+
+
+class PasswordQueueFull(TooManyRequests):
+    """Too many password operations are pending; retry shortly"""
+
+    description = 'Too many sign-in attempts are being processed. Please try again in a moment.'
+
+    def __init__(self):
+        super().__init__(retry_after=1)
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds, prefix=PREFIX)).decode('utf-8')
+
+
+def _verify(password, pw_hash):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # Not a bcrypt hash
+        return False
+
+
+def _pool_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing in a bounded process pool.
+
+    PASSWORD_HASH_WORKERS sets the pool size (default: one per CPU; 0 hashes
+    in the calling thread), PASSWORD_HASH_QUEUE the most operations pending
+    at once across the threads of a worker.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.queue = 0
+        self.timeout = 30
+        self._slots = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', self.rounds)
+        workers = app.config.get('PASSWORD_HASH_WORKERS')
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue = app.config.get('PASSWORD_HASH_QUEUE') or 4 * max(self.workers, 1)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.queue)
+
+    def _executor(self):
+        with self._lock:
+            # A forked worker inherits the parent's pool object but not its processes
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=_pool_context())
+            return self._pool
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordQueueFull()
+        try:
+            future = self._executor().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(self.timeout)
+
+    def hash(self, password):
+        """bcrypt hash of a password at the configured cost"""
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, pw_hash):
+        """Whether the password matches the stored hash"""
+        return self._run(_verify, password, pw_hash)
+
+    def hash_many(self, passwords):
+        """Hashes of many passwords spread over the whole pool, for bulk jobs (no queue limit)"""
+        passwords = list(passwords)
+        if not self.workers or len(passwords) < 2:
+            return [_hash(password, self.rounds) for password in passwords]
+        chunksize = max(1, len(passwords) // (4 * self.workers))
+        return list(self._executor().map(_hash, passwords, [self.rounds] * len(passwords), chunksize=chunksize))
+
+    def needs_rehash(self, pw_hash):
+        """Whether a stored hash uses another bcrypt variant or cost than configured"""
+        try:
+            _, prefix, cost, _ = pw_hash.split('$', 3)
+            return prefix.encode() != PREFIX or int(cost) != self.rounds
+        except ValueError:
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._pid = None
+
+
+password_hasher = PasswordHasher()
+
+
+def benchmark(logins=200, threads=None, hasher=password_hasher):
+    """
+    Verify one password ``logins`` times from ``threads`` concurrent threads.
+
+    Returns:
+        Dict with logins, rejected (shed with a 429), seconds, per_second,
+        cores and per_core
+    """
+    pw_hash = hasher.hash('benchmark-password')
+    threads = threads or hasher.queue or 1
+    rejected = 0
+
+    def login(_):
+        try:
+            hasher.verify('benchmark-password', pw_hash)
+            return True
+        except PasswordQueueFull:
+            return False
+
+    # Start the pool before timing
+    hasher.verify('benchmark-password', pw_hash)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        rejected = sum(1 for ok in executor.map(login, range(logins)) if not ok)
+    seconds = time.perf_counter() - started
+
+    cores = min(hasher.workers or threads, os.cpu_count() or 1)
+    per_second = (logins - rejected) / seconds
+    return {
+        'logins': logins - rejected,
+        'rejected': rejected,
+        'seconds': round(seconds, 2),
+        'per_second': round(per_second, 1),
+        'cores': cores,
+        'per_core': round(per_second / cores, 1),
+    }
@@ -0,0 +1,110 @@
+"""
+Per-request SQL statistics
+Counts the queries, rows and database time of every request from the
+engine's cursor events. Totals are logged when the request ends, sent in an
+``X-Query-Stats`` header in debug mode (or when QUERY_STATS_HEADER is set),
+and checked against the query budget the endpoint declares with
+@query_budget. test_query_budgets.py renders every route against a seeded
+database and fails on any endpoint over its budget.
+"""
+import logging
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Budget of endpoints that do not declare one
+DEFAULT_QUERY_BUDGET = 10
+
+HEADER = 'X-Query-Stats'
+
+
+def query_budget(queries):
+    """
+    Declare the most SQL queries one request to a view may issue.
+
+    Usage:
+        @employer.route('/jobs')
+        @query_budget(3)
+        @login_required
+        def jobs():
+            ...
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def endpoint_budget(app, endpoint):
+    """Declared query budget of an endpoint, or DEFAULT_QUERY_BUDGET"""
+    return getattr(app.view_functions.get(endpoint), 'query_budget', DEFAULT_QUERY_BUDGET)
+
+
+class QueryStats:
+    """SQL totals of one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return 'queries={}; rows={}; db_ms={:.1f}'.format(self.queries, self.rows, self.seconds * 1000)
+
+    @classmethod
+    def parse(cls, value):
+        """Read stats back from an X-Query-Stats header value"""
+        fields = dict(part.strip().split('=', 1) for part in value.split(';'))
+        stats = cls()
+        stats.queries = int(fields['queries'])
+        stats.rows = int(fields['rows'])
+        stats.seconds = float(fields['db_ms']) / 1000
+        return stats
+
+
+def current_query_stats():
+    """Stats of the request being handled, or None outside requests"""
+    return g.get('query_stats') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    stats = current_query_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+        # Rows affected, or returned where the driver reports it (not SQLite SELECTs)
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+
+
+def init_query_stats(app):
+    """Collect SQL stats for each request of the app"""
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        budget = endpoint_budget(app, request.endpoint)
+        if stats.queries > budget:
+            logger.warning('%s %s issued %d queries, over its budget of %d (%s)',
+                           request.method, request.path, stats.queries, budget, stats)
+        else:
+            logger.info('%s %s %s', request.method, request.path, stats)
+        if app.debug or app.config.get('QUERY_STATS_HEADER'):
+            response.headers[HEADER] = str(stats)
+        return response
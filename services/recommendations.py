@@ -0,0 +1,241 @@
+"""
+Skill-based job recommendations
+An in-process inverted index from skill id to the ids of active jobs needing
+it. A jobseeker's recommendations are scored in one pass over the posting
+sets of their skills, then cached per user until their profile, their
+applications or the active jobs change. Jobs posted, edited or reopened are
+added to the index on the next request; a full rebuild only runs every
+REBUILD_INTERVAL seconds.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from sqlalchemy import select
+from extensions import db
+from models import Job, Profile, Application, job_skills, profile_skills
+from services.events import on_commit
+
+# Full rebuild interval; bounds staleness from writes in other worker processes
+REBUILD_INTERVAL = 300
+
+# Per-user recommendation cache
+RECOMMENDATION_CACHE_SIZE = 1024
+RECOMMENDATION_CACHE_TTL = 300
+
+# Ranked job ids kept per user, so a few later applications do not empty the list
+CACHED_RESULTS = 20
+
+
+class SkillIndex:
+    """Inverted index: skill id -> set of active job ids, plus job id -> skill ids"""
+
+    def __init__(self):
+        self._jobs_by_skill = {}
+        self._skills_by_job = {}
+        self._lock = threading.Lock()
+        self.built_at = None
+
+    def build(self, rows):
+        """Rebuild from (job_id, skill_id) rows of active jobs"""
+        jobs_by_skill = {}
+        skills_by_job = {}
+        for job_id, skill_id in rows:
+            jobs_by_skill.setdefault(skill_id, set()).add(job_id)
+            skills_by_job.setdefault(job_id, set()).add(skill_id)
+        with self._lock:
+            self._jobs_by_skill = jobs_by_skill
+            self._skills_by_job = skills_by_job
+            self.built_at = time.time()
+
+    def _remove(self, job_id):
+        for skill_id in self._skills_by_job.pop(job_id, ()):
+            postings = self._jobs_by_skill.get(skill_id)
+            if postings is not None:
+                postings.discard(job_id)
+                if not postings:
+                    del self._jobs_by_skill[skill_id]
+
+    def add_job(self, job_id, skill_ids):
+        """Index a new or reactivated job, replacing any skills indexed for it before"""
+        with self._lock:
+            self._remove(job_id)
+            if skill_ids:
+                self._skills_by_job[job_id] = set(skill_ids)
+                for skill_id in skill_ids:
+                    self._jobs_by_skill.setdefault(skill_id, set()).add(job_id)
+
+    def remove_job(self, job_id):
+        """Drop a job that was closed or deleted"""
+        with self._lock:
+            self._remove(job_id)
+
+    def score(self, skill_ids, exclude=frozenset(), limit=CACHED_RESULTS):
+        """
+        Rank active jobs by overlap with a set of skills.
+
+        Jobs matching more of the seeker's skills rank first; ties go to the
+        job whose requirements are more fully covered, then the newest job.
+
+        Returns:
+            List of (job_id, matched skill count)
+        """
+        matched = Counter()
+        with self._lock:
+            for skill_id in set(skill_ids):
+                matched.update(self._jobs_by_skill.get(skill_id, ()))
+            for job_id in exclude:
+                matched.pop(job_id, None)
+            ranked = sorted(
+                matched.items(),
+                key=lambda item: (-item[1], -item[1] / len(self._skills_by_job[item[0]]), -item[0])
+            )
+        return ranked[:limit]
+
+
+index = SkillIndex()
+_needs_rebuild = True
+
+# Jobs committed since the index last read their skill links
+_pending_jobs = set()
+_pending_lock = threading.Lock()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_version = 0
+
+
+def _active_job_skills(job_ids=None):
+    """(job_id, skill_id) rows of active jobs, of all of them or the given ones"""
+    query = select(job_skills.c.job_id, job_skills.c.skill_id).join(
+        Job, Job.id == job_skills.c.job_id
+    ).where(Job.status == 'active')
+    if job_ids is not None:
+        query = query.where(job_skills.c.job_id.in_(job_ids))
+    return db.session.execute(query).all()
+
+
+def _ensure_index():
+    """Build the skill index when missing or stale, else add the jobs committed since"""
+    global _needs_rebuild
+    with _pending_lock:
+        pending = list(_pending_jobs)
+        _pending_jobs.clear()
+    if _needs_rebuild or index.built_at is None or time.time() - index.built_at > REBUILD_INTERVAL:
+        _needs_rebuild = False
+        index.build(_active_job_skills())
+    elif pending:
+        skills = {job_id: set() for job_id in pending}
+        for job_id, skill_id in _active_job_skills(pending):
+            skills[job_id].add(skill_id)
+        for job_id, skill_ids in skills.items():
+            index.add_job(job_id, skill_ids)
+
+
+def _ranked_job_ids(user_id):
+    """Score the user's skills against the index, excluding every job they applied to"""
+    _ensure_index()
+    skill_ids = db.session.execute(
+        select(profile_skills.c.skill_id)
+        .join(Profile, Profile.id == profile_skills.c.profile_id)
+        .where(Profile.user_id == user_id)
+    ).scalars().all()
+    if not skill_ids:
+        return []
+    applied = set(db.session.execute(
+        select(Application.job_id).where(Application.jobseeker_id == user_id)
+    ).scalars())
+    return index.score(skill_ids, exclude=applied)
+
+
+def recommend_jobs(user_id, limit=5):
+    """
+    Recommended active jobs for a jobseeker.
+
+    Skill matches come first; the rest of the list is filled with the newest
+    active jobs the user has not applied to.
+
+    Returns:
+        List of (job, matched skill count)
+    """
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry and entry[0] == _version and now - entry[1] < RECOMMENDATION_CACHE_TTL:
+            _cache.move_to_end(user_id)
+            ranked = entry[2]
+        else:
+            ranked = None
+        version = _version
+
+    if ranked is None:
+        ranked = _ranked_job_ids(user_id)
+        with _cache_lock:
+            # Only cache if nothing relevant was committed while scoring
+            if version == _version:
+                _cache[user_id] = (version, now, ranked)
+                _cache.move_to_end(user_id)
+                while len(_cache) > RECOMMENDATION_CACHE_SIZE:
+                    _cache.popitem(last=False)
+
+    ranked = ranked[:limit]
+    jobs = {}
+    if ranked:
+        jobs = {job.id: job for job in Job.query.filter(
+            Job.id.in_([job_id for job_id, count in ranked]),
+            Job.status == 'active'
+        )}
+    results = [(jobs[job_id], count) for job_id, count in ranked if job_id in jobs]
+
+    if len(results) < limit:
+        applied = db.session.query(Application.id).filter(
+            Application.job_id == Job.id,
+            Application.jobseeker_id == user_id
+        ).exists()
+        newest = Job.query.filter(
+            Job.status == 'active',
+            ~applied,
+            ~Job.id.in_([job.id for job, count in results] or [-1])
+        ).order_by(Job.created_at.desc(), Job.id.desc()).limit(limit - len(results))
+        results.extend((job, 0) for job in newest)
+    return results
+
+
+def _forget_user(user_id):
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+@on_commit(Job)
+def _apply_job_changes(changes):
+    """Keep the index in step with committed jobs and drop cached recommendations"""
+    global _version
+    relevant = False
+    for change in changes:
+        if change.op == 'update' and not change.changed & {'required_skills', 'status'}:
+            continue
+        relevant = True
+        if change.op == 'delete' or change.values.get('status', 'active') != 'active':
+            index.remove_job(change.id)
+            with _pending_lock:
+                _pending_jobs.discard(change.id)
+        else:
+            # Skill links are only known to the database; read on the next request
+            with _pending_lock:
+                _pending_jobs.add(change.id)
+    if relevant:
+        with _cache_lock:
+            _version += 1
+            _cache.clear()
+
+
+@on_commit(Profile, Application)
+def _invalidate_users(changes):
+    """Drop cached recommendations of users whose profile or applications changed"""
+    for change in changes:
+        if change.model is Profile:
+            _forget_user(change.values.get('user_id'))
+        else:
+            _forget_user(change.values.get('jobseeker_id'))
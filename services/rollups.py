@@ -0,0 +1,274 @@
+"""
+Dashboard rollups
+Counts of new users, jobs and applications and of job/application status
+changes are kept per hour and per day in ``stat_rollups``, and the current
+size of each population (users by role, jobs and applications by status) in
+``stat_totals``. Both are updated in the transaction that makes the change,
+so the admin dashboard reads a few small rows instead of counting tables.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, delete, func
+from sqlalchemy.orm import Session
+from extensions import db
+from models import User, Job, Application, ArchivedJob, ArchivedApplication, StatRollup, StatTotal, EventCursor
+from services.events import committed_value
+from services.sql import insert_adding_on_conflict, insert_ignoring_conflict, insert_replacing_on_conflict
+
+HOUR = 'hour'
+DAY = 'day'
+
+# Ranges up to this long are summed from hourly buckets, longer ones from daily
+HOURLY_RANGE_LIMIT = timedelta(days=7)
+
+# Charts use hourly bars up to this range and daily bars beyond it
+HOURLY_CHART_LIMIT = timedelta(days=2)
+
+# model -> (metric prefix, creation timestamp, population column)
+TRACKED = {
+    User: ('users', 'created_at', 'role'),
+    Job: ('jobs', 'created_at', 'status'),
+    Application: ('applications', 'applied_at', 'status'),
+}
+
+# Archive tables whose rows still count in their model's totals (see services/archive.py)
+ARCHIVES = {
+    Job: ArchivedJob,
+    Application: ArchivedApplication,
+}
+
+# Cursor row locked while seeding the totals of an upgraded database
+SEED_CURSOR = 'stat_totals_seed'
+
+# Metrics offered on the dashboard trend chart
+TREND_METRICS = [
+    ('users.new', 'New users'),
+    ('users.new.employer', 'New employers'),
+    ('users.new.jobseeker', 'New job seekers'),
+    ('jobs.new', 'New jobs'),
+    ('jobs.status.closed', 'Jobs closed'),
+    ('applications.new', 'New applications'),
+    ('applications.status.reviewed', 'Applications reviewed'),
+    ('applications.status.accepted', 'Applications accepted'),
+    ('applications.status.rejected', 'Applications rejected'),
+]
+
+
+def bucket_start(moment, granularity):
+    """Start of the hour or day containing moment"""
+    if granularity == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _new_metrics(model, value):
+    """Event metrics counted when a row is created"""
+    prefix = TRACKED[model][0]
+    metrics = [prefix + '.new']
+    if model is User:
+        metrics.append('users.new.' + str(value))
+    return metrics
+
+
+def record_events(conn, events=None, totals=None):
+    """
+    Add event counts to the rollups and deltas to the totals.
+
+    Also used by bulk writes that bypass the ORM.
+
+    Args:
+        conn: Connection of the transaction making the change
+        events: Counter of (metric, datetime) -> number of events
+        totals: Counter of metric -> change in population size
+    """
+    buckets = Counter()
+    for (metric, moment), count in (events or {}).items():
+        for granularity in (HOUR, DAY):
+            buckets[granularity, metric, bucket_start(moment, granularity)] += count
+    insert_adding_on_conflict(conn, StatRollup, [
+        {'granularity': granularity, 'metric': metric, 'bucket': bucket, 'count': count}
+        for (granularity, metric, bucket), count in sorted(buckets.items()) if count
+    ], ('granularity', 'metric', 'bucket'), 'count')
+    insert_adding_on_conflict(conn, StatTotal, [
+        {'metric': metric, 'value': delta}
+        for metric, delta in sorted((totals or {}).items()) if delta
+    ], ('metric',), 'value')
+
+
+def _column_default(model, key):
+    default = model.__table__.c[key].default
+    return default.arg if default is not None and default.is_scalar else None
+
+
+@event.listens_for(Session, 'before_flush')
+def _roll_up_changes(session, flush_context, instances):
+    """Count new rows, status changes and deletions of users, jobs and applications"""
+    now = datetime.utcnow()
+    events = Counter()
+    totals = Counter()
+
+    for obj in session.new:
+        model = type(obj)
+        if model not in TRACKED:
+            continue
+        prefix, timestamp, population = TRACKED[model]
+        value = getattr(obj, population)
+        if value is None:
+            value = _column_default(model, population)
+        moment = getattr(obj, timestamp) or now
+        for metric in _new_metrics(model, value):
+            events[metric, moment] += 1
+        totals['{}.{}'.format(prefix, value)] += 1
+
+    for obj in session.dirty:
+        model = type(obj)
+        if model not in TRACKED:
+            continue
+        prefix, timestamp, population = TRACKED[model]
+        history = inspect(obj).attrs[population].history
+        if not history.added:
+            continue
+        old, value = committed_value(obj, population), history.added[0]
+        if old == value:
+            continue
+        totals['{}.{}'.format(prefix, old)] -= 1
+        totals['{}.{}'.format(prefix, value)] += 1
+        if population == 'status':
+            events['{}.status.{}'.format(prefix, value), now] += 1
+
+    for obj in session.deleted:
+        model = type(obj)
+        if model not in TRACKED:
+            continue
+        prefix, timestamp, population = TRACKED[model]
+        totals['{}.{}'.format(prefix, committed_value(obj, population))] -= 1
+
+    if events or any(totals.values()):
+        record_events(session.connection(), events, totals)
+
+
+def get_totals():
+    """
+    Current population sizes.
+
+    Returns:
+        Dict of metric -> count, e.g. {'users.employer': 12, 'jobs.active': 40}
+    """
+    return dict(db.session.query(StatTotal.metric, StatTotal.value).all())
+
+
+def event_counts(start, end=None):
+    """
+    Number of events of each metric between start and end (default: now).
+
+    Ranges of up to HOURLY_RANGE_LIMIT are summed from hourly buckets, longer
+    ones from daily buckets, so the cost depends on the range, not on the
+    size of the underlying tables. start is rounded down to its bucket.
+
+    Returns:
+        Dict of metric -> count
+    """
+    end = end or datetime.utcnow()
+    granularity = HOUR if end - start <= HOURLY_RANGE_LIMIT else DAY
+    rows = db.session.query(StatRollup.metric, func.sum(StatRollup.count)).filter(
+        StatRollup.granularity == granularity,
+        StatRollup.bucket >= bucket_start(start, granularity),
+        StatRollup.bucket < end
+    ).group_by(StatRollup.metric).all()
+    return {metric: int(count) for metric, count in rows}
+
+
+def trend(metric, start, end):
+    """
+    Event counts of one metric per bucket between start and end.
+
+    Returns:
+        (granularity, list of (bucket start, count)) with empty buckets as 0
+    """
+    granularity = HOUR if end - start <= HOURLY_CHART_LIMIT else DAY
+    step = timedelta(hours=1) if granularity == HOUR else timedelta(days=1)
+    first = bucket_start(start, granularity)
+
+    counts = dict(db.session.query(StatRollup.bucket, StatRollup.count).filter(
+        StatRollup.granularity == granularity,
+        StatRollup.metric == metric,
+        StatRollup.bucket >= first,
+        StatRollup.bucket < end
+    ).all())
+
+    series = []
+    bucket = first
+    while bucket < end:
+        series.append((bucket, int(counts.get(bucket, 0))))
+        bucket += step
+    return granularity, series
+
+
+def seed_totals():
+    """
+    Count the totals of a database kept before ``stat_totals`` existed.
+
+    Does nothing once any total is stored, so it is cheap to run on every
+    startup; the rollups of past events still need `flask rebuild-rollups`.
+    Workers starting together take turns on a locked cursor row, so only the
+    first one counts, and the counts are written as absolute values.
+
+    Returns:
+        Number of rows counted
+    """
+    with db.engine.begin() as conn:
+        insert_ignoring_conflict(conn, EventCursor, {'name': SEED_CURSOR, 'last_id': 0}, index_elements=('name',))
+        conn.execute(select(EventCursor.last_id).where(EventCursor.name == SEED_CURSOR).with_for_update())
+        if conn.execute(select(StatTotal.metric).limit(1)).first() is not None:
+            return 0
+        totals = Counter()
+        for model, (prefix, timestamp, population) in TRACKED.items():
+            for table in (model, ARCHIVES.get(model)):
+                if table is None:
+                    continue
+                column = getattr(table, population)
+                for value, count in conn.execute(select(column, func.count()).group_by(column)):
+                    totals['{}.{}'.format(prefix, value)] += count
+        insert_replacing_on_conflict(conn, StatTotal, [
+            {'metric': metric, 'value': value} for metric, value in sorted(totals.items())
+        ], ('metric',), 'value')
+    return sum(totals.values())
+
+
+def rebuild_rollups(batch_size=5000, echo=None):
+    """
+    Recompute the rollups and totals from the users, jobs and applications tables
+    and their archives.
+
+    Creation events and totals are rebuilt exactly; past status changes are not
+    recorded anywhere else, so status change counts restart from zero.
+
+    Returns:
+        Number of rows counted
+    """
+    events = Counter()
+    totals = Counter()
+    counted = 0
+    for model, (prefix, timestamp, population) in TRACKED.items():
+        for table in (model, ARCHIVES.get(model)):
+            if table is None:
+                continue
+            rows = db.session.execute(
+                select(getattr(table, timestamp), getattr(table, population))
+                .execution_options(yield_per=batch_size)
+            )
+            for moment, value in rows:
+                for metric in _new_metrics(model, value):
+                    events[metric, bucket_start(moment or datetime.utcnow(), HOUR)] += 1
+                totals['{}.{}'.format(prefix, value)] += 1
+                counted += 1
+        if echo:
+            echo('Counted {} {}...'.format(sum(
+                delta for metric, delta in totals.items() if metric.startswith(prefix + '.')
+            ), prefix))
+
+    db.session.execute(delete(StatRollup))
+    db.session.execute(delete(StatTotal))
+    record_events(db.session.connection(), events, totals)
+    db.session.commit()
+    return counted
@@ -0,0 +1,151 @@
+"""
+Salary normalization
+Parses the free-text salary employers type ("$80k - $100k", "10-15 LPA",
+"50,000/month", "£45/hr") into a yearly min/max, a currency and the period
+the salary was quoted in, so listings can filter and sort on indexed integers.
+"""
+import re
+from collections import namedtuple
+
+SalaryRange = namedtuple('SalaryRange', ['min', 'max', 'currency', 'period'])
+
+# Multipliers applied to yearly amounts, keyed by period
+PERIOD_FACTORS = {
+    'hour': 2080,
+    'day': 260,
+    'week': 52,
+    'month': 12,
+    'year': 1,
+}
+
+CURRENCY_SYMBOLS = [
+    ('₹', 'INR'), ('rs', 'INR'), ('inr', 'INR'),
+    ('$', 'USD'), ('usd', 'USD'),
+    ('€', 'EUR'), ('eur', 'EUR'),
+    ('£', 'GBP'), ('gbp', 'GBP'),
+]
+
+_PERIOD_PATTERNS = [
+    ('hour', r'(/\s*h(ou)?r?\b|\bper\s+hour\b|\bhourly\b|\bp\.?h\b|\bhr\b)'),
+    ('day', r'(/\s*day\b|\bper\s+day\b|\bdaily\b)'),
+    ('week', r'(/\s*w(ee)?k\b|\bper\s+week\b|\bweekly\b)'),
+    ('month', r'(/\s*mo(nth)?\b|\bper\s+month\b|\bmonthly\b|\bp\.?m\b|\bpcm\b)'),
+    ('year', r'(/\s*y(ea)?r\b|\bper\s+(year|annum)\b|\byearly\b|\bannual(ly)?\b|\bp\.?a\b|\bctc\b)'),
+]
+
+_MULTIPLIERS = {
+    'k': 1000,
+    'm': 1000000, 'mn': 1000000, 'million': 1000000,
+    'l': 100000, 'lac': 100000, 'lacs': 100000, 'lakh': 100000, 'lakhs': 100000,
+    'cr': 10000000, 'crore': 10000000, 'crores': 10000000,
+}
+
+# Multipliers only quoted for rupee amounts
+_INR_MULTIPLIERS = {'l', 'lac', 'lacs', 'lakh', 'lakhs', 'cr', 'crore', 'crores'}
+
+# Yearly amount below which a bare number (no currency, no multiplier) is not taken as a salary
+MIN_YEARLY_AMOUNT = 1000
+
+# Ceiling stored for ranges open at the top ("From 50k"); see salary_bounds
+OPEN_CEILING = 2 ** 31 - 1
+
+_SUFFIXES = r'k|mn|million|m|lakhs?|lacs?|l|crores?|cr'
+_NUMBER_RE = re.compile(
+    r'(\d+(?:,\d+)*(?:\.\d+)?)\s*(' + _SUFFIXES + r')?(?![a-z])',
+    re.IGNORECASE
+)
+_UP_TO_RE = re.compile(r'\b(up\s*to|max(imum)?|upto)\b', re.IGNORECASE)
+_FROM_RE = re.compile(r'(\b(from|min(imum)?|starting)\b|\d\s*(' + _SUFFIXES + r')?\s*\+)', re.IGNORECASE)
+# "2 years exp", "3-5 yrs": experience, not pay
+_EXPERIENCE_RE = re.compile(r'\d+(\s*-\s*\d+)?\s*\+?\s*(years|yrs)\b', re.IGNORECASE)
+
+
+def _currency(text):
+    """Detect the currency of a salary string, or None"""
+    lowered = text.lower()
+    for symbol, code in CURRENCY_SYMBOLS:
+        if symbol.isalpha():
+            if re.search(r'\b{}\b'.format(re.escape(symbol)), lowered):
+                return code
+        elif symbol in lowered:
+            return code
+    return None
+
+
+def _period(text):
+    """Detect the pay period of a salary string, defaulting to yearly"""
+    lowered = text.lower()
+    for period, pattern in _PERIOD_PATTERNS:
+        if re.search(pattern, lowered):
+            return period
+    return 'year'
+
+
+def parse_salary(text):
+    """
+    Parse a free-text salary.
+
+    Args:
+        text: Salary as entered by the employer
+
+    Returns:
+        SalaryRange with yearly integer min/max (either may be None), an ISO
+        currency code or None and the quoted period, or None when no amount
+        could be found.
+    """
+    if not text or not text.strip():
+        return None
+
+    # "LPA" is lakhs per annum
+    cleaned = re.sub(r'(?i)\blpa\b', ' lakh per year', text)
+    cleaned = _EXPERIENCE_RE.sub(' ', cleaned)
+
+    amounts = []
+    for number, suffix in _NUMBER_RE.findall(cleaned):
+        amounts.append([float(number.replace(',', '')), (suffix or '').lower()])
+    amounts = [amount for amount in amounts if amount[0] > 0][:2]
+    if not amounts:
+        return None
+
+    # "10-15 LPA", "80-100k": a trailing multiplier applies to the whole range
+    if len(amounts) == 2 and amounts[1][1] and not amounts[0][1]:
+        amounts[0][1] = amounts[1][1]
+
+    values = [number * _MULTIPLIERS.get(suffix, 1) for number, suffix in amounts]
+
+    period = _period(cleaned)
+    factor = PERIOD_FACTORS[period]
+    values = [int(round(value * factor)) for value in values]
+
+    currency = _currency(cleaned)
+    suffixes = {suffix for number, suffix in amounts if suffix}
+    if currency is None and suffixes & _INR_MULTIPLIERS:
+        currency = 'INR'
+    # "Negotiable, 2 rounds": an unmarked small number is not a salary
+    if currency is None and not suffixes and max(values) < MIN_YEARLY_AMOUNT:
+        return None
+
+    if len(values) == 2:
+        low, high = sorted(values)
+    elif _UP_TO_RE.search(cleaned):
+        low, high = None, values[0]
+    elif _FROM_RE.search(cleaned):
+        low, high = values[0], None
+    else:
+        low = high = values[0]
+
+    return SalaryRange(low, high, currency, period)
+
+
+def salary_bounds(salary):
+    """
+    Floor and ceiling of a parsed salary for the yearly range filters.
+
+    Open ends reach past any requested amount: "Up to 90k" has a floor of 0
+    and "From 50k" a ceiling of OPEN_CEILING, so each filter compares a single
+    indexed column. Both are None when there is no salary.
+    """
+    if salary is None:
+        return None, None
+    return (salary.min if salary.min is not None else 0,
+            salary.max if salary.max is not None else OPEN_CEILING)
@@ -0,0 +1,145 @@
+"""
+Applicant scoring
+Scores applications with a set-based UPDATE as they are written: the share
+of the job's skills found in the applicant's profile, blended with how well
+their years of experience fit the job's experience level. Scores are stored
+on the application, so ranking applicants is an indexed ORDER BY. Editing a
+job's requirements or an applicant's profile rescores the affected
+applications in the same flush. Applications stored before that are scored
+with `flask score-applications`.
+"""
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, and_, case, cast, func, Integer, Float
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Job, Profile, Application, job_skills, profile_skills
+import services.skills  # noqa: F401 (skill links are synced before the scoring listener runs)
+
+# Minimum years of experience expected for each job experience level
+EXPERIENCE_YEARS = {
+    'Entry': 0,
+    'Mid': 2,
+    'Senior': 5,
+}
+
+SKILL_WEIGHT = 0.7
+EXPERIENCE_WEIGHT = 0.3
+
+
+def _skill_count():
+    """Number of skills the application's job lists (correlated to each application)"""
+    return select(func.count()).select_from(job_skills).where(
+        job_skills.c.job_id == Application.job_id
+    ).scalar_subquery()
+
+
+def _min_years():
+    """Years of experience the application's job level expects, or NULL for an unknown level"""
+    return select(
+        case(EXPERIENCE_YEARS, value=Job.experience_level, else_=None)
+    ).where(Job.id == Application.job_id).scalar_subquery()
+
+
+def _skill_fit(skill_count):
+    """Share of the job's skills listed on the applicant's profile"""
+    matched = select(func.count()).select_from(
+        profile_skills.join(Profile, Profile.id == profile_skills.c.profile_id).join(
+            job_skills, and_(job_skills.c.skill_id == profile_skills.c.skill_id,
+                             job_skills.c.job_id == Application.job_id)
+        )
+    ).where(Profile.user_id == Application.jobseeker_id).scalar_subquery()
+    return case((skill_count == 0, None), else_=cast(matched, Float) / skill_count)
+
+
+def _experience_fit(min_years):
+    """1 when the applicant has the expected years, scaling down linearly below it"""
+    years = select(cast(Profile.experience_years, Integer)).where(
+        Profile.user_id == Application.jobseeker_id
+    ).scalar_subquery()
+    return case(
+        (min_years.is_(None), None),
+        (years.is_(None), case((min_years == 0, 0.5), else_=0.0)),
+        (years >= min_years, 1.0),
+        else_=cast(years, Float) / min_years
+    )
+
+
+def _score():
+    """
+    Match score of each application, blending the parts its job defines.
+
+    A job without skills is scored on experience alone and one with an
+    unknown level on skills alone; a job with neither scores 0.
+    """
+    skill_count = _skill_count()
+    min_years = _min_years()
+    weighted = (func.coalesce(SKILL_WEIGHT * _skill_fit(skill_count), 0.0)
+                + func.coalesce(EXPERIENCE_WEIGHT * _experience_fit(min_years), 0.0))
+    total_weight = (case((skill_count > 0, SKILL_WEIGHT), else_=0.0)
+                    + case((min_years.isnot(None), EXPERIENCE_WEIGHT), else_=0.0))
+    return func.coalesce(weighted / func.nullif(total_weight, 0.0), 0.0)
+
+
+def score_applications(conn, where):
+    """
+    Score the applications matching ``where`` in one UPDATE.
+
+    Returns:
+        Number of applications scored
+    """
+    applications = Application.__table__
+    return conn.execute(
+        update(applications).where(where).values(
+            match_score=_score(),
+            scored_at=datetime.utcnow(),
+            # Scoring is not an edit of the application
+            updated_at=applications.c.updated_at,
+        )
+    ).rowcount
+
+
+@event.listens_for(Session, 'after_flush')
+def _score_flushed(session, flush_context):
+    """Score new applications, and rescore them when a job's requirements or an applicant's profile change"""
+    application_ids = [obj.id for obj in session.new if isinstance(obj, Application)]
+    job_ids = []
+    user_ids = [obj.user_id for obj in session.new if isinstance(obj, Profile)]
+    for obj in session.dirty:
+        if isinstance(obj, Job):
+            attrs = inspect(obj).attrs
+            if attrs.required_skills.history.has_changes() or attrs.experience_level.history.has_changes():
+                job_ids.append(obj.id)
+        elif isinstance(obj, Profile):
+            attrs = inspect(obj).attrs
+            if attrs.skills.history.has_changes() or attrs.experience_years.history.has_changes():
+                user_ids.append(obj.user_id)
+
+    applications = Application.__table__
+    for column, ids in ((applications.c.id, application_ids),
+                        (applications.c.job_id, job_ids),
+                        (applications.c.jobseeker_id, user_ids)):
+        if ids:
+            score_applications(session.connection(), column.in_(ids))
+
+
+def score_unscored(batch_size=5000, echo=None):
+    """
+    Score applications stored before scoring ran on write. Must run inside an app context.
+
+    Returns:
+        Number of applications scored
+    """
+    applications = Application.__table__
+    scored = 0
+    while True:
+        ids = db.session.execute(
+            select(applications.c.id).where(applications.c.match_score.is_(None))
+            .order_by(applications.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        scored += score_applications(db.session.connection(), applications.c.id.in_(ids))
+        db.session.commit()
+        if echo:
+            echo('Scored {} applications...'.format(scored))
+    return scored
@@ -0,0 +1,216 @@
+"""
+Full-text job search
+Backed by an SQLite FTS5 table or a PostgreSQL tsvector column with a GIN
+index, depending on SQLALCHEMY_DATABASE_URI. Both indexes are maintained by
+the database itself (triggers / generated column), so they stay in sync on
+every Job insert, update and delete.
+"""
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import text, bindparam, literal_column, func, Integer, Float
+from extensions import db
+from models import Job
+
+# Column weights used for ranking: title, company name, description
+TITLE_WEIGHT = 10.0
+COMPANY_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+SNIPPET_WORDS = 24
+
+# Highlight markers are control characters so they never collide with job text;
+# they are swapped for <mark> tags after the snippet has been HTML-escaped.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        title, company_name, description,
+        content='jobs', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        VALUES (new.id, new.title, new.company_name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, company_name, description ON jobs BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description);
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        VALUES (new.id, new.title, new.company_name, new.description);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(company_name, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_jobs_search_vector ON jobs USING GIN (search_vector)",
+]
+
+
+def _backend():
+    """Return the search backend for the bound engine: 'sqlite', 'postgresql' or None"""
+    name = db.engine.dialect.name
+    if name in ('sqlite', 'postgresql'):
+        return name
+    return None
+
+
+def init_search():
+    """Create the full-text index if needed. Must run inside an app context."""
+    backend = _backend()
+    if backend == 'sqlite':
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs_fts'"
+            )).first()
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                # Index rows that were written before the FTS table existed
+                conn.execute(text("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')"))
+    elif backend == 'postgresql':
+        with db.engine.begin() as conn:
+            for statement in POSTGRES_DDL:
+                conn.execute(text(statement))
+
+
+def rebuild_search_index():
+    """Rebuild the full-text index from the jobs table"""
+    backend = _backend()
+    if backend == 'sqlite':
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')"))
+    elif backend == 'postgresql':
+        with db.engine.begin() as conn:
+            conn.execute(text("REINDEX INDEX ix_jobs_search_vector"))
+
+
+def _tokens(search):
+    """Split user input into plain search terms"""
+    return _TOKEN_RE.findall(search or '')
+
+
+def _fts5_query(tokens):
+    """Build an FTS5 MATCH expression: every term must match, as a prefix"""
+    return ' '.join('"{}"*'.format(token.replace('"', '')) for token in tokens)
+
+
+def _tsquery(tokens):
+    """Build a prefix-matching PostgreSQL tsquery from plain terms"""
+    return func.to_tsquery('english', ' & '.join('{}:*'.format(token) for token in tokens))
+
+
+def search_jobs(search, query=None):
+    """
+    Restrict a Job query to rows matching ``search``, ordered by relevance.
+
+    Args:
+        search: Free-text search entered by the user
+        query: Base Job query to filter (defaults to all jobs)
+
+    Returns:
+        The filtered query. Callers may add further filters and a secondary
+        ORDER BY before paginating; use ``search_snippets`` for highlights.
+    """
+    if query is None:
+        query = Job.query
+
+    tokens = _tokens(search)
+    if not tokens:
+        return query
+
+    backend = _backend()
+    if backend == 'sqlite':
+        matches = text(
+            "SELECT rowid AS job_id, bm25(jobs_fts, :tw, :cw, :dw) AS rank "
+            "FROM jobs_fts WHERE jobs_fts MATCH :match"
+        ).bindparams(
+            tw=TITLE_WEIGHT, cw=COMPANY_WEIGHT, dw=DESCRIPTION_WEIGHT,
+            match=_fts5_query(tokens)
+        ).columns(job_id=Integer, rank=Float).subquery('fts_matches')
+        # bm25() is lower-is-better
+        return query.join(matches, matches.c.job_id == Job.id).order_by(matches.c.rank)
+
+    if backend == 'postgresql':
+        vector = literal_column('jobs.search_vector')
+        tsquery = _tsquery(tokens)
+        return query.filter(vector.op('@@')(tsquery)).order_by(
+            func.ts_rank_cd(vector, tsquery).desc()
+        )
+
+    # No full-text support on this database: fall back to substring matching
+    return query.filter(
+        (Job.title.contains(search)) |
+        (Job.company_name.contains(search)) |
+        (Job.description.contains(search))
+    )
+
+
+def _render_snippet(raw):
+    """Escape a raw snippet and turn the highlight markers into <mark> tags"""
+    html = str(escape(raw))
+    html = html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return Markup(html)
+
+
+def search_snippets(search, job_ids):
+    """
+    Get highlighted description snippets for a page of search results.
+
+    Args:
+        search: The search text passed to ``search_jobs``
+        job_ids: IDs of the jobs being displayed
+
+    Returns:
+        Dict of job id -> safe HTML snippet with matched terms in <mark> tags
+    """
+    tokens = _tokens(search)
+    job_ids = list(job_ids)
+    if not tokens or not job_ids:
+        return {}
+
+    backend = _backend()
+    if backend == 'sqlite':
+        rows = db.session.execute(
+            text(
+                "SELECT rowid, snippet(jobs_fts, 2, :start, :end, '…', :words) "
+                "FROM jobs_fts WHERE jobs_fts MATCH :match AND rowid IN :ids"
+            ).bindparams(bindparam('ids', expanding=True)),
+            {
+                'start': _MARK_START, 'end': _MARK_END, 'words': SNIPPET_WORDS,
+                'match': _fts5_query(tokens), 'ids': job_ids,
+            }
+        )
+    elif backend == 'postgresql':
+        options = 'StartSel={}, StopSel={}, MaxWords={}, MinWords=8'.format(
+            _MARK_START, _MARK_END, SNIPPET_WORDS
+        )
+        rows = db.session.query(
+            Job.id,
+            func.ts_headline('english', Job.description, _tsquery(tokens), options)
+        ).filter(Job.id.in_(job_ids))
+    else:
+        return {}
+
+    return {job_id: _render_snippet(snippet) for job_id, snippet in rows if snippet}
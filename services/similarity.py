@@ -0,0 +1,359 @@
+"""
+"Similar jobs" from precomputed TF-IDF similarity
+Active jobs' title, required skills and description are vectorized into a
+sparse, L2-normalized TF-IDF matrix; cosine top-k neighbours are computed in
+batched sparse x dense matrix products and stored in ``job_similarity``, so the
+job detail pages only run one indexed lookup.
+
+The build runs from the CLI (``build-similar-jobs`` / ``update-similar-jobs``)
+and needs NumPy and SciPy; serving neighbours does not.
+"""
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from sqlalchemy import select, delete, func
+from extensions import db
+from models import Job, JobSimilarity
+
+# Neighbours stored per job
+TOP_K = 10
+
+# Neighbours below this cosine similarity are not worth showing
+MIN_SCORE = 0.05
+
+# Title and skill terms count this many times more than description terms
+TITLE_WEIGHT = 3
+SKILLS_WEIGHT = 2
+
+# Terms in fewer documents than MIN_DF or more than MAX_DF of them are dropped;
+# rare terms cannot link two jobs and very common ones make the product dense.
+MIN_DF = 2
+MAX_DF = 0.5
+
+# Upper bound on the dense blocks of one batch (floats)
+MAX_BLOCK = 32 * 1024 * 1024
+
+# Rows per INSERT executemany
+WRITE_CHUNK = 10000
+
+STOP_WORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can
+could do does for from had has have having he her here his how i if in into is it
+its job jobs may me more most must my no not of on or our out over per role roles
+she should so some such than that the their them then there these they this those
+to under up us we well were what when where which while who will with within work
+would you your
+""".split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*')
+
+
+def tokenize(text):
+    """Lowercase word tokens with stop words and single characters removed"""
+    return [token for token in _TOKEN_RE.findall((text or '').lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def _terms(title, skills, description):
+    """Weighted term counts of one job"""
+    counts = Counter(tokenize(description))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    for token in tokenize(skills):
+        counts[token] += SKILLS_WEIGHT
+    return counts
+
+
+def _active_job_terms(job_ids=None, chunk_size=5000):
+    """Yield (id, term counts) for active jobs, streamed in id order"""
+    statement = select(Job.id, Job.title, Job.required_skills, Job.description).where(
+        Job.status == 'active'
+    ).order_by(Job.id)
+    if job_ids is not None:
+        statement = statement.where(Job.id.in_(job_ids))
+    for job_id, title, skills, description in db.session.execute(
+        statement.execution_options(yield_per=chunk_size)
+    ):
+        yield job_id, _terms(title, skills, description)
+
+
+class TfidfModel:
+    """Vocabulary, IDF weights and the TF-IDF rows of the jobs they were fitted on"""
+
+    def __init__(self, vocabulary, idf, job_ids, matrix):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.job_ids = job_ids
+        self.matrix = matrix
+
+    @classmethod
+    def fit(cls, documents):
+        """Fit on (job id, term counts) pairs and vectorize them"""
+        import numpy as np
+
+        documents = list(documents)
+        document_frequency = Counter()
+        for job_id, counts in documents:
+            document_frequency.update(counts.keys())
+
+        total = len(documents)
+        max_df = max(MIN_DF, int(MAX_DF * total))
+        terms = sorted(term for term, df in document_frequency.items() if MIN_DF <= df <= max_df)
+        vocabulary = {term: position for position, term in enumerate(terms)}
+        # Smoothed IDF, as in scikit-learn
+        idf = np.array(
+            [math.log((1 + total) / (1 + document_frequency[term])) + 1 for term in terms],
+            dtype=np.float32
+        )
+        model = cls(vocabulary, idf, np.array([job_id for job_id, counts in documents], dtype=np.int64), None)
+        model.matrix = model.transform(counts for job_id, counts in documents)
+        return model
+
+    def transform(self, term_counts):
+        """Sublinear-TF, L2-normalized CSR rows for an iterable of term counts"""
+        import numpy as np
+        from scipy import sparse
+
+        indptr = [0]
+        indices = []
+        data = []
+        for counts in term_counts:
+            for term, count in counts.items():
+                position = self.vocabulary.get(term)
+                if position is not None:
+                    indices.append(position)
+                    data.append(1.0 + math.log(count))
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.vocabulary))
+        )
+        matrix = matrix.multiply(self.idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(matrix).astype(np.float32).tocsr()
+
+    def save(self, path):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get))
+        np.savez(path, terms=terms, idf=self.idf, job_ids=self.job_ids,
+                 data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved model, or None if there is none"""
+        import numpy as np
+        from scipy import sparse
+
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as saved:
+            terms = saved['terms'].tolist()
+            matrix = sparse.csr_matrix(
+                (saved['data'], saved['indices'], saved['indptr']),
+                shape=(len(saved['indptr']) - 1, len(terms))
+            )
+            return cls({term: position for position, term in enumerate(terms)},
+                       saved['idf'], saved['job_ids'], matrix)
+
+
+# Corpus shared with worker processes (set once per worker by _init_worker)
+_corpus = None
+_corpus_ids = None
+
+
+def _init_worker(corpus, corpus_ids):
+    global _corpus, _corpus_ids
+    _corpus = corpus
+    _corpus_ids = corpus_ids
+
+
+def _top_k_block(queries, query_ids, top_k):
+    """
+    Top-k neighbours of a block of query rows against the shared corpus.
+
+    Returns:
+        List of (job id, similar job id, score) rows
+    """
+    import numpy as np
+
+    # corpus (sparse) x block (dense) is much faster than a sparse x sparse
+    # product here, since the block's similarity rows are mostly non-zero
+    scores = np.ascontiguousarray((_corpus @ queries.T.toarray()).T)
+
+    # One extra candidate, since a job is its own best match
+    k = min(top_k + 1, scores.shape[1])
+    if k == 0:
+        return []
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    best_scores[_corpus_ids[best] == query_ids[:, None]] = -1.0
+    order = np.argsort(-best_scores, axis=1)[:, :top_k]
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    rows, columns = np.nonzero(best_scores >= MIN_SCORE)
+    return list(zip(
+        query_ids[rows].tolist(),
+        _corpus_ids[best[rows, columns]].tolist(),
+        best_scores[rows, columns].astype(float).tolist()
+    ))
+
+
+def _neighbours(queries, query_ids, corpus, corpus_ids, top_k, batch_size, workers):
+    """Yield neighbour rows for every query row, batch by batch, optionally in parallel"""
+    # Bound both the dense query block and its dense similarity block
+    batch_size = max(1, min(batch_size, MAX_BLOCK // max(1, corpus.shape[0], corpus.shape[1])))
+    blocks = [
+        (queries[start:start + batch_size], query_ids[start:start + batch_size], top_k)
+        for start in range(0, queries.shape[0], batch_size)
+    ]
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(corpus, corpus_ids)) as pool:
+            for rows in pool.map(_top_k_block_args, blocks):
+                yield rows
+    else:
+        _init_worker(corpus, corpus_ids)
+        for block in blocks:
+            yield _top_k_block(*block)
+
+
+def _top_k_block_args(args):
+    return _top_k_block(*args)
+
+
+def _write(rows):
+    for start in range(0, len(rows), WRITE_CHUNK):
+        db.session.execute(JobSimilarity.__table__.insert(), [
+            {'job_id': job_id, 'similar_job_id': similar_id, 'score': score}
+            for job_id, similar_id, score in rows[start:start + WRITE_CHUNK]
+        ])
+
+
+def build_similarity(top_k=TOP_K, batch_size=1000, workers=1, echo=None):
+    """
+    Recompute neighbours of every active job and replace the table.
+
+    Returns:
+        Number of active jobs processed
+    """
+    model = TfidfModel.fit(_active_job_terms())
+    if echo:
+        echo('Vectorized {} jobs over {} terms.'.format(len(model.job_ids), len(model.vocabulary)))
+
+    db.session.execute(delete(JobSimilarity))
+    done = 0
+    for rows in _neighbours(model.matrix, model.job_ids, model.matrix, model.job_ids,
+                            top_k, batch_size, workers):
+        _write(rows)
+        done += len({row[0] for row in rows})
+        if echo:
+            echo('Stored neighbours for {} jobs...'.format(done))
+    db.session.commit()
+
+    model.save(current_app.config['SIMILARITY_MODEL_PATH'])
+    return len(model.job_ids)
+
+
+def update_similarity(top_k=TOP_K, batch_size=1000, workers=1, echo=None):
+    """
+    Add neighbours for jobs posted since the last build, using its vocabulary.
+
+    New jobs get their own top-k, and existing jobs whose weakest stored
+    neighbour is beaten by a new job get their list refreshed. Jobs that are
+    no longer active drop out. Falls back to a full build without a model.
+
+    Returns:
+        Number of new jobs processed
+    """
+    import numpy as np
+    from scipy import sparse
+
+    path = current_app.config['SIMILARITY_MODEL_PATH']
+    model = TfidfModel.load(path)
+    if model is None:
+        return build_similarity(top_k, batch_size, workers, echo)
+
+    active_ids = set(db.session.execute(select(Job.id).where(Job.status == 'active')).scalars())
+    known = model.job_ids.tolist()
+    new_ids = sorted(active_ids.difference(known))
+
+    # Forget jobs that were closed or deleted since the model was saved
+    keep = np.array([job_id in active_ids for job_id in known], dtype=bool)
+    gone = [job_id for job_id, kept in zip(known, keep) if not kept]
+    if gone:
+        for start in range(0, len(gone), WRITE_CHUNK):
+            chunk = gone[start:start + WRITE_CHUNK]
+            db.session.execute(delete(JobSimilarity).where(JobSimilarity.job_id.in_(chunk)))
+            db.session.execute(delete(JobSimilarity).where(JobSimilarity.similar_job_id.in_(chunk)))
+    old_matrix = model.matrix[keep]
+    old_ids = model.job_ids[keep]
+
+    if not new_ids:
+        model.job_ids, model.matrix = old_ids, old_matrix
+        db.session.commit()
+        model.save(path)
+        return 0
+
+    documents = list(_active_job_terms(new_ids))
+    new_ids = np.array([job_id for job_id, counts in documents], dtype=np.int64)
+    new_matrix = model.transform(counts for job_id, counts in documents)
+    corpus = sparse.vstack([old_matrix, new_matrix]).tocsr()
+    corpus_ids = np.concatenate([old_ids, new_ids])
+
+    # Neighbours of the new jobs among all active jobs
+    for rows in _neighbours(new_matrix, new_ids, corpus, corpus_ids, top_k, batch_size, workers):
+        _write(rows)
+
+    # Existing jobs that a new job now beats: merge and trim their lists
+    if old_matrix.shape[0]:
+        stored = {job_id: (count, weakest) for job_id, count, weakest in db.session.execute(
+            select(JobSimilarity.job_id, func.count(), func.min(JobSimilarity.score))
+            .group_by(JobSimilarity.job_id)
+        )}
+        candidates = []
+        for rows in _neighbours(old_matrix, old_ids, new_matrix, new_ids, top_k, batch_size, workers):
+            candidates.extend(
+                row for row in rows
+                if stored.get(row[0], (0, 0.0))[0] < top_k or row[2] > stored[row[0]][1]
+            )
+        affected = sorted({row[0] for row in candidates})
+        for start in range(0, len(affected), WRITE_CHUNK):
+            chunk = affected[start:start + WRITE_CHUNK]
+            merged = {}
+            for job_id, similar_id, score in db.session.execute(
+                select(JobSimilarity.job_id, JobSimilarity.similar_job_id, JobSimilarity.score)
+                .where(JobSimilarity.job_id.in_(chunk))
+            ):
+                merged.setdefault(job_id, []).append((job_id, similar_id, score))
+            chunk_ids = set(chunk)
+            for row in candidates:
+                if row[0] in chunk_ids:
+                    merged.setdefault(row[0], []).append(row)
+            db.session.execute(delete(JobSimilarity).where(JobSimilarity.job_id.in_(chunk)))
+            _write([row for rows in merged.values()
+                    for row in sorted(rows, key=lambda row: -row[2])[:top_k]])
+
+    db.session.commit()
+    model.job_ids, model.matrix = corpus_ids, corpus
+    model.save(path)
+    if echo:
+        echo('Added {} new jobs.'.format(len(new_ids)))
+    return len(new_ids)
+
+
+def similar_jobs(job_id, limit=5):
+    """Active jobs most similar to a job, from the precomputed table"""
+    return Job.query.join(
+        JobSimilarity, JobSimilarity.similar_job_id == Job.id
+    ).filter(
+        JobSimilarity.job_id == job_id,
+        Job.status == 'active'
+    ).order_by(JobSimilarity.score.desc()).limit(limit).all()
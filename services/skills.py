@@ -0,0 +1,120 @@
+"""
+Skill normalization
+The comma-separated ``Job.required_skills`` and ``Profile.skills`` text is
+parsed at write time into canonical rows in the ``skills`` table, linked
+through the ``job_skills`` and ``profile_skills`` association tables.
+"""
+import re
+from sqlalchemy import event, inspect, select, delete
+from sqlalchemy.orm import Session
+from models import Job, Profile, Skill, job_skills, profile_skills
+from services.sql import insert_ignoring_conflict
+
+# Common spellings -> canonical skill name (keys are lowercase)
+ALIASES = {
+    'js': 'JavaScript', 'javascript': 'JavaScript', 'ecmascript': 'JavaScript',
+    'ts': 'TypeScript', 'typescript': 'TypeScript',
+    'node': 'Node.js', 'nodejs': 'Node.js', 'node.js': 'Node.js',
+    'react': 'React', 'reactjs': 'React', 'react.js': 'React',
+    'vue': 'Vue.js', 'vuejs': 'Vue.js', 'vue.js': 'Vue.js',
+    'angular': 'Angular', 'angularjs': 'Angular',
+    'postgres': 'PostgreSQL', 'postgresql': 'PostgreSQL', 'psql': 'PostgreSQL',
+    'mysql': 'MySQL', 'sql': 'SQL', 'nosql': 'NoSQL', 'mongodb': 'MongoDB', 'mongo': 'MongoDB',
+    'python': 'Python', 'python3': 'Python', 'py': 'Python',
+    'golang': 'Go', 'go': 'Go',
+    'c++': 'C++', 'cpp': 'C++', 'c#': 'C#', 'csharp': 'C#', '.net': '.NET', 'dotnet': '.NET',
+    'k8s': 'Kubernetes', 'kubernetes': 'Kubernetes', 'docker': 'Docker',
+    'aws': 'AWS', 'amazon web services': 'AWS', 'gcp': 'GCP', 'google cloud': 'GCP', 'azure': 'Azure',
+    'ml': 'Machine Learning', 'machine learning': 'Machine Learning',
+    'ai': 'AI', 'nlp': 'NLP', 'html': 'HTML', 'html5': 'HTML', 'css': 'CSS', 'css3': 'CSS',
+    'ui/ux': 'UI/UX', 'ux': 'UX', 'ui': 'UI', 'seo': 'SEO', 'excel': 'Excel', 'ms excel': 'Excel',
+}
+
+_SEPARATORS = re.compile(r'[,;\n|•]+')
+
+# Association table and owner column for each skill-bearing model
+_LINKS = {
+    Job: ('required_skills', job_skills, job_skills.c.job_id),
+    Profile: ('skills', profile_skills, profile_skills.c.profile_id),
+}
+
+
+def skill_key(name):
+    """Lowercase, whitespace-collapsed key for a skill name"""
+    return ' '.join(name.lower().split())
+
+
+def parse_skills(text):
+    """
+    Split free-text skills into canonical skills.
+
+    Returns:
+        List of unique (key, display name) tuples in the order written
+    """
+    if not text:
+        return []
+    skills = {}
+    for part in _SEPARATORS.split(text):
+        part = part.strip(' .-*\t')
+        if not part or len(part) > 100:
+            continue
+        key = skill_key(part)
+        name = ALIASES.get(key)
+        if name:
+            key = skill_key(name)
+        else:
+            name = ' '.join(part.split())
+        skills.setdefault(key, name)
+    return list(skills.items())
+
+
+def skill_ids_for(conn, text):
+    """Resolve free-text skills to Skill ids, creating missing skills"""
+    parsed = parse_skills(text)
+    if not parsed:
+        return []
+    keys = [key for key, name in parsed]
+    found = dict(conn.execute(select(Skill.key, Skill.id).where(Skill.key.in_(keys))).all())
+    missing = [{'key': key, 'name': name} for key, name in parsed if key not in found]
+    if missing:
+        insert_ignoring_conflict(conn, Skill, missing)
+        found = dict(conn.execute(select(Skill.key, Skill.id).where(Skill.key.in_(keys))).all())
+    return [found[key] for key in keys if key in found]
+
+
+def sync_skills(conn, model, owners):
+    """
+    Replace the skill links of several jobs or profiles.
+
+    Args:
+        conn: Connection to execute on
+        model: Job or Profile
+        owners: List of (id, skills text) pairs
+    """
+    column, table, owner_column = _LINKS[model]
+    if not owners:
+        return
+    rows = []
+    for owner_id, text in owners:
+        rows.extend({owner_column.key: owner_id, 'skill_id': skill_id}
+                    for skill_id in skill_ids_for(conn, text))
+    conn.execute(delete(table).where(owner_column.in_([owner_id for owner_id, text in owners])))
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_flushed_skills(session, flush_context):
+    """Relink jobs and profiles whose skills text was inserted or changed"""
+    pending = {model: [] for model in _LINKS}
+    for obj in list(session.new) + list(session.dirty):
+        model = type(obj)
+        if model not in _LINKS:
+            continue
+        column = _LINKS[model][0]
+        if obj in session.new or inspect(obj).attrs[column].history.has_changes():
+            pending[model].append((obj.id, getattr(obj, column)))
+    if any(pending.values()):
+        conn = session.connection()
+        for model, owners in pending.items():
+            sync_skills(conn, model, owners)
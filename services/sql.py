@@ -0,0 +1,113 @@
+"""
+Dialect-aware SQL helpers
+Small statements the ORM does not express portably, used by the services
+that maintain lookup and summary tables.
+"""
+import sqlite3
+from sqlalchemy import event, insert, update, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite only enforces foreign keys, and their ON DELETE CASCADE, when enabled per connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def insert_ignoring_conflict(conn, model, values, index_elements=('key',)):
+    """
+    INSERT rows, skipping any that collide with an existing unique key.
+
+    Args:
+        conn: Connection to execute on
+        model: Mapped class or Table to insert into
+        values: Dict for one row, or list of dicts for an executemany
+        index_elements: Columns of the unique constraint to ignore conflicts on
+
+    Returns:
+        Number of rows inserted (where the driver reports it)
+    """
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+    else:
+        statement = insert(model)
+    if isinstance(values, dict):
+        return conn.execute(statement.values(**values)).rowcount
+    return conn.execute(statement, values).rowcount
+
+
+def insert_adding_on_conflict(conn, model, values, index_elements, columns):
+    """
+    INSERT rows, adding to the counter columns of any row that already has the same key.
+
+    Args:
+        conn: Connection to execute on
+        model: Mapped class or Table to insert into
+        values: List of row dicts
+        index_elements: Columns of the primary key or unique constraint
+        columns: Counter column name, or names, to add the new row's values onto
+    """
+    if not values:
+        return
+    if isinstance(columns, str):
+        columns = (columns,)
+    table = getattr(model, '__table__', model)
+    dialect = conn.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert_fn(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(index_elements),
+            set_={column: table.c[column] + statement.excluded[column] for column in columns}
+        )
+        conn.execute(statement, values)
+        return
+    for row in values:
+        key = and_(*(table.c[name] == row[name] for name in index_elements))
+        updated = conn.execute(
+            update(table).where(key).values({column: table.c[column] + row[column] for column in columns})
+        ).rowcount
+        if not updated:
+            conn.execute(insert(table).values(**row))
+
+
+def insert_replacing_on_conflict(conn, model, values, index_elements, columns):
+    """
+    INSERT rows, overwriting the given columns of any row that already has the same key.
+
+    Args:
+        conn: Connection to execute on
+        model: Mapped class or Table to insert into
+        values: List of row dicts
+        index_elements: Columns of the primary key or unique constraint
+        columns: Column name, or names, to set to the new row's values
+    """
+    if not values:
+        return
+    if isinstance(columns, str):
+        columns = (columns,)
+    table = getattr(model, '__table__', model)
+    dialect = conn.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert_fn(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(index_elements),
+            set_={column: statement.excluded[column] for column in columns}
+        )
+        conn.execute(statement, values)
+        return
+    for row in values:
+        key = and_(*(table.c[name] == row[name] for name in index_elements))
+        updated = conn.execute(
+            update(table).where(key).values({column: row[column] for column in columns})
+        ).rowcount
+        if not updated:
+            conn.execute(insert(table).values(**row))
@@ -0,0 +1,207 @@
+"""
+Typeahead suggestions for the job search boxes
+An in-process sorted array of lowercase keys searched with bisect. Every word
+of a value is indexed as a key start, so "dev" finds "Python Developer".
+The index covers distinct titles, company names and canonical locations of
+active jobs and is updated incrementally as Job rows are committed.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from models import Job, Location
+from services.events import on_commit
+
+KINDS = ('title', 'company', 'location')
+
+# Job column backing each suggestion kind; locations are looked up by id
+_COLUMNS = {'title': 'title', 'company': 'company_name', 'location': 'location_id'}
+
+# Full rebuild interval; bounds staleness from writes in other worker processes
+REBUILD_INTERVAL = 300
+
+# Candidates examined per lookup before ranking by popularity
+MAX_CANDIDATES = 200
+
+
+class SuggestionIndex:
+    """Sorted prefix index of (key, kind, value) entries with per-value job counts"""
+
+    def __init__(self):
+        self._keys = []
+        self._counts = {kind: Counter() for kind in KINDS}
+        self._location_names = {}
+        self._lock = threading.Lock()
+        self.built_at = None
+
+    @staticmethod
+    def _entry_keys(value):
+        """Lowercase keys starting at each word of the value"""
+        lowered = value.lower()
+        keys = [lowered]
+        for position, char in enumerate(lowered):
+            if position and not lowered[position - 1].isalnum() and char.isalnum():
+                keys.append(lowered[position:])
+        return keys
+
+    def _add(self, kind, value, count=1):
+        value = (value or '').strip()
+        if not value:
+            return
+        counts = self._counts[kind]
+        if counts[value] == 0:
+            for key in self._entry_keys(value):
+                insort(self._keys, (key, kind, value))
+        counts[value] += count
+
+    def _remove(self, kind, value):
+        value = (value or '').strip()
+        counts = self._counts[kind]
+        if counts.get(value, 0) <= 0:
+            return
+        counts[value] -= 1
+        if counts[value] == 0:
+            del counts[value]
+            for key in self._entry_keys(value):
+                position = bisect_left(self._keys, (key, kind, value))
+                if position < len(self._keys) and self._keys[position] == (key, kind, value):
+                    del self._keys[position]
+
+    def build(self, rows, location_names):
+        """Rebuild from (title, company_name, location name) rows of active jobs"""
+        counts = {kind: Counter() for kind in KINDS}
+        for row in rows:
+            for kind, value in zip(KINDS, row):
+                value = (value or '').strip()
+                if value:
+                    counts[kind][value] += 1
+        keys = sorted(
+            (key, kind, value)
+            for kind in KINDS
+            for value in counts[kind]
+            for key in self._entry_keys(value)
+        )
+        with self._lock:
+            self._keys = keys
+            self._counts = counts
+            self._location_names = dict(location_names)
+            self.built_at = time.time()
+
+    def add_location(self, location_id, name):
+        """Remember the canonical name of a newly created location"""
+        with self._lock:
+            self._location_names[location_id] = name
+
+    def knows_location(self, location_id):
+        return location_id is None or location_id in self._location_names
+
+    def _value(self, kind, values):
+        value = values.get(_COLUMNS[kind])
+        if kind == 'location':
+            return self._location_names.get(value)
+        return value
+
+    def add_job(self, values):
+        """Count an active job's title, company and location"""
+        with self._lock:
+            for kind in KINDS:
+                self._add(kind, self._value(kind, values))
+
+    def remove_job(self, values):
+        """Stop counting a job that was closed or deleted"""
+        with self._lock:
+            for kind in KINDS:
+                self._remove(kind, self._value(kind, values))
+
+    def suggest(self, prefix, kinds=KINDS, limit=8):
+        """
+        Find values with a word starting with ``prefix``.
+
+        Returns:
+            List of dicts with ``value``, ``type`` and ``count``, most common first
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            seen = {}
+            while position < len(self._keys) and len(seen) < MAX_CANDIDATES:
+                key, kind, value = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if kind in kinds and (kind, value) not in seen:
+                    seen[(kind, value)] = self._counts[kind][value]
+                position += 1
+        ranked = sorted(seen.items(), key=lambda item: (-item[1], item[0][1]))
+        return [{'value': value, 'type': kind, 'count': count}
+                for (kind, value), count in ranked[:limit]]
+
+
+index = SuggestionIndex()
+_needs_rebuild = True
+
+
+def _ensure_index():
+    """(Re)build the index from the database when missing, stale or invalidated"""
+    global _needs_rebuild
+    if _needs_rebuild or index.built_at is None or time.time() - index.built_at > REBUILD_INTERVAL:
+        _needs_rebuild = False
+        rows = Job.query.outerjoin(
+            Location, Location.id == Job.location_id
+        ).with_entities(
+            Job.title, Job.company_name, Location.name
+        ).filter(Job.status == 'active').all()
+        location_names = Location.query.with_entities(Location.id, Location.name).all()
+        index.build(rows, location_names)
+
+
+def suggest(prefix, kinds=KINDS, limit=8):
+    """Typeahead suggestions for a search box prefix"""
+    _ensure_index()
+    return index.suggest(prefix, kinds=kinds, limit=limit)
+
+
+@on_commit(Job, Location)
+def _apply_job_changes(changes):
+    """Keep the index in step with committed Job inserts, updates and deletes"""
+    global _needs_rebuild
+    if index.built_at is None:
+        return
+
+    tracked = set(_COLUMNS.values()) | {'status'}
+    for change in changes:
+        values = change.values
+        if change.model is Location:
+            # New locations are queued before the jobs that reference them
+            if change.op == 'insert' and 'name' in values:
+                index.add_location(change.id, values['name'])
+            else:
+                _needs_rebuild = True
+                return
+            continue
+
+        if not tracked.issubset(values) or not index.knows_location(values['location_id']):
+            # Not enough loaded state to update incrementally
+            _needs_rebuild = True
+            return
+
+        if change.op == 'insert':
+            if values['status'] == 'active':
+                index.add_job(values)
+        elif change.op == 'delete':
+            if values['status'] == 'active':
+                index.remove_job(values)
+        elif tracked & change.changed:
+            if not (tracked & change.changed).issubset(change.old):
+                # Previous values were never loaded, so they cannot be uncounted
+                _needs_rebuild = True
+                return
+            before = dict(values, **change.old)
+            if not index.knows_location(before['location_id']):
+                _needs_rebuild = True
+                return
+            if before['status'] == 'active':
+                index.remove_job(before)
+            if values['status'] == 'active':
+                index.add_job(values)
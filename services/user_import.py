@@ -0,0 +1,196 @@
+"""
+Bulk user import
+Streams users (with optional profile fields) from a CSV or JSONL file and
+loads them in batches: passwords are hashed across the password pool's
+processes, then each batch's users and profiles are written with a few
+executemany statements in one transaction. Emails already registered, or
+repeated in the file, are skipped.
+
+After every committed batch the number of records consumed is saved to a
+checkpoint file, so an interrupted import resumes where it stopped instead
+of re-reading and re-hashing the whole file.
+"""
+import csv
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import select
+from extensions import db
+from models import User, Profile
+from services.passwords import password_hasher
+from services.rollups import record_events
+from services.skills import sync_skills
+from services.sql import insert_ignoring_conflict
+
+IMPORT_ROLES = ('employer', 'jobseeker')
+DEFAULT_ROLE = 'jobseeker'
+
+PROFILE_FIELDS = ('phone', 'address', 'linkedin', 'github', 'bio', 'skills',
+                  'experience_years', 'education', 'additional_details')
+
+MIN_PASSWORD_LENGTH = 8
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_BCRYPT_RE = re.compile(r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$')
+
+
+def read_records(path, fmt=None):
+    """Yield one dict per user from a CSV (with a header row) or JSONL file"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _clean(record):
+    """
+    Normalize one input record.
+
+    Returns:
+        (user dict, profile dict, plain password or None), or None if the record is invalid
+    """
+    def text(key):
+        value = record.get(key)
+        return str(value).strip() if value not in (None, '') else None
+
+    email = (text('email') or '').lower()
+    name = text('name')
+    role = (text('role') or DEFAULT_ROLE).lower()
+    password = text('password')
+    password_hash = text('password_hash')
+    if not name or not _EMAIL_RE.match(email) or role not in IMPORT_ROLES:
+        return None
+    if password_hash and not _BCRYPT_RE.match(password_hash):
+        return None
+    if not password_hash and (not password or len(password) < MIN_PASSWORD_LENGTH):
+        return None
+
+    profile = {field: text(field) for field in PROFILE_FIELDS}
+    try:
+        profile['experience_years'] = int(float(profile['experience_years'])) if profile['experience_years'] else None
+    except ValueError:
+        profile['experience_years'] = None
+    user = {'name': name[:100], 'email': email, 'role': role, 'password_hash': password_hash}
+    return user, profile, None if password_hash else password
+
+
+def _import_batch(records, stats):
+    """Validate, dedupe, hash and insert one batch of records"""
+    batch = {}
+    for record in records:
+        cleaned = _clean(record)
+        if cleaned is None:
+            stats['invalid'] += 1
+        elif cleaned[0]['email'] in batch:
+            stats['duplicate'] += 1
+        else:
+            batch[cleaned[0]['email']] = cleaned
+    if not batch:
+        return
+
+    existing = set(db.session.execute(select(User.email).where(User.email.in_(list(batch)))).scalars())
+    stats['existing'] += len(existing)
+    new = [cleaned for email, cleaned in batch.items() if email not in existing]
+    if not new:
+        return
+
+    # Hash the plain passwords of the batch across all pool processes
+    plain = [(user, password) for user, profile, password in new if password]
+    for (user, password), pw_hash in zip(plain, password_hasher.hash_many(password for user, password in plain)):
+        user['password_hash'] = pw_hash
+
+    now = datetime.utcnow()
+    users = [dict(user, created_at=now, updated_at=now) for user, profile, password in new]
+    with db.engine.begin() as conn:
+        # A user registering meanwhile wins; their email is skipped here
+        insert_ignoring_conflict(conn, User, users, index_elements=('email',))
+        user_ids = dict(conn.execute(
+            select(User.email, User.id).where(User.email.in_([user['email'] for user in users]), User.created_at == now)
+        ).all())
+        profiles = [
+            dict(profile, user_id=user_ids[user['email']], created_at=now, updated_at=now)
+            for user, profile, password in new if user['email'] in user_ids
+        ]
+        if profiles:
+            conn.execute(Profile.__table__.insert(), profiles)
+            profile_ids = dict(conn.execute(
+                select(Profile.user_id, Profile.id).where(Profile.user_id.in_(list(user_ids.values())))
+            ).all())
+            sync_skills(conn, Profile, [
+                (profile_ids[profile['user_id']], profile['skills']) for profile in profiles if profile['skills']
+            ])
+
+        roles = Counter(user['role'] for user in users if user['email'] in user_ids)
+        events = Counter({('users.new', now): sum(roles.values())})
+        events.update({('users.new.' + role, now): count for role, count in roles.items()})
+        record_events(conn, events, Counter({'users.' + role: count for role, count in roles.items()}))
+
+    stats['imported'] += len(user_ids)
+    stats['existing'] += len(users) - len(user_ids)
+
+
+def _load_checkpoint(checkpoint):
+    try:
+        with open(checkpoint) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint, path, stats):
+    tmp = checkpoint + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'path': os.path.abspath(path), 'stats': dict(stats)}, f)
+    os.replace(tmp, checkpoint)
+
+
+def import_users(path, fmt=None, batch_size=1000, checkpoint=None, resume=True, echo=None):
+    """
+    Import users and their profiles from a CSV or JSONL file.
+
+    Records need name, email and either password or a bcrypt password_hash;
+    role (employer or jobseeker, default jobseeker) and the profile fields
+    are optional. Must run inside an app context.
+
+    Args:
+        path: Input file
+        fmt: 'csv' or 'jsonl'; guessed from the extension when None
+        batch_size: Records hashed and inserted per transaction
+        checkpoint: Progress file; defaults to '<path>.checkpoint'
+        resume: Skip the records a previous run already committed
+        echo: Optional progress callback
+
+    Returns:
+        Counter with read, imported, existing, duplicate and invalid records
+    """
+    checkpoint = checkpoint or path + '.checkpoint'
+    stats = Counter(dict.fromkeys(('read', 'imported', 'existing', 'duplicate', 'invalid'), 0))
+    saved = _load_checkpoint(checkpoint) if resume else None
+    if saved and saved.get('path') == os.path.abspath(path):
+        stats.update(saved['stats'])
+        if echo:
+            echo('Resuming after {} records.'.format(stats['read']))
+
+    records = islice(read_records(path, fmt), stats['read'], None)
+    started = time.perf_counter()
+    imported_before = stats['imported']
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, stats)
+        stats['read'] += len(batch)
+        _save_checkpoint(checkpoint, path, stats)
+        if echo:
+            elapsed = time.perf_counter() - started
+            echo('Read {read}, imported {imported} ({rate:.0f} users/s)...'.format(
+                rate=(stats['imported'] - imported_before) / elapsed if elapsed else 0, **stats))
+    return stats
@@ -0,0 +1,190 @@
+"""
+Write-behind job view counter
+Job detail requests only bump an in-memory counter (see services/buffer.py).
+Each flush adds the buffered views to ``jobs.views_count`` with one batched
+``UPDATE ... SET views_count = views_count + n`` per job.
+
+Distinct viewers are counted with HyperLogLog sketches: one per job per day
+in ``job_view_sketches`` for date ranges, and an all-time sketch with its
+estimate on the job. Each flush merges this worker's viewers into the stored
+sketches, so sketches from every worker end up in the same rows.
+"""
+import re
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import request, session
+from flask_login import current_user
+from sqlalchemy import select, update, bindparam, func
+from extensions import db
+from models import Job, JobViewSketch
+from services.buffer import WriteBehindBuffer
+from services.funnel import event_log
+from services.hll import HyperLogLog, hash_value
+from services.sql import insert_ignoring_conflict
+
+# User agents that count as views but not as viewers
+_BOT_RE = re.compile(r'bot|crawl|spider|slurp|preview|monitor|curl|wget|python-requests', re.IGNORECASE)
+
+
+def viewer_key():
+    """
+    Identify the visitor of the current request for distinct-viewer counts.
+
+    Returns:
+        'user:<id>' for logged-in users, 'visitor:<random id>' kept in the
+        session for anonymous ones, or None for crawlers
+    """
+    if _BOT_RE.search(request.headers.get('User-Agent', '')):
+        return None
+    if current_user.is_authenticated:
+        return 'user:{}'.format(current_user.id)
+    if 'viewer_id' not in session:
+        session['viewer_id'] = uuid.uuid4().hex
+    return 'visitor:' + session['viewer_id']
+
+
+class ViewCounter(WriteBehindBuffer):
+    """Per-process buffer of job views and viewers, flushed to the database in batches"""
+
+    name = 'view-counter'
+
+    def __init__(self):
+        super().__init__()
+        self._pending = Counter()
+        self._viewers = {}  # (job id, day) -> set of viewer hashes
+
+    def record(self, job_id, viewer=None):
+        """Count one view, and its viewer if known; never touches the database"""
+        hashed = hash_value(viewer) if viewer else None
+        with self._lock:
+            self._ensure_flusher()
+            self._pending[job_id] += 1
+            if hashed is not None:
+                self._viewers.setdefault((job_id, datetime.utcnow().date()), set()).add(hashed)
+            self._recorded()
+        event_log.record(job_id, 'view')
+
+    def pending(self, job_id):
+        """Views of a job buffered in this process and not yet written"""
+        with self._lock:
+            return self._pending.get(job_id, 0)
+
+    def _take(self):
+        batch = (self._pending, self._viewers)
+        self._pending, self._viewers = Counter(), {}
+        return batch if batch[0] or batch[1] else None
+
+    def _write(self, conn, batch):
+        views, viewers = batch
+        if views:
+            _write_views(conn, views)
+        if viewers:
+            _merge_viewers(conn, viewers)
+        return sum(views.values())
+
+    def _restore(self, batch):
+        views, viewers = batch
+        self._pending.update(views)
+        for key, hashes in viewers.items():
+            self._viewers.setdefault(key, set()).update(hashes)
+
+
+def _write_views(conn, batch):
+    jobs = Job.__table__
+    conn.execute(
+        update(jobs).where(jobs.c.id == bindparam('job_id')).values(
+            views_count=func.coalesce(jobs.c.views_count, 0) + bindparam('views'),
+            # A view is not an edit of the job
+            updated_at=jobs.c.updated_at
+        ),
+        [{'job_id': job_id, 'views': views} for job_id, views in sorted(batch.items())]
+    )
+
+
+def _merge_viewers(conn, viewers):
+    """Read-merge-write the daily and all-time sketches of the viewed jobs"""
+    # Jobs deleted since they were viewed have no sketches to merge into
+    existing = set(conn.execute(
+        select(Job.id).where(Job.id.in_({job_id for job_id, day in viewers}))
+    ).scalars())
+    viewers = {key: hashes for key, hashes in viewers.items() if key[0] in existing}
+    if not viewers:
+        return
+    job_ids = sorted({job_id for job_id, day in viewers})
+    days = sorted({day for job_id, day in viewers})
+
+    # Make sure every daily row exists, then lock the rows being merged into
+    insert_ignoring_conflict(conn, JobViewSketch, [
+        {'job_id': job_id, 'day': day, 'registers': None} for job_id, day in sorted(viewers)
+    ], index_elements=('job_id', 'day'))
+    stored = {
+        (job_id, day): registers for job_id, day, registers in conn.execute(
+            select(JobViewSketch.job_id, JobViewSketch.day, JobViewSketch.registers)
+            .where(JobViewSketch.job_id.in_(job_ids), JobViewSketch.day.in_(days))
+            .with_for_update()
+        )
+    }
+
+    sketches = JobViewSketch.__table__
+    daily = []
+    all_time = {}
+    for (job_id, day), hashes in sorted(viewers.items()):
+        sketch = HyperLogLog.from_bytes(stored.get((job_id, day)))
+        for hashed in hashes:
+            sketch.add_hash(hashed)
+        daily.append({'b_job_id': job_id, 'b_day': day, 'b_registers': sketch.to_bytes()})
+        all_time.setdefault(job_id, set()).update(hashes)
+    conn.execute(
+        update(sketches).where(
+            sketches.c.job_id == bindparam('b_job_id'), sketches.c.day == bindparam('b_day')
+        ).values(registers=bindparam('b_registers')),
+        daily
+    )
+
+    jobs = Job.__table__
+    totals = []
+    for job_id, registers in conn.execute(
+        select(jobs.c.id, jobs.c.viewer_sketch).where(jobs.c.id.in_(job_ids)).with_for_update()
+    ):
+        sketch = HyperLogLog.from_bytes(registers)
+        for hashed in all_time[job_id]:
+            sketch.add_hash(hashed)
+        totals.append({'b_job_id': job_id, 'b_sketch': sketch.to_bytes(), 'b_count': sketch.count()})
+    if totals:
+        conn.execute(
+            update(jobs).where(jobs.c.id == bindparam('b_job_id')).values(
+                viewer_sketch=bindparam('b_sketch'),
+                unique_viewers=bindparam('b_count'),
+                updated_at=jobs.c.updated_at
+            ),
+            totals
+        )
+
+
+def unique_viewers(job_ids, start, end):
+    """
+    Estimated distinct viewers of one or more jobs between two dates (inclusive).
+
+    Unions the daily sketches, so a visitor who came back on several days, or
+    viewed several of the jobs, counts once.
+    """
+    if isinstance(job_ids, int):
+        job_ids = [job_ids]
+    rows = db.session.execute(
+        select(JobViewSketch.registers).where(
+            JobViewSketch.job_id.in_(job_ids),
+            JobViewSketch.day >= start,
+            JobViewSketch.day <= end
+        )
+    ).scalars()
+    return HyperLogLog.union(HyperLogLog.from_bytes(registers) for registers in rows).count()
+
+
+def recent_unique_viewers(job_ids, days):
+    """Estimated distinct viewers over the last ``days`` days, today included"""
+    today = datetime.utcnow().date()
+    return unique_viewers(job_ids, today - timedelta(days=days - 1), today)
+
+
+view_counter = ViewCounter()
@@ -10,6 +10,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initDeleteConfirmations();
     initFlashMessages();
     initActiveNavHighlight();
+    initSearchSuggestions();
 });
 
 // ==========================================================================
@@ -216,6 +217,45 @@ function initSearchHighlight() {
     }
 }
 
+// ==========================================================================
+// SEARCH SUGGESTIONS (TYPEAHEAD)
+// ==========================================================================
+function initSearchSuggestions() {
+    // Inputs opt in with data-suggest="title,company" and data-suggest-url
+    const inputs = document.querySelectorAll('input[data-suggest]');
+    
+    inputs.forEach((input, index) => {
+        const datalist = document.createElement('datalist');
+        datalist.id = 'suggestions-' + index;
+        input.after(datalist);
+        input.setAttribute('list', datalist.id);
+        input.setAttribute('autocomplete', 'off');
+        
+        let lastQuery = '';
+        const fetchSuggestions = debounce(function() {
+            const query = input.value.trim();
+            if (query.length < 2 || query === lastQuery) return;
+            lastQuery = query;
+            
+            const url = input.dataset.suggestUrl + '?q=' + encodeURIComponent(query) +
+                '&type=' + encodeURIComponent(input.dataset.suggest);
+            fetch(url, { headers: { 'Accept': 'application/json' } })
+                .then(response => response.ok ? response.json() : { suggestions: [] })
+                .then(data => {
+                    datalist.innerHTML = '';
+                    data.suggestions.forEach(suggestion => {
+                        const option = document.createElement('option');
+                        option.value = suggestion.value;
+                        datalist.appendChild(option);
+                    });
+                })
+                .catch(() => {});
+        }, 150);
+        
+        input.addEventListener('input', fetchSuggestions);
+    });
+}
+
 // ==========================================================================
 // PHONE NUMBER FORMATTING
 // ==========================================================================
@@ -0,0 +1,63 @@
+"""
+Applied-jobs cache tests
+A jobseeker's cached applied job ids are dropped when they apply or
+withdraw, and page lookups answer the same from the cache or the database.
+"""
+from conftest import PASSWORD
+from extensions import db
+from models import User, Job, Application
+from services.applied_jobs import JobIdSet, applied_job_ids, applied_among, _key
+from services.cache import applied_cache
+
+
+def test_job_id_set():
+    ids = JobIdSet([5, 1, 3, 3])
+    assert list(ids) == [1, 3, 5]
+    assert 3 in ids and 4 not in ids and 6 not in ids
+    assert len(JobIdSet()) == 0
+
+
+def test_cache_dropped_on_apply_and_withdraw(app):
+    with app.app_context():
+        employer = User.query.filter_by(email='employer@test.com').first()
+        seeker = User(name='Applicant', email='applicant@test.com', password=PASSWORD, role='jobseeker')
+        job = Job(title='Tester', company_name='Acme', location='London', description='Testing.',
+                  job_type='Full-time', employer_id=employer.id, status='active')
+        db.session.add_all([seeker, job])
+        db.session.commit()
+        page = [job.id for job in Job.query.limit(5)] + [job.id]
+
+        assert len(applied_job_ids(seeker.id)) == 0
+        assert applied_cache.peek(_key(seeker.id)) is not None
+
+        application = Application(job_id=job.id, jobseeker_id=seeker.id, cover_letter='Hi')
+        db.session.add(application)
+        db.session.commit()
+        assert applied_cache.peek(_key(seeker.id)) is None
+        assert list(applied_among(seeker.id, page)) == [job.id]
+        assert list(applied_job_ids(seeker.id)) == [job.id]
+        # Answered from the warm cache now
+        assert list(applied_among(seeker.id, page)) == [job.id]
+
+        db.session.delete(application)
+        db.session.commit()
+        assert applied_cache.peek(_key(seeker.id)) is None
+        assert list(applied_among(seeker.id, page)) == []
+        assert len(applied_job_ids(seeker.id)) == 0
+
+
+def test_other_users_stay_cached(app):
+    with app.app_context():
+        employer = User.query.filter_by(email='employer@test.com').first()
+        seekers = User.query.filter_by(role='jobseeker').order_by(User.id).limit(2).all()
+        job = Job(title='Analyst', company_name='Acme', location='London', description='Numbers.',
+                  job_type='Full-time', employer_id=employer.id, status='active')
+        db.session.add(job)
+        db.session.commit()
+        applied_job_ids(seekers[0].id)
+        applied_job_ids(seekers[1].id)
+
+        db.session.add(Application(job_id=job.id, jobseeker_id=seekers[1].id, cover_letter='Hi'))
+        db.session.commit()
+        assert applied_cache.peek(_key(seekers[0].id)) is not None
+        assert applied_cache.peek(_key(seekers[1].id)) is None
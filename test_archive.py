@@ -0,0 +1,126 @@
+"""
+Archive tests
+Long-closed jobs move to the archive with their applications and stay
+readable through the archive helpers and pages, under archive ids of their
+own even when SQLite hands their live ids out again.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from conftest import PASSWORD
+from extensions import db
+from models import User, Job, Application, ArchivedJob, ArchivedApplication, StatTotal
+from schema import upgrade_schema
+from services.archive import archive_jobs, application_history, get_application
+from services.rollups import get_totals, seed_totals
+
+
+def _closed_job(employer_id, seeker_ids, days=400):
+    """Id of a job closed ``days`` days ago with one application per seeker"""
+    job = Job(title='Old Role', company_name='Acme', location='London', description='Old work.',
+              job_type='Full-time', employer_id=employer_id, status='active')
+    db.session.add(job)
+    db.session.commit()
+    db.session.add_all([Application(job_id=job.id, jobseeker_id=seeker_id, cover_letter='Hi') for seeker_id in seeker_ids])
+    db.session.commit()
+    job.status = 'closed'
+    db.session.commit()
+    job_id = job.id
+    db.session.execute(update(Job).where(Job.id == job_id).values(updated_at=datetime.utcnow() - timedelta(days=days)))
+    db.session.commit()
+    return job_id
+
+
+def _archive():
+    """Archive, then forget the session's copies of the moved rows"""
+    archived = archive_jobs(180)
+    db.session.expunge_all()
+    return archived
+
+
+def _login(app, email):
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+    return client
+
+
+def test_archive_keeps_history_and_totals(app):
+    with app.app_context():
+        employer_id = User.query.filter_by(email='employer@test.com').first().id
+        seeker_id = User.query.filter_by(email='seeker0@test.com').first().id
+        job_id = _closed_job(employer_id, [seeker_id])
+        application_id = Application.query.filter_by(job_id=job_id).one().id
+        totals = get_totals()
+
+        assert _archive() == (1, 1)
+        assert Job.query.filter_by(id=job_id).first() is None
+        archived = ArchivedApplication.query.filter_by(original_id=application_id).one()
+        assert archived.job.original_id == job_id
+        assert get_totals() == totals
+
+        history = application_history(seeker_id, per_page=100)
+        assert history.total == Application.query.filter_by(jobseeker_id=seeker_id).count() + 1
+        assert (archived.id, True) in [(item.id, item.is_archived) for item in history.items]
+        archived_id = archived.id
+
+    client = _login(app, 'seeker0@test.com')
+    assert client.get('/jobseeker/application/{}?archived=1'.format(archived_id)).status_code == 200
+    admin = _login(app, 'admin@test.com')
+    assert b'Archived' in admin.get('/admin/employer/{}'.format(employer_id)).data
+
+
+def test_reused_live_ids_do_not_shadow_the_archive(app):
+    with app.app_context():
+        employer_id = User.query.filter_by(email='employer@test.com').first().id
+        seeker_ids = [user.id for user in User.query.filter_by(role='jobseeker').order_by(User.id).limit(2)]
+        # Newest job and application, so SQLite reuses their ids once they are gone
+        job_id = _closed_job(employer_id, seeker_ids[:1])
+        application_id = Application.query.filter_by(job_id=job_id).one().id
+        _archive()
+        archived = ArchivedApplication.query.filter_by(original_id=application_id).order_by(
+            ArchivedApplication.id.desc()).first()
+
+        reused_job_id = _closed_job(employer_id, seeker_ids[1:])
+        reused = Application.query.filter_by(job_id=reused_job_id).one()
+        assert (reused_job_id, reused.id) == (job_id, application_id)
+        assert get_application(application_id) == reused
+        assert get_application(archived.id, archived=True) == archived
+
+        # The same live ids archived a second time
+        archived_jobs = ArchivedJob.query.filter_by(original_id=job_id).count()
+        _archive()
+        rows = ArchivedApplication.query.filter_by(original_id=application_id).order_by(
+            ArchivedApplication.id.desc()).limit(2).all()
+        assert [row.jobseeker_id for row in rows] == seeker_ids[::-1]
+        assert rows[0].job_id != rows[1].job_id
+        assert ArchivedJob.query.filter_by(original_id=job_id).count() == archived_jobs + 1
+
+
+def test_totals_seeded_on_upgrade(app):
+    with app.app_context():
+        totals = get_totals()
+        StatTotal.query.delete()
+        db.session.commit()
+        upgrade_schema()
+        assert get_totals() == totals
+
+
+def test_totals_seeded_once_by_concurrent_workers(app):
+    with app.app_context():
+        totals = get_totals()
+        StatTotal.query.delete()
+        db.session.commit()
+
+    def start_worker():
+        with app.app_context():
+            seed_totals()
+
+    workers = [threading.Thread(target=start_worker) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with app.app_context():
+        assert get_totals() == totals
@@ -0,0 +1,117 @@
+"""
+Deletion tests
+Set-based deletion of users and jobs, inline and as a background task,
+leaves no orphan rows and keeps the dashboard totals and per-job
+application counters equal to the rows that are left.
+"""
+from collections import Counter
+
+from sqlalchemy import select, func
+
+from extensions import db
+from models import User, Profile, Job, Application, ArchivedJob, ArchivedApplication, DeletionTask
+from services import deletion
+from services.counters import STATUSES
+from services.deletion import delete_user, delete_job, run_task
+from services.rollups import get_totals
+
+
+def _counted_totals():
+    """Totals counted from the tables and their archives"""
+    totals = Counter()
+    for prefix, tables, column in (('users', (User,), 'role'),
+                                   ('jobs', (Job, ArchivedJob), 'status'),
+                                   ('applications', (Application, ArchivedApplication), 'status')):
+        for table in tables:
+            group = getattr(table, column)
+            for value, count in db.session.execute(select(group, func.count()).group_by(group)):
+                totals['{}.{}'.format(prefix, value)] += count
+    return totals
+
+
+def _assert_consistent():
+    assert {metric: value for metric, value in get_totals().items() if value} == dict(_counted_totals())
+    for job in Job.query.all():
+        counts = Counter(status for status, in db.session.query(Application.status).filter_by(job_id=job.id))
+        assert job.applications_count == sum(counts.values())
+        for status in STATUSES:
+            assert getattr(job, status + '_count') == counts[status]
+
+
+def _review_some(job_id):
+    """Move a few of a job's applications off 'pending' so the per-status counters are exercised"""
+    applications = Application.query.filter_by(job_id=job_id).order_by(Application.id).limit(3).all()
+    for application, status in zip(applications, STATUSES[1:] * 3):
+        application.status = status
+    db.session.commit()
+
+
+def test_delete_jobseeker(app):
+    with app.app_context():
+        job_ids = [job_id for job_id, in db.session.query(Job.id).order_by(Job.id)]
+        _review_some(job_ids[0])
+        seeker = User.query.filter_by(email='seeker0@test.com').one()
+        seeker_id = seeker.id
+
+        assert delete_user(seeker) is None
+        db.session.expunge_all()
+        assert db.session.get(User, seeker_id) is None
+        assert Profile.query.filter_by(user_id=seeker_id).count() == 0
+        assert Application.query.filter_by(jobseeker_id=seeker_id).count() == 0
+        _assert_consistent()
+
+
+def test_delete_job(app):
+    with app.app_context():
+        job = Job.query.order_by(Job.id).first()
+        job_id = job.id
+        _review_some(job_id)
+
+        assert delete_job(job) is None
+        db.session.expunge_all()
+        assert db.session.get(Job, job_id) is None
+        assert Application.query.filter_by(job_id=job_id).count() == 0
+        _assert_consistent()
+
+
+def test_delete_employer(app):
+    with app.app_context():
+        employer = User.query.filter_by(email='other@test.com').one()
+        employer_id = employer.id
+        job_ids = [job_id for job_id, in db.session.query(Job.id).filter_by(employer_id=employer_id)]
+        assert job_ids
+        _review_some(job_ids[-1])
+
+        assert delete_user(employer) is None
+        db.session.expunge_all()
+        assert db.session.get(User, employer_id) is None
+        assert Job.query.filter_by(employer_id=employer_id).count() == 0
+        assert Application.query.filter(Application.job_id.in_(job_ids)).count() == 0
+        # The other employer's jobs and their applications are untouched
+        assert Job.query.count() > 0 and Application.query.count() > 0
+        _assert_consistent()
+
+
+def test_large_deletion_runs_as_task(app, monkeypatch):
+    started = []
+    monkeypatch.setitem(app.config, 'DELETE_INLINE_LIMIT', 1)
+    monkeypatch.setattr(deletion, 'start_task', started.append)
+    with app.app_context():
+        job = Job.query.order_by(Job.id).first()
+        job_id = job.id
+        applications = job.applications_count
+        assert applications > 1
+
+        task = delete_job(job)
+        assert task is not None and started == [task.id]
+        assert task.status == 'pending' and task.total == applications + 1
+        # Nothing is deleted until the task runs
+        assert db.session.get(Job, job_id) is not None
+
+        task = run_task(task.id, batch_size=2)
+        assert task.status == 'done' and task.done == task.total
+        db.session.expunge_all()
+        assert db.session.get(Job, job_id) is None
+        assert Application.query.filter_by(job_id=job_id).count() == 0
+        assert db.session.get(DeletionTask, task.id).finished_at is not None
+        _assert_consistent()
@@ -0,0 +1,79 @@
+"""
+Identity principal tests
+Signed-in users are loaded as cached read-only principals, dropped when the
+user's role, name or email changes or the user is deleted.
+"""
+import pytest
+
+from conftest import PASSWORD
+from extensions import db
+from models import User
+from services.cache import identity_cache
+from services.identity import UserPrincipal, load_user
+
+
+def _cached(user_id):
+    return identity_cache.peek('user:{}'.format(user_id))
+
+
+def _user(email, role='employer'):
+    user = User(name='Identity', email=email, password=PASSWORD, role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_principal_is_cached_and_read_only(app):
+    with app.app_context():
+        user_id = _user('principal@test.com')
+        principal = load_user(str(user_id))
+        assert isinstance(principal, UserPrincipal)
+        assert (principal.id, principal.role, principal.email) == (user_id, 'employer', 'principal@test.com')
+        assert principal.is_employer() and not principal.is_admin()
+        assert _cached(user_id) is principal
+        assert load_user(str(user_id)) is principal
+        # Other columns come from the User row
+        assert principal.created_at == db.session.get(User, user_id).created_at
+        with pytest.raises(AttributeError):
+            principal.role = 'admin'
+
+
+def test_principal_dropped_on_identity_change(app):
+    with app.app_context():
+        user_id = _user('changing@test.com')
+        load_user(str(user_id))
+
+        user = db.session.get(User, user_id)
+        user.password_hash = user.password_hash
+        user.updated_at = None
+        db.session.commit()
+        assert _cached(user_id) is not None
+
+        user.role = 'jobseeker'
+        db.session.commit()
+        assert _cached(user_id) is None
+        assert load_user(str(user_id)).role == 'jobseeker'
+
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+        assert _cached(user_id) is None
+        assert load_user(str(user_id)) is None
+
+        # The deleted user's id handed to a new user
+        new_id = _user('reused@test.com')
+        assert new_id == user_id
+        assert load_user(str(new_id)).email == 'reused@test.com'
+
+
+def test_role_change_applies_to_signed_in_user(app):
+    with app.app_context():
+        user_id = _user('demoted@test.com')
+    client = app.test_client()
+    client.post('/login', data={'email': 'demoted@test.com', 'password': PASSWORD})
+    assert client.get('/employer/').status_code == 200
+
+    with app.app_context():
+        db.session.get(User, user_id).role = 'jobseeker'
+        db.session.commit()
+    response = client.get('/employer/')
+    assert response.status_code == 302
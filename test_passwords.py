@@ -0,0 +1,75 @@
+"""
+Password hashing tests
+Hashes are verified and upgraded to the configured cost on login, and
+logins beyond the pending-operation limit are shed with a 429.
+"""
+import threading
+
+import bcrypt
+import pytest
+
+from conftest import PASSWORD
+from extensions import db
+from models import User
+from services.passwords import PasswordHasher, PasswordQueueFull, password_hasher
+
+
+def test_hash_and_verify_inline():
+    hasher = PasswordHasher()
+    hasher.rounds = 4
+    pw_hash = hasher.hash('secret-password')
+    assert pw_hash.startswith('$2b$04$')
+    assert hasher.verify('secret-password', pw_hash)
+    assert not hasher.verify('wrong-password', pw_hash)
+    assert not hasher.verify('secret-password', 'not-a-bcrypt-hash')
+    hashes = hasher.hash_many(['first-password', 'second-password'])
+    assert [hasher.verify(password, pw_hash) for password, pw_hash in zip(['first-password', 'second-password'], hashes)] == [True, True]
+
+
+@pytest.mark.parametrize('pw_hash, expected', [
+    ('$2b$04$' + 'a' * 53, False),
+    ('$2b$12$' + 'a' * 53, True),
+    ('$2a$04$' + 'a' * 53, True),
+    ('plain', True),
+])
+def test_needs_rehash(pw_hash, expected):
+    hasher = PasswordHasher()
+    hasher.rounds = 4
+    assert hasher.needs_rehash(pw_hash) is expected
+
+
+def test_full_queue_raises_before_submitting():
+    hasher = PasswordHasher()
+    hasher.workers = 1
+    hasher._slots = threading.BoundedSemaphore(1)
+    hasher._slots.acquire()
+    with pytest.raises(PasswordQueueFull) as error:
+        hasher.verify('secret-password', '$2b$04$' + 'a' * 53)
+    assert error.value.code == 429
+    # Nothing was started for the shed request
+    assert hasher._pool is None
+
+
+def test_login_shed_with_429(app, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(password_hasher, 'workers', 1)
+    monkeypatch.setattr(password_hasher, '_slots', slots)
+    response = app.test_client().post('/login', data={'email': 'seeker1@test.com', 'password': PASSWORD})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_login_upgrades_old_hash(app):
+    with app.app_context():
+        user = User.query.filter_by(email='seeker2@test.com').first()
+        user.password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=5, prefix=b'2a')).decode()
+        db.session.commit()
+
+    response = app.test_client().post('/login', data={'email': 'seeker2@test.com', 'password': PASSWORD})
+    assert response.status_code == 302
+
+    with app.app_context():
+        pw_hash = User.query.filter_by(email='seeker2@test.com').first().password_hash
+        assert pw_hash.startswith('$2b$04$')
+        assert password_hasher.verify(PASSWORD, pw_hash)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Query budget tests
+Renders every GET route of the blueprints against the seeded database of
+conftest.py, signed in as the role the blueprint serves, and fails when a
+request issues more SQL queries than its endpoint's @query_budget (see
+services/query_stats.py).
+Lists are seeded with more rows than a page holds, so a lazy load per row
+shows up as a budget overrun.
+"""
+from conftest import PASSWORD
+from services.cache import CACHES
+from services.query_stats import QueryStats, HEADER, endpoint_budget
+
+# Who requests each blueprint's routes (None: anonymous)
+BLUEPRINT_USERS = {
+    'main': None,
+    'auth': None,
+    'admin': 'admin@test.com',
+    'employer': 'employer@test.com',
+    'jobseeker': 'seeker0@test.com',
+}
+# Routes that need a different user than their blueprint's
+ENDPOINT_USERS = {
+    'auth.logout': 'seeker0@test.com',
+}
+# Query strings requested on top of the bare URL: filters that look rows up
+# must stay within the listing's budget too
+ENDPOINT_QUERIES = {
+    'main.jobs': [
+        'location=london&min_salary=40k&sort=salary_high',
+        'location=noida&type=Full-time&experience=Mid',
+        'location=lond&max_salary=70,000&salary=30k-60k&sort=salary_low',
+        'search=python&location=remote&category=engineering',
+        'sort=most_applied&page=2',
+    ],
+    'jobseeker.jobs': [
+        'location=london&min_salary=40k&sort=salary_high',
+        'search=python&location=lond&max_salary=70000',
+    ],
+}
+
+
+def budget_routes(app):
+    """(endpoint, url, user email) of every GET route of the blueprints"""
+    values = app.config['BUDGET_URL_VALUES']
+    routes = []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+            blueprint = rule.endpoint.split('.')[0]
+            if blueprint not in BLUEPRINT_USERS or 'GET' not in rule.methods:
+                continue
+            url = app.url_for(rule.endpoint, **{name: values[name] for name in rule.arguments})
+            user = ENDPOINT_USERS.get(rule.endpoint, BLUEPRINT_USERS[blueprint])
+            routes.append((rule.endpoint, url, user))
+            for query in ENDPOINT_QUERIES.get(rule.endpoint, []):
+                routes.append((rule.endpoint, '{}?{}'.format(url, query), user))
+    return routes
+
+
+def test_query_budgets(app):
+    client = app.test_client()
+    signed_in = None
+    over_budget = []
+    for endpoint, url, email in budget_routes(app):
+        if email != signed_in:
+            client.get('/logout')
+            if email:
+                client.post('/login', data={'email': email, 'password': PASSWORD})
+            signed_in = email
+        # Measure cold pages, not the page cache
+        for cache in CACHES:
+            cache.clear()
+        response = client.get(url)
+        assert response.status_code < 400, '{} returned {}'.format(url, response.status_code)
+        stats = QueryStats.parse(response.headers[HEADER])
+        budget = endpoint_budget(app, endpoint)
+        if stats.queries > budget:
+            over_budget.append('{} ({}): {} queries, budget {}'.format(endpoint, url, stats.queries, budget))
+        if endpoint == 'auth.logout':
+            signed_in = None
+    assert not over_budget, 'Endpoints over their query budget:\n' + '\n'.join(over_budget)
+
+
+def test_query_stats_header(app):
+    for cache in CACHES:
+        cache.clear()
+    response = app.test_client().get('/about')
+    stats = QueryStats.parse(response.headers[HEADER])
+    assert stats.queries >= 1
+    assert stats.seconds >= 0
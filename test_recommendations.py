@@ -0,0 +1,35 @@
+"""
+Recommendation index tests
+Jobs committed after the skill index was built are added to it
+incrementally, without a full rebuild.
+"""
+from conftest import PASSWORD
+from extensions import db
+from models import User, Job, Profile
+from services import recommendations
+from services.recommendations import recommend_jobs
+
+
+def test_new_job_is_indexed_without_rebuild(app, monkeypatch):
+    with app.app_context():
+        employer = User.query.filter_by(email='employer@test.com').first()
+        seeker = User(name='Rust Dev', email='rust@test.com', password=PASSWORD, role='jobseeker')
+        db.session.add(seeker)
+        db.session.commit()
+        db.session.add(Profile(user_id=seeker.id, skills='Rust'))
+        db.session.commit()
+        recommend_jobs(seeker.id)
+
+        def rebuild(rows):
+            raise AssertionError('full rebuild')
+        monkeypatch.setattr(recommendations.index, 'build', rebuild)
+
+        job = Job(title='Rust Engineer', company_name='Ferrous', location='Leeds', description='Systems work.',
+                  required_skills='Rust', job_type='Full-time', employer_id=employer.id, status='active')
+        db.session.add(job)
+        db.session.commit()
+        assert [(found.id, matched) for found, matched in recommend_jobs(seeker.id, limit=1)] == [(job.id, 1)]
+
+        job.status = 'closed'
+        db.session.commit()
+        assert job.id not in [found.id for found, matched in recommend_jobs(seeker.id)]
@@ -0,0 +1,85 @@
+"""
+Salary parsing tests
+Free-text salaries (services/salary.py) and the salary amounts read from the
+job listing query string (services/filters.py).
+"""
+import pytest
+
+from extensions import db
+from models import User, Job
+from services.filters import _amount, apply_job_filters
+from services.salary import parse_salary, SalaryRange
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('$80k - $100k', SalaryRange(80000, 100000, 'USD', 'year')),
+    ('£45/hr', SalaryRange(93600, 93600, 'GBP', 'hour')),
+    ('50,000/month', SalaryRange(600000, 600000, None, 'month')),
+    ('10-15 LPA', SalaryRange(1000000, 1500000, 'INR', 'year')),
+    ('12 lakh', SalaryRange(1200000, 1200000, 'INR', 'year')),
+    ('$100K+', SalaryRange(100000, None, 'USD', 'year')),
+    ('From €40,000', SalaryRange(40000, None, 'EUR', 'year')),
+    ('Up to $90k', SalaryRange(None, 90000, 'USD', 'year')),
+    ('3-5 yrs experience, 8-10 LPA', SalaryRange(800000, 1000000, 'INR', 'year')),
+    ('50000', SalaryRange(50000, 50000, None, 'year')),
+])
+def test_parse_salary(text, expected):
+    assert parse_salary(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', '   ', None, 'Competitive', 'Negotiable, 2 years exp', 'Negotiable, 2 rounds'])
+def test_parse_salary_without_amount(text):
+    assert parse_salary(text) is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('50000', 50000),
+    ('50,000', 50000),
+    ('50k', 50000),
+    ('62.5K', 62500),
+    ('abc', None),
+    ('inf', None),
+    ('-inf', None),
+    ('nan', None),
+    ('1e400', None),
+])
+def test_filter_amount(value, expected):
+    assert _amount(value) == expected
+
+
+def test_non_finite_salary_filter(app):
+    response = app.test_client().get('/jobs?min_salary=inf&max_salary=1e400')
+    assert response.status_code == 200
+
+
+def test_salary_range_filters(app):
+    with app.app_context():
+        employer = User.query.filter_by(email='employer@test.com').one()
+        salaries = {
+            'from-70k': 'From £70,000', 'up-to-40k': 'Up to £40,000', 'band': '£45,000 - £55,000',
+            'none': 'Competitive',
+        }
+        jobs = {
+            name: Job(title='Salary {}'.format(name), company_name='Acme', location='Leeds', description='Work.',
+                      salary=salary, employer_id=employer.id, status='active')
+            for name, salary in salaries.items()
+        }
+        db.session.add_all(jobs.values())
+        db.session.commit()
+        names = {job.id: name for name, job in jobs.items()}
+
+        def matching(**filters):
+            query = apply_job_filters(Job.query.filter(Job.id.in_(names)), filters)
+            return {names[job.id] for job in query}
+
+        assert matching(min_salary='60k') == {'from-70k'}
+        assert matching(min_salary='50k') == {'from-70k', 'band'}
+        assert matching(max_salary='42k') == {'up-to-40k'}
+        assert matching(max_salary='50,000') == {'up-to-40k', 'band'}
+        assert matching(min_salary='50k', max_salary='60k') == {'band'}
+        assert jobs['none'].salary_floor is None and jobs['none'].salary_ceiling is None
+
+        # Clearing the salary clears its bounds
+        jobs['from-70k'].salary = ''
+        db.session.commit()
+        assert matching(min_salary='60k') == set()
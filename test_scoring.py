@@ -0,0 +1,67 @@
+"""
+Applicant scoring tests
+Match scores are written with the application and rescored when the
+applicant's profile changes; ranking applicants by match only reads them.
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from conftest import PASSWORD
+from extensions import db
+from models import User, Job, Application, Profile
+from services.pagination import paginate
+
+
+def _login(app, email):
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+    return client
+
+
+def test_scored_on_write_and_rescored(app):
+    with app.app_context():
+        job = Job.query.filter_by(employer_id=User.query.filter_by(email='employer@test.com').first().id).first()
+        seeker = User(name='New Seeker', email='scored@test.com', password=PASSWORD, role='jobseeker')
+        db.session.add(seeker)
+        db.session.commit()
+        profile = Profile(user_id=seeker.id, skills='Python', experience_years=3)
+        application = Application(job_id=job.id, jobseeker_id=seeker.id, cover_letter='Hi')
+        db.session.add_all([profile, application])
+        db.session.commit()
+        # Half the job's skills (Python, SQL) and enough experience for Mid
+        assert application.match_score == pytest.approx(0.7 * 0.5 + 0.3)
+
+        profile.skills = 'Python, SQL'
+        profile.experience_years = 1
+        db.session.commit()
+        assert db.session.get(Application, application.id).match_score == pytest.approx(0.7 + 0.3 * 0.5)
+
+
+def test_match_sort_is_read_only(app):
+    with app.app_context():
+        job_id = app.config['BUDGET_URL_VALUES']['job_id']
+        unscored = Application.query.filter_by(job_id=job_id).first()
+        unscored.match_score = None
+        db.session.commit()
+        app_id = unscored.id
+
+    response = _login(app, 'employer@test.com').get('/employer/job/{}/applications?sort=match'.format(job_id))
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Application, app_id).match_score is None
+
+
+def test_match_sort_puts_unscored_last(app):
+    with app.test_request_context():
+        job_id = app.config['BUDGET_URL_VALUES']['job_id']
+        unscored = Application.query.filter_by(job_id=job_id).order_by(Application.id.desc()).first()
+        unscored.match_score = None
+        db.session.commit()
+
+        pagination = paginate(Application.query.filter_by(job_id=job_id), Application.match_score, Application.id,
+                              per_page=50, page=1, nulls_last=True)
+        scored = [application.match_score is not None for application in pagination.items]
+        assert False in scored and scored == sorted(scored, reverse=True)
+        # PostgreSQL sorts NULLs first when descending unless told otherwise
+        sql = str(pagination._query_args['query'].statement.compile(dialect=postgresql.dialect()))
+        assert 'applications.match_score DESC NULLS LAST' in sql
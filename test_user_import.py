@@ -0,0 +1,94 @@
+"""
+Bulk user import tests
+Records are validated and deduplicated against the file and the database,
+and an interrupted import resumes from its checkpoint.
+"""
+import csv
+import json
+
+import pytest
+
+from models import User, Profile
+from services import user_import
+from services.passwords import password_hasher
+from services.rollups import get_totals
+from services.user_import import import_users
+
+
+def _write_csv(path, rows):
+    fields = ['name', 'email', 'password', 'role', 'skills', 'experience_years']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({field: row.get(field, '') for field in fields})
+
+
+def test_import_validates_and_dedupes(app, tmp_path):
+    path = str(tmp_path / 'users.csv')
+    _write_csv(path, [
+        {'name': 'Ada', 'email': 'Ada@Import.test', 'password': 'long-password', 'skills': 'Python, SQL',
+         'experience_years': '4.0'},
+        {'name': 'Ada Again', 'email': 'ada@import.test', 'password': 'long-password'},
+        {'name': 'Existing', 'email': 'seeker0@test.com', 'password': 'long-password'},
+        {'name': 'Short', 'email': 'short@import.test', 'password': 'short'},
+        {'name': 'Bad Email', 'email': 'not-an-email', 'password': 'long-password'},
+        {'name': 'Admin', 'email': 'admin@import.test', 'password': 'long-password', 'role': 'admin'},
+        {'name': 'Grace', 'email': 'grace@import.test', 'password': 'long-password', 'role': 'employer'},
+    ])
+    with app.app_context():
+        totals = get_totals()
+        stats = import_users(path, batch_size=3, resume=False)
+        assert dict(stats) == {'read': 7, 'imported': 2, 'existing': 1, 'duplicate': 1, 'invalid': 3}
+
+        ada = User.query.filter_by(email='ada@import.test').one()
+        assert ada.role == 'jobseeker' and ada.verify_password('long-password')
+        profile = Profile.query.filter_by(user_id=ada.id).one()
+        assert profile.experience_years == 4
+        assert [skill.name for skill in profile.skill_tags] == ['Python', 'SQL']
+        assert User.query.filter_by(email='grace@import.test').one().role == 'employer'
+
+        new_totals = get_totals()
+        assert new_totals['users.jobseeker'] == totals['users.jobseeker'] + 1
+        assert new_totals['users.employer'] == totals['users.employer'] + 1
+
+
+def test_import_resumes_from_checkpoint(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'users.jsonl')
+    with open(path, 'w') as f:
+        for i in range(5):
+            f.write(json.dumps({'name': 'Resume {}'.format(i), 'email': 'resume{}@import.test'.format(i),
+                                'password': 'long-password'}) + '\n')
+
+    hashed = []
+    hash_many = password_hasher.hash_many
+
+    def counting_hash_many(passwords):
+        passwords = list(passwords)
+        hashed.extend(passwords)
+        return hash_many(passwords)
+
+    monkeypatch.setattr(password_hasher, 'hash_many', counting_hash_many)
+
+    import_batch = user_import._import_batch
+    calls = []
+
+    def interrupted(records, stats):
+        calls.append(len(records))
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        import_batch(records, stats)
+
+    with app.app_context():
+        monkeypatch.setattr(user_import, '_import_batch', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            import_users(path, batch_size=2)
+        assert User.query.filter(User.email.like('resume%')).count() == 2
+
+        monkeypatch.setattr(user_import, '_import_batch', import_batch)
+        stats = import_users(path, batch_size=2)
+        assert stats['read'] == 5 and stats['imported'] == 5
+        assert User.query.filter(User.email.like('resume%')).count() == 5
+        # Records of the committed first batch were not hashed again
+        assert len(hashed) == 5
+